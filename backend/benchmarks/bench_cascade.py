@@ -0,0 +1,84 @@
+"""Report latency saved and agreement of cascaded triage against the full model.
+
+Runs every image through the first stage (the model at low resolution) and
+the full model once, timing both, then replays the cascade for each
+uncertainty band: an image is escalated when its first-stage probability
+of an abnormal finding lies inside the band. For each band, reports how
+many images were escalated and the mean latency of the full model versus
+the cascade. It also reports how often the cascade's answer matches the
+full model's, and how many images the full model calls abnormal but the
+cascade calls normal.
+
+Without --images the synthetic reference set is used, which only shows the
+mechanics; run it on a labelled sample of real studies before choosing a
+band.
+
+Usage (from the backend directory):
+    python benchmarks/bench_cascade.py [--images DIR] [--samples 64] [--resolution 112]
+        [--bands 0.3,0.7 0.2,0.8 0.1,0.9]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from services.imaging_service import ImagingAnalysisService
+
+
+def timed_forward(service, image):
+    start = time.perf_counter()
+    output = service._forward(image)
+    return torch.softmax(output, dim=1)[0], time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cascaded triage report")
+    parser.add_argument("--images", help="directory of X-ray images")
+    parser.add_argument("--samples", type=int, default=64)
+    parser.add_argument("--resolution", type=int, default=112)
+    parser.add_argument("--bands", nargs="+", default=["0.3,0.7", "0.2,0.8", "0.1,0.9"])
+    args = parser.parse_args()
+
+    service = ImagingAnalysisService("xray")
+    service.enable_cascade(resolution=args.resolution)
+    service.warm_up()
+    if args.images:
+        names = sorted(os.listdir(args.images))[:args.samples]
+        inputs = [service._prepare_input(os.path.join(args.images, name)) for name in names]
+    else:
+        inputs = service.reference_inputs(args.samples)
+
+    rows = []
+    for image in inputs:
+        full, full_seconds = timed_forward(service, image)
+        start = time.perf_counter()
+        small = torch.nn.functional.interpolate(image, size=(args.resolution,) * 2, mode="area")
+        resize_seconds = time.perf_counter() - start
+        first, first_seconds = timed_forward(service, small)
+        rows.append((float(first[1]), int(first.argmax()), int(full.argmax()),
+                     first_seconds + resize_seconds, full_seconds))
+
+    full_ms = sum(row[4] for row in rows) * 1000 / len(rows)
+    print(f"{len(rows)} images, first stage at {args.resolution}x{args.resolution}, full model {full_ms:.1f} ms/image")
+    print(f"{'band':>10} {'escalated':>10} {'cascade ms':>11} {'saved':>7} {'agreement':>10} {'missed abnormal':>16}")
+    for band in args.bands:
+        low, high = (float(value) for value in band.split(","))
+        escalated = agree = missed = 0
+        cascade_seconds = 0.0
+        for abnormal, first_prediction, full_prediction, first_time, full_time in rows:
+            escalate = low < abnormal < high
+            prediction = full_prediction if escalate else first_prediction
+            escalated += escalate
+            cascade_seconds += first_time + (full_time if escalate else 0)
+            agree += prediction == full_prediction
+            missed += full_prediction == 1 and prediction == 0
+        cascade_ms = cascade_seconds * 1000 / len(rows)
+        print(f"{band:>10} {escalated / len(rows):>10.1%} {cascade_ms:>11.1f} {1 - cascade_ms / full_ms:>7.1%} "
+              f"{agree / len(rows):>10.1%} {missed:>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Compare database profiles under concurrent auth reads and history writes.
+
+Each client thread alternates a token-verification style user lookup with
+a LabHistoryService.record write of a few parameters. Profiles:
+
+  sqlite-default  stock SQLite engine (rollback journal, no pragmas)
+  sqlite-tuned    WAL, synchronous=NORMAL, mmap, cache and busy_timeout
+  postgresql      pooled engine, only when --postgres-url is given
+
+Usage (from the backend directory):
+    python benchmarks/bench_database.py [--clients 1 4 16] [--ops 200]
+        [--postgres-url postgresql+psycopg2://user:pw@localhost/bench]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import sessionmaker
+from services.database import Base, create_db_engine
+from services.lab_history_service import LabHistoryService
+from models.user import User
+from models.lab_history import LabObservation, LabTrend
+
+USERS = 100
+
+
+def run_profile(engine, clients, ops):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add_all([
+            User(username=f"tech{i}", email=f"tech{i}@lab.local", hashed_password="x")
+            for i in range(USERS)
+        ])
+        db.commit()
+
+    history = LabHistoryService()
+    errors = []
+
+    def client(worker):
+        rng = random.Random(worker)
+        for op in range(ops):
+            try:
+                with Session() as db:
+                    username = f"tech{rng.randrange(USERS)}"
+                    assert db.query(User).filter(User.username == username).first()
+                    history.record(db, f"patient{worker}-{op % 20}", {
+                        ("KFT", "Creatinine"): (rng.uniform(0.5, 2.0), "mg/dL"),
+                        ("KFT", "Urea"): (rng.uniform(5, 30), "mg/dL"),
+                        ("CBC", "Hemoglobin"): (rng.uniform(10, 17), "g/dL"),
+                    })
+            except Exception as e:
+                errors.append(e)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    elapsed = time.perf_counter() - start
+    return clients * ops / elapsed, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Database profile benchmark")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--ops", type=int, default=200, help="read+write pairs per client")
+    parser.add_argument("--postgres-url", help="PostgreSQL URL for the pooled profile")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        profiles = [
+            ("sqlite-default", create_db_engine(f"sqlite:///{tmp}/default.db", tuned=False)),
+            ("sqlite-tuned", create_db_engine(f"sqlite:///{tmp}/tuned.db")),
+        ]
+        if args.postgres_url:
+            profiles.append(("postgresql", create_db_engine(args.postgres_url)))
+
+        print(f"{'profile':<16} {'clients':>8} {'ops/s':>10} {'errors':>7}")
+        for name, engine in profiles:
+            for clients in args.clients:
+                throughput, errors = run_profile(engine, clients, args.ops)
+                print(f"{name:<16} {clients:>8} {throughput:>10.1f} {errors:>7}")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
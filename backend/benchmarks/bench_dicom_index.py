@@ -0,0 +1,134 @@
+"""Compare finding and loading DICOM instances by reading files with the header index.
+
+Writes a synthetic archive (CT and MR series of 512x512 16-bit slices for
+several patients over several days) and indexes it in an in-memory
+database, then times:
+
+* ``query``: all CT series from one day, by opening every file with
+  pydicom (``full``), by reading every header only (``headers``) and from
+  the index (``index``).
+* ``pixels``: one slice's pixel array via ``pydicom.dcmread`` and via
+  ``read_pixels`` at the indexed offset.
+
+Usage (from the backend directory):
+    python benchmarks/bench_dicom_index.py [--patients 10] [--slices 20] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pydicom
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from services.database import Base
+from services.dicom_index import DicomIndexService, read_header, read_pixels
+
+DAYS = ["20260301", "20260302", "20260303"]
+
+
+def write_dicom(path, pixels, **tags):
+    """An uncompressed explicit VR little endian CT-like slice."""
+    meta = pydicom.dataset.FileMetaDataset()
+    meta.MediaStorageSOPClassUID = pydicom.uid.CTImageStorage
+    meta.MediaStorageSOPInstanceUID = pydicom.uid.generate_uid()
+    meta.TransferSyntaxUID = pydicom.uid.ExplicitVRLittleEndian
+    dataset = pydicom.dataset.Dataset()
+    dataset.file_meta = meta
+    dataset.is_little_endian, dataset.is_implicit_VR = True, False
+    dataset.SOPClassUID = meta.MediaStorageSOPClassUID
+    dataset.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    for name, value in tags.items():
+        setattr(dataset, name, value)
+    dataset.Rows, dataset.Columns = pixels.shape
+    dataset.SamplesPerPixel = 1
+    dataset.PhotometricInterpretation = "MONOCHROME2"
+    dataset.BitsAllocated, dataset.BitsStored, dataset.HighBit = 16, 16, 15
+    dataset.PixelRepresentation = 1
+    dataset.PixelData = pixels.tobytes()
+    dataset.save_as(path, write_like_original=False)
+
+
+def write_archive(tmp, patients, slices):
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(-1000, 2000, (512, 512), dtype=np.int16)
+    paths = []
+    for patient in range(patients):
+        study = pydicom.uid.generate_uid()
+        for modality in ("CT", "MR"):
+            series = pydicom.uid.generate_uid()
+            for number in range(slices):
+                path = os.path.join(tmp, f"p{patient}_{modality}_{number}.dcm")
+                write_dicom(path, pixels, PatientID=f"P{patient}", StudyInstanceUID=study,
+                            SeriesInstanceUID=series, Modality=modality, InstanceNumber=number,
+                            StudyDate=DAYS[patient % len(DAYS)])
+                paths.append(path)
+    return paths
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DICOM header index benchmark")
+    parser.add_argument("--patients", type=int, default=10)
+    parser.add_argument("--slices", type=int, default=20, help="slices per series")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    service = DicomIndexService()
+    target = date(2026, 3, 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_archive(tmp, args.patients, args.slices)
+        start = time.perf_counter()
+        for path in paths:
+            # The file path stands in for the artifact hash here
+            service.index(db, read_header(path), path.rsplit("/", 1)[-1].ljust(64, "_")[:64])
+        print(f"{len(paths)} files, indexed in {time.perf_counter() - start:.2f}s")
+
+        def scan(stop_before_pixels):
+            found = set()
+            for path in paths:
+                dataset = pydicom.dcmread(path, stop_before_pixels=stop_before_pixels)
+                if dataset.Modality == "CT" and dataset.StudyDate == target.strftime("%Y%m%d"):
+                    found.add(dataset.SeriesInstanceUID)
+            return len(found)
+
+        print(f"{'query':>8} {'method':>8} {'ms':>9} {'series':>7}")
+        for method, fn in (
+            ("full", lambda: scan(False)),
+            ("headers", lambda: scan(True)),
+            ("index", lambda: len(service.find_series(db, modality="CT", date_from=target, date_to=target))),
+        ):
+            ms, found = timed(fn, args.repeat)
+            print(f"{'CT/day':>8} {method:>8} {ms:>9.2f} {found:>7}")
+
+        path = paths[0]
+        instance = service.list_instances(db, pydicom.dcmread(path, stop_before_pixels=True).SeriesInstanceUID)[0]
+        for method, fn in (
+            ("pydicom", lambda: pydicom.dcmread(path).pixel_array.sum()),
+            ("index", lambda: read_pixels(path, instance).sum()),
+        ):
+            ms, _ = timed(fn, args.repeat * 10)
+            print(f"{'pixels':>8} {method:>8} {ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Compare full decode + MONAI resize with downscale-on-decode for 2D images.
+
+Writes radiograph-sized test images (8-bit grayscale and RGB JPEGs, 8-bit
+and 16-bit PNGs), then decodes each one to the 224x224 model input in a
+fresh process, either way:
+
+* ``full``: PIL decodes the whole image, MONAI scales and resizes it
+  (the previous X-ray pipeline).
+* ``reduced``: ``decode_image_2d``, which uses JPEG draft mode, integer
+  reduce and single-channel conversion before the final resample.
+
+Reports the median decode time and how far peak RSS rose during the
+decode (Linux only, since it reads /proc/self/status).
+
+Usage (from the backend directory):
+    python benchmarks/bench_image_decode.py [--size 3000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import numpy as np
+from PIL import Image
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, sys, time
+import numpy as np
+import torch
+from PIL import Image
+from monai.transforms import Compose, EnsureChannelFirst, Resize, ScaleIntensity
+from services.image_decode import decode_image_2d
+
+def rss_mib(field):
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(field)) / 1024
+
+method, path = sys.argv[1], sys.argv[2]
+full = Compose([EnsureChannelFirst(channel_dim="no_channel"), ScaleIntensity(), Resize((224, 224))])
+with open(path, "rb") as f:
+    data = f.read()
+with open("/proc/self/clear_refs", "w") as f:
+    f.write("5")
+baseline = rss_mib("VmRSS:")
+start = time.perf_counter()
+if method == "full":
+    image = Image.open(path).convert("L")
+    batch = full(np.asarray(image, dtype=np.float32)).unsqueeze(0)
+else:
+    batch = torch.empty((1, 1, 224, 224))
+    decode_image_2d(path, (224, 224), out=batch.numpy()[0, 0])
+elapsed = time.perf_counter() - start
+assert tuple(batch.shape) == (1, 1, 224, 224)
+print(json.dumps({"ms": elapsed * 1000, "peak_mib": rss_mib("VmHWM:") - baseline}))
+"""
+
+
+def radiograph(size, rng):
+    """A smooth, noisy 0..1 image roughly like a chest film."""
+    y, x = np.mgrid[0:size, 0:size] / size
+    image = 0.5 + 0.3 * np.sin(6 * x) * np.cos(4 * y) - 0.4 * ((x - 0.5) ** 2 + (y - 0.5) ** 2)
+    return np.clip(image + rng.normal(0, 0.03, image.shape), 0, 1)
+
+
+def write_images(tmp, size):
+    rng = np.random.default_rng(0)
+    pixels = radiograph(size, rng)
+    gray8 = (pixels * 255).astype(np.uint8)
+    paths = {
+        "jpeg L": os.path.join(tmp, "gray.jpg"),
+        "jpeg RGB": os.path.join(tmp, "rgb.jpg"),
+        "png L": os.path.join(tmp, "gray.png"),
+        "png 16-bit": os.path.join(tmp, "deep.png"),
+    }
+    Image.fromarray(gray8).save(paths["jpeg L"], quality=90)
+    Image.fromarray(np.stack([gray8] * 3, axis=-1)).save(paths["jpeg RGB"], quality=90)
+    Image.fromarray(gray8).save(paths["png L"])
+    Image.fromarray((pixels * 65535).astype(np.uint16)).save(paths["png 16-bit"])
+    return paths
+
+
+def run(method, path, repeat):
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", CHILD, method, path], cwd=BACKEND_DIR,
+                              capture_output=True, text=True)
+        if proc.returncode:
+            sys.exit(proc.stderr[-2000:])
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="2D image decode benchmark")
+    parser.add_argument("--size", type=int, default=3000, help="image width and height in pixels")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.size}x{args.size} images")
+    print(f"{'image':>12} {'KiB':>8} {'method':>8} {'ms':>9} {'peak MiB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, path in write_images(tmp, args.size).items():
+            for method in ("full", "reduced"):
+                result = run(method, path, args.repeat)
+                print(f"{name:>12} {os.path.getsize(path) / 1024:>8.0f} {method:>8} "
+                      f"{result['ms']:>9.1f} {result['peak_mib']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark login throughput against concurrency.
+
+Creates users in a throwaway SQLite database, then runs
+AuthService.authenticate_user from a growing number of client threads.
+Password work goes through the shared hashing pool, so throughput should
+level off at roughly PASSWORD_HASH_WORKERS cores' worth of bcrypt.
+
+Usage (from the backend directory):
+    python benchmarks/bench_login.py [--rounds 12] [--workers 4] [--logins 64]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput vs. concurrency")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost")
+    parser.add_argument("--workers", type=int, default=None, help="password hashing pool size")
+    parser.add_argument("--logins", type=int, default=64, help="logins per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    if args.workers:
+        os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from services.database import Base
+    from services.auth_service import AuthService
+    from services.password_hashing import password_hasher
+    from models.user import User
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+
+        users = max(args.concurrency)
+        hashed = password_hasher.hash("benchmark-password")
+        with Session() as db:
+            db.add_all([
+                User(username=f"tech{i}", email=f"tech{i}@lab.local", hashed_password=hashed)
+                for i in range(users)
+            ])
+            db.commit()
+
+        def login(i):
+            with Session() as db:
+                assert AuthService.authenticate_user(f"tech{i % users}", "benchmark-password", db)
+
+        print(f"bcrypt rounds={args.rounds} hashing workers={password_hasher.max_workers}")
+        print(f"{'clients':>8} {'logins/s':>10} {'p50 ms':>8}")
+        for clients in args.concurrency:
+            latencies = []
+
+            def timed_login(i):
+                start = time.perf_counter()
+                login(i)
+                latencies.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=clients) as pool:
+                list(pool.map(timed_login, range(args.logins)))
+            elapsed = time.perf_counter() - start
+            latencies.sort()
+            print(f"{clients:>8} {args.logins / elapsed:>10.1f} {latencies[len(latencies) // 2] * 1000:>8.1f}")
+        password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
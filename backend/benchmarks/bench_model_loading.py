@@ -0,0 +1,115 @@
+"""Compare cold-load time and peak memory of pickled models and model packages.
+
+For each model, saves the service's network once as a pickled ``.pt``
+module and once as a package (architecture config plus safetensors
+weights), then loads each in a fresh process through the service's own
+``load_model``. The files are evicted from the page cache before every
+run, so the timings include reading from disk. Reports the load time,
+the time of the first inference (which faults in mapped weights), and
+how far the process's peak RSS rose above its level after imports
+(Linux only, since it reads /proc/self/status).
+
+Usage (from the backend directory):
+    python benchmarks/bench_model_loading.py [--models xray mri ct lab] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+CHILD = r"""
+import json, sys, time
+import torch
+from services.imaging_service import ImagingAnalysisService
+from services.test_analysis_service import TestAnalysisService
+
+def rss_mib(field):
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(field)) / 1024
+
+name, path = sys.argv[1], sys.argv[2]
+# Reset the peak RSS so imports do not count
+with open("/proc/self/clear_refs", "w") as f:
+    f.write("5")
+baseline = rss_mib("VmRSS:")
+start = time.perf_counter()
+if name == "lab":
+    service = TestAnalysisService(model_path=path)
+else:
+    service = ImagingAnalysisService(name, model_path=path)
+loaded = time.perf_counter()
+if name == "lab":
+    with torch.no_grad():
+        service.model(torch.zeros((2, len(service.reference_ranges.fields))))
+else:
+    service.warm_up()
+inferred = time.perf_counter()
+print(json.dumps({"load_ms": (loaded - start) * 1000, "first_inference_ms": (inferred - loaded) * 1000,
+                  "peak_mib": rss_mib("VmHWM:") - baseline}))
+"""
+
+
+def prepare(name, tmp):
+    import torch
+    from services.imaging_service import ImagingAnalysisService
+    from services.test_analysis_service import TestAnalysisService
+
+    service = TestAnalysisService() if name == "lab" else ImagingAnalysisService(name)
+    if name == "lab" and not isinstance(service.model, torch.nn.Module):
+        # The default lab model may be an exported NumPy model
+        service.model = service._build_network().eval()
+    pickled = os.path.join(tmp, f"{name}_model.pt")
+    torch.save(service.model, pickled)
+    package = service.export_package(os.path.join(tmp, f"{name}_model"))
+    return {"pickle": pickled, "package": package}
+
+
+def evict(path):
+    """Drop a file, or every file in a directory, from the page cache."""
+    paths = [os.path.join(path, entry) for entry in os.listdir(path)] if os.path.isdir(path) else [path]
+    for file_path in paths:
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def run(name, path, repeat):
+    runs = []
+    for _ in range(repeat):
+        evict(path)
+        proc = subprocess.run([sys.executable, "-c", CHILD, name, path], cwd=BACKEND_DIR,
+                              capture_output=True, text=True)
+        if proc.returncode:
+            sys.exit(proc.stderr[-2000:])
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model file cold-load benchmark")
+    parser.add_argument("--models", nargs="+", default=["xray", "mri", "ct", "lab"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'model':>6} {'format':>8} {'size MiB':>9} {'load ms':>9} {'1st infer ms':>13} {'peak MiB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.models:
+            for fmt, path in prepare(name, tmp).items():
+                size = sum(os.path.getsize(os.path.join(path, entry)) for entry in os.listdir(path)) \
+                    if os.path.isdir(path) else os.path.getsize(path)
+                result = run(name, path, args.repeat)
+                print(f"{name:>6} {fmt:>8} {size / 2**20:>9.1f} {result['load_ms']:>9.1f} "
+                      f"{result['first_inference_ms']:>13.1f} {result['peak_mib']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Measure inference throughput and fp32 drift for each precision mode.
+
+For each imaging modality and each of fp32, bf16 autocast and
+channels-last, runs the accuracy check against fp32 on the reference set
+(see ``ImagingAnalysisService.reference_inputs``) and then times forward
+passes at the given batch sizes. A mode that fails the check is still
+timed, and marked as rejected.
+
+Usage (from the backend directory):
+    python benchmarks/bench_precision.py [--modalities xray mri ct] [--batch-sizes 1 8] [--seconds 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from services.imaging_service import ImagingAnalysisService
+from services.precision import PRECISIONS, accuracy_report, autocast, memory_format
+
+
+def throughput(service, precision, batch_size, seconds):
+    inputs = torch.cat(service.reference_inputs(batch_size))
+    inputs = inputs.contiguous(memory_format=memory_format(precision, service.spatial_dims))
+    service.model.to(memory_format=memory_format(precision, service.spatial_dims))
+    with torch.no_grad(), autocast(precision):
+        service.model(inputs)
+        runs = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            service.model(inputs)
+            runs += 1
+        elapsed = time.perf_counter() - start
+    return runs * batch_size / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inference precision benchmark")
+    parser.add_argument("--modalities", nargs="+", default=["xray", "mri", "ct"])
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--seconds", type=float, default=3.0, help="timing budget per measurement")
+    args = parser.parse_args()
+
+    print(f"torch {torch.__version__}, {torch.get_num_threads()} threads")
+    columns = "".join(f"{f'img/s b={size}':>12}" for size in args.batch_sizes)
+    print(f"{'modality':>8} {'precision':>14} {'agree':>7} {'drift':>8} {'check':>8}{columns}  speed-up")
+    for modality in args.modalities:
+        service = ImagingAnalysisService(modality)
+        reference = service.reference_inputs()
+        baseline = None
+        for precision in PRECISIONS:
+            report = accuracy_report(service.model, reference, precision, service.spatial_dims)
+            rates = [throughput(service, precision, size, args.seconds) for size in args.batch_sizes]
+            baseline = baseline or rates
+            speedup = " ".join(f"{rate / base:.2f}x" for rate, base in zip(rates, baseline))
+            print(f"{modality:>8} {precision:>14} {report['prediction_agreement']:>7.2%} "
+                  f"{report['max_confidence_drift']:>8.4f} {'ok' if report['passed'] else 'rejected':>8}"
+                  + "".join(f"{rate:>12.1f}" for rate in rates) + f"  {speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark bulk user provisioning against one-by-one registration.
+
+Creates the same users in two throwaway SQLite databases: once through
+AuthService.create_user per row, as repeated /register calls would, and
+once through UserProvisioningService. At production bcrypt costs the
+hashing dominates both, so the bulk path mostly wins by hashing on every
+pool worker at once; the per-row SELECTs and commits show at low costs.
+
+Usage (from the backend directory):
+    python benchmarks/bench_provisioning.py [--users 1000] [--rounds 12] [--workers 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk vs. one-by-one user creation")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost")
+    parser.add_argument("--workers", type=int, default=None, help="password hashing pool size")
+    args = parser.parse_args()
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    if args.workers:
+        os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+
+    from sqlalchemy.orm import sessionmaker
+    from services.database import Base, create_db_engine
+    from services.auth_service import AuthService
+    from services.password_hashing import password_hasher
+    from services.user_provisioning import UserProvisioningService
+
+    rows = [
+        {"username": f"tech{i}", "email": f"tech{i}@lab.local", "password": f"password-{i}", "line": i + 2}
+        for i in range(args.users)
+    ]
+    print(f"users={args.users} bcrypt rounds={args.rounds} hashing workers={password_hasher.max_workers}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("one-by-one", "bulk"):
+            engine = create_db_engine(f"sqlite:///{tmp}/{name}.db")
+            Base.metadata.create_all(bind=engine)
+            with sessionmaker(bind=engine)() as db:
+                start = time.perf_counter()
+                if name == "bulk":
+                    UserProvisioningService().provision(db, [dict(row) for row in rows])
+                else:
+                    for row in rows:
+                        AuthService.create_user(row["username"], row["email"], row["password"], db)
+                elapsed = time.perf_counter() - start
+            engine.dispose()
+            print(f"{name:>10}: {elapsed:8.2f}s  {args.users / elapsed:8.1f} users/s")
+    password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Compare FastAPI's default response encoding with the typed orjson path.
+
+Analyzes a batch of lab rows once, then times encoding the results with
+``jsonable_encoder`` plus ``json.dumps`` (the default for handlers that
+return dicts) against schema validation plus orjson, and MessagePack when
+msgpack is installed. The default encoder cannot handle the NumPy arrays
+the service returns, so it is given a copy converted with ``tolist``.
+
+Usage (from the backend directory):
+    python benchmarks/bench_serialization.py [--rows 500] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from schemas.analysis import LabAnalysisResult
+from services.serialization import JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, msgpack, typed_response
+from services.test_analysis_service import TestAnalysisService
+
+
+def timed(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response serialization benchmark")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    service = TestAnalysisService()
+    rows = [{"WBC": 4 + i % 10, "Hemoglobin": 10 + i % 8, "Glucose": 90 + i % 50} for i in range(args.rows)]
+    results = service.analyze_batch(rows)
+    for result in results:
+        result["model_version"] = "default"
+    plain = [{**result, "results": {key: value.tolist() for key, value in result["results"].items()}}
+             for result in results]
+
+    candidates = {
+        "jsonable_encoder + json": lambda: len(json.dumps(jsonable_encoder(plain)).encode()),
+        "schema + orjson": lambda: len(typed_response("bench", LabAnalysisResult, results, JSON_MEDIA_TYPE).body),
+    }
+    if msgpack is not None:
+        candidates["schema + msgpack"] = lambda: len(
+            typed_response("bench", LabAnalysisResult, results, MSGPACK_MEDIA_TYPE).body
+        )
+    print(f"{args.rows} results")
+    print(f"{'encoder':>26} {'ms':>9} {'KiB':>9}")
+    for name, function in candidates.items():
+        ms, size = timed(function, args.repeat)
+        print(f"{name:>26} {ms:>9.2f} {size / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
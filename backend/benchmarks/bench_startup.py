@@ -0,0 +1,109 @@
+"""Measure backend start-up: import time by package and time to live/ready.
+
+First runs ``python -X importtime -c "import main"`` and sums the
+self-time of every imported module by top-level package, so a change that
+drags torch or pandas back into the import path shows up at once. Then
+starts uvicorn in each model loading mode and reports how long
+``/health/live`` and ``/health/ready`` take to answer 200, plus each
+model's load time.
+
+Usage (from the backend directory):
+    python benchmarks/bench_startup.py [--top 15] [--modes background eager lazy]
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|\s+(\S+)")
+
+
+def import_breakdown(env, top):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode:
+        sys.exit(proc.stderr[-2000:])
+    by_package = {}
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            package = match.group(3).split(".")[0]
+            by_package[package] = by_package.get(package, 0) + int(match.group(1))
+    print(f"import main: {wall:.2f}s wall (interpreter start included)")
+    print(f"{'package':>24} {'self ms':>9}")
+    for package, micros in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"{package:>24} {micros / 1000:>9.1f}")
+    heavy = [name for name in ("torch", "monai", "pandas", "PIL", "numpy") if name in by_package]
+    print(f"heavy modules imported at start-up: {', '.join(heavy) or 'none'}")
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=2) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+    except (urllib.error.URLError, ConnectionError, TimeoutError):
+        return None, None
+
+
+def time_to_ready(env, mode, timeout=300):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = {**env, "MODEL_LOADING": mode}
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    live = ready = None
+    payload = {}
+    try:
+        while time.perf_counter() - start < timeout and ready is None:
+            if live is None and get(f"http://127.0.0.1:{port}/health/live")[0] == 200:
+                live = time.perf_counter() - start
+            if live is not None:
+                status, payload = get(f"http://127.0.0.1:{port}/health/ready")
+                if status == 200:
+                    ready = time.perf_counter() - start
+            time.sleep(0.05)
+    finally:
+        server.terminate()
+        server.wait()
+    loads = ", ".join(
+        f"{name} {model['load_seconds']}s" for name, model in (payload or {}).get("models", {}).items()
+        if model["load_seconds"] is not None
+    )
+    print(f"{mode:>10}: live {live or float('nan'):6.2f}s  ready {ready or float('nan'):6.2f}s  {loads}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend start-up profile")
+    parser.add_argument("--top", type=int, default=15, help="packages to list")
+    parser.add_argument("--modes", nargs="+", default=["background", "eager", "lazy"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp}/startup.db",
+               "AUDIT_FALLBACK_PATH": os.path.join(tmp, "audit.jsonl")}
+        import_breakdown(env, args.top)
+        print()
+        for mode in args.modes:
+            time_to_ready(env, mode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Compare worker memory with and without shared, memory-mapped weights.
+
+Starts the backend with N uvicorn workers in two ways: through
+scripts/serve.py, where workers map the same weight files, and plainly
+with ``uvicorn --workers N``, where every worker builds its own models.
+Once all workers have loaded their models, it prints each worker's RSS,
+PSS, shared and private memory from /proc, and the summed PSS, which is
+what the workers really cost together. Linux only.
+
+Usage (from the backend directory):
+    python benchmarks/bench_workers.py [--workers 1 4 8]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from services.shared_weights import memory_report
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def worker_pids(parent):
+    """Children of the uvicorn master that run the app (not the resource tracker)."""
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read()
+        except OSError:
+            continue
+        if ppid == parent and b"spawn_main" in cmdline:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def wait_until_loaded(port, workers, timeout):
+    """Wait for /health/ready to answer and every worker to stop growing."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health/ready", timeout=2) as response:
+                if response.status == 200:
+                    break
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            pass
+        time.sleep(0.2)
+    # Workers finish eager loading independently; give the slowest time too
+    time.sleep(2 + workers)
+
+
+def measure(label, command, env, workers, weights_dir, timeout=600):
+    port = free_port()
+    server = subprocess.Popen(command + ["--port", str(port)], cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_loaded(port, workers, timeout)
+        # A single worker runs inside the uvicorn process itself
+        pids = worker_pids(server.pid) or [server.pid]
+        reports = [memory_report(pid, weights_dir) for pid in pids]
+    finally:
+        server.terminate()
+        server.wait()
+    print(f"{label}, {workers} workers")
+    print(f"  {'pid':>7} {'rss':>8} {'pss':>8} {'shared':>8} {'private':>8} {'weights':>8}  (MiB)")
+    for report in reports:
+        print(f"  {report['pid']:>7} {report['rss_mib']:>8.1f} {report['pss_mib']:>8.1f} "
+              f"{report['shared_mib']:>8.1f} {report['private_mib']:>8.1f} "
+              f"{report.get('weights_rss_mib', 0.0):>8.1f}")
+    total = sum(report["pss_mib"] for report in reports)
+    print(f"  total PSS {total:.1f} MiB, {total / max(1, len(reports)):.1f} MiB per worker")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker vs. shared memory")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        sys.exit("This benchmark reads /proc and only runs on Linux")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        weights_dir = os.path.join(tmp, "weights")
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp}/bench.db", "SECRET_KEY": "bench",
+               "AUDIT_FALLBACK_PATH": os.path.join(tmp, "audit.jsonl"), "MODEL_LOADING": "eager"}
+        for workers in args.workers:
+            measure("shared weights", [sys.executable, "scripts/serve.py", "--workers", str(workers),
+                                       "--weights-dir", weights_dir], env, workers, weights_dir)
+            measure("private weights", [sys.executable, "-m", "uvicorn", "main:app", "--workers", str(workers)],
+                    env, workers, None)
+
+
+if __name__ == "__main__":
+    main()
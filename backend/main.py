@@ -1,28 +1,53 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Security
+import time
+
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Depends, Security, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import uvicorn
 import os
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
-import torch
-import monai
-from PIL import Image
-import io
-import numpy as np
-from services.imaging_service import ImagingAnalysisService
-from services.test_analysis_service import TestAnalysisService
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
-from services.database import get_db, init_db, Base, engine
-from services.auth_service import AuthService
+import hashlib
+import logging
+import re
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, Any, List
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from services.database import get_async_db, init_db
+from services.auth_service import AuthService, user_cache
+from services.lab_history_service import LabHistoryService
+from services.history_service import AnalysisHistoryService
+from services.audit_log import audit_log
+from services.report_service import ReportService
+from services.artifact_store import ArtifactStore, parse_range
+from services.preview_pyramid import preview_cache
+from services.dicom_index import DicomIndexService, read_header
+from services.model_registry import ModelRegistry
+from services.shared_weights import memory_report
+from services.user_provisioning import UserProvisioningService
+from services.serialization import serialization_stats, typed_response
+from schemas.analysis import ImagingAnalysisResult, LabAnalysisResult
 from models.user import User
+from models.lab_history import LabObservation, LabTrend
+from models.analysis import Analysis
+from models.audit import AuditEvent
+from models.artifact import Artifact
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
+
+# How analysis models are loaded: "background" starts serving at once and
+# warms every model on a worker thread, "eager" loads them all before
+# accepting requests, "lazy" loads each one on its first request
+MODEL_LOADING = os.getenv("MODEL_LOADING", "background")
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+MODEL_VERSIONS_DIR = os.getenv(
+    "MODEL_VERSIONS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "versions")
+)
 
 app = FastAPI(title="NeuroLab AI Backend")
 
@@ -36,25 +61,71 @@ app.add_middleware(
 )
 
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 # Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+os.makedirs(STATIC_DIR, exist_ok=True)
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+
+# Analysis services import torch, MONAI and pandas, so they are built by
+# the registry rather than at import time
+def _imaging_service(modality: str):
+    def build(model_path: Optional[str] = None):
+        from services.imaging_service import CASCADE_MODALITIES, ImagingAnalysisService
+        from services.precision import FP32, configured_precision
+        service = ImagingAnalysisService(modality, model_path)
+        if modality in CASCADE_MODALITIES:
+            service.enable_cascade()
+        precision = configured_precision(modality)
+        if precision == FP32:
+            service.warm_up()
+            return service
+        try:
+            # Checked against fp32 on the reference set; warms up on success
+            service.set_precision(precision)
+        except ValueError as e:
+            logger.warning("Keeping %s at fp32: %s", modality, e)
+            service.warm_up()
+        return service
+    return build
+
+def _test_service(model_path: Optional[str] = None):
+    from services.test_analysis_service import TestAnalysisService
+    return TestAnalysisService(model_path)
+
+model_registry = ModelRegistry({
+    "lab": _test_service,
+    "xray": _imaging_service("xray"),
+    "mri": _imaging_service("mri"),
+    "ct": _imaging_service("ct"),
+}, state_dir=MODEL_VERSIONS_DIR)  # Workers share the active version of each model
 
 # Initialize services
-imaging_services = {
-    "xray": ImagingAnalysisService("xray"),
-    "mri": ImagingAnalysisService("mri"),
-    "ct": ImagingAnalysisService("ct")
-}
-test_service = TestAnalysisService()
+lab_history_service = LabHistoryService()
+history_service = AnalysisHistoryService()
+report_service = ReportService()
+artifact_store = ArtifactStore()
+user_provisioning = UserProvisioningService()
+dicom_index = DicomIndexService()
 
-# Initialize database
-init_db()
+@app.on_event("startup")
+def initialize():
+    # Create tables
+    init_db()
+    audit_log.start()
+    if MODEL_LOADING == "eager":
+        model_registry.preload()
+    elif MODEL_LOADING == "background":
+        model_registry.preload_in_background()
+
+@app.on_event("shutdown")
+def stop_audit_log():
+    audit_log.stop()
+
+@app.on_event("shutdown")
+def stop_report_service():
+    report_service.shutdown()
 
 # Models
 class Token(BaseModel):
@@ -64,11 +135,6 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     username: Optional[str] = None
 
-class AnalysisResult(BaseModel):
-    result: str
-    confidence: float
-    timestamp: datetime
-
 class UserCreate(BaseModel):
     username: str
     email: str
@@ -83,26 +149,152 @@ class UserResponse(BaseModel):
         orm_mode = True
 
 # Authentication functions
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    return await AuthService.verify_token_async(token, db)
+
+async def get_current_admin(current_user: User = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return current_user
+
+def client_ip(request: Request) -> Optional[str]:
+    return request.client.host if request.client else None
+
+async def record_analysis(db: AsyncSession, request: Request, user: User, modality: str,
+                          result: Dict[str, Any], patient_id: Optional[str] = None) -> None:
+    analysis = await db.run_sync(history_service.record, user.id, modality, result, patient_id)
+    result["analysis_id"] = analysis.id
+    audit_log.log("analysis", user.username, f"analysis:{analysis.id}", client_ip(request),
+                  modality=modality, patient_id=patient_id)
+
+async def store_artifact(db: AsyncSession, data: bytes, content_type: Optional[str],
+                         filename: Optional[str], kind: str) -> Dict[str, Any]:
+    sha256 = await run_in_threadpool(artifact_store.write_bytes, data)
+    return await db.run_sync(
+        artifact_store.index, sha256, len(data), content_type or "application/octet-stream", filename, kind
+    )
+
+def artifact_response(request: Request, artifact: Dict[str, Any]) -> Response:
+    """Serve a stored artifact with a strong ETag, conditional GET and byte ranges."""
+    etag = artifact_store.etag(artifact["sha256"])
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        # Content never changes under a given hash
+        "Cache-Control": "private, max-age=31536000, immutable",
+    }
+    if artifact.get("filename"):
+        headers["Content-Disposition"] = f'inline; filename="{artifact["filename"]}"'
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    size = artifact["size"]
+    if_range = request.headers.get("if-range")
+    try:
+        byte_range = parse_range(request.headers.get("range"), size) if if_range in (None, etag) else None
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    start, end = byte_range if byte_range else (0, size - 1)
+    headers["Content-Length"] = str(end - start + 1)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return StreamingResponse(
+        artifact_store.iter_range(artifact["sha256"], start, end),
+        status_code=206 if byte_range else 200,
+        media_type=artifact["content_type"],
+        headers=headers,
+    )
+
+async def ensure_model(name: str) -> None:
+    """Wait off the event loop until a model has loaded."""
+    if model_registry.is_ready(name):
+        return
+    try:
+        await run_in_threadpool(model_registry.get, name)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+def write_model_file(path: str, contents: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(contents)
+    os.replace(tmp_path, path)
+
+def decode_and_analyze(service, contents: bytes) -> Dict[str, Any]:
+    # The service decodes the bytes itself: images, or .npy volumes for mri/ct
+    return service.analyze(contents)
+
+async def analyze_upload(modality: str, request: Request, file: UploadFile, user: User,
+                         db: AsyncSession) -> Dict[str, Any]:
+    await ensure_model(modality)
+    try:
+        contents = await file.read()
+        artifact = await store_artifact(db, contents, file.content_type, file.filename, modality)
+        # A model swap during the request does not affect it
+        with model_registry.lease(modality) as model:
+            result = await run_in_threadpool(decode_and_analyze, model.service, contents)
+        result["model_version"] = model.version
+        result["artifact_sha256"] = artifact["sha256"]
+        await record_analysis(db, request, user, modality, result)
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+def respond(request: Request, schema, content) -> Response:
+    """Return a typed analysis result as JSON, or MessagePack if the client asks for it."""
+    route = request.scope.get("route")
+    endpoint = route.path if route is not None else request.url.path
+    return typed_response(endpoint, schema, content, request.headers.get("accept"))
 
-def create_access_token(data: dict) -> str:
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+async def get_owned_analysis(db: AsyncSession, analysis_id: int, user: User) -> Dict[str, Any]:
+    analysis = await db.run_sync(history_service.get, analysis_id)
+    if analysis is None or (not user.is_admin and analysis["user_id"] != user.id):
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return analysis
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    return AuthService.verify_token(token, db)
+async def get_readable_artifact(db: AsyncSession, sha256: str, user: User) -> Dict[str, Any]:
+    """An artifact's metadata, if the user is an admin or ran an analysis on it; 404 otherwise."""
+    artifact = await db.run_sync(artifact_store.get, sha256)
+    if artifact is None or not (
+        user.is_admin or await db.run_sync(history_service.references_artifact, user.id, sha256)
+    ):
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    return artifact
+
+async def ensure_patient_access(db: AsyncSession, patient_id: str, user: User) -> None:
+    """Admins see every patient; other users only those they recorded analyses for."""
+    if not user.is_admin and not await db.run_sync(history_service.analyzed_patient, user.id, patient_id):
+        raise HTTPException(status_code=404, detail="Patient not found")
 
 # Routes
+@app.get("/health/live")
+async def health_live():
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def health_ready(db: AsyncSession = Depends(get_async_db)):
+    try:
+        await db.execute(text("SELECT 1"))
+        database = True
+    except Exception:
+        database = False
+    ready = database and model_registry.ready
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "database": database,
+            "model_loading": MODEL_LOADING,
+            "models": model_registry.status(),
+            "import_seconds": IMPORT_SECONDS,
+        },
+    )
+
 @app.post("/register", response_model=UserResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = AuthService.create_user(
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await AuthService.create_user_async(
         username=user.username,
         email=user.email,
         password=user.password,
@@ -111,8 +303,10 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     return db_user
 
 @app.post("/token", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = AuthService.authenticate_user(form_data.username, form_data.password, db)
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(),
+                db: AsyncSession = Depends(get_async_db)):
+    user = await AuthService.authenticate_user_async(form_data.username, form_data.password, db)
+    audit_log.log("login" if user else "login_failed", form_data.username, client_ip=client_ip(request))
     if not user:
         raise HTTPException(
             status_code=401,
@@ -120,64 +314,378 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
             headers={"WWW-Authenticate": "Bearer"},
         )
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
+    access_token = AuthService.create_access_token(
         data={"sub": user.username}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/users/me", response_model=UserResponse)
-def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
 
-@app.post("/analyze/xray")
-async def analyze_xray(
+@app.get("/admin/auth-cache")
+async def read_auth_cache_stats(current_user: User = Depends(get_current_admin)):
+    return user_cache.stats()
+
+@app.post("/admin/users/bulk")
+async def provision_users(
+    request: Request,
     file: UploadFile = File(...),
-    current_user: str = Depends(get_current_user)
+    current_user: User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        result = imaging_services["xray"].analyze(image)
-        return result
-    except Exception as e:
+        rows = user_provisioning.parse_csv((await file.read()).decode("utf-8-sig"))
+        summary = await user_provisioning.provision_async(db, rows)
+    except (UnicodeDecodeError, ValueError) as e:
         raise HTTPException(status_code=400, detail=str(e))
+    audit_log.log("users_provisioned", current_user.username, client_ip=client_ip(request),
+                  created=summary["created"], rejected=len(summary["errors"]))
+    return summary
+
+@app.get("/admin/memory")
+async def read_memory_report(current_user: User = Depends(get_current_admin)):
+    return {**memory_report(), "models": model_registry.status()}
+
+@app.get("/admin/models")
+async def read_models(current_user: User = Depends(get_current_admin)):
+    return model_registry.status()
+
+@app.post("/admin/models/{name}/versions", status_code=202)
+async def deploy_model_version(
+    name: str,
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    path: Optional[str] = Form(None),
+    version: Optional[str] = Form(None),
+    current_user: User = Depends(get_current_admin)
+):
+    """Upload or register a model file and switch to it once it has loaded.
+
+    Model files are unpickled, so only admins may deploy them.
+    """
+    if name not in model_registry.status():
+        raise HTTPException(status_code=404, detail=f"Unknown model '{name}'")
+    if version is not None and not re.fullmatch(r"[A-Za-z0-9][A-Za-z0-9._-]{0,63}", version):
+        raise HTTPException(status_code=400, detail="Invalid model version")
+    if file is not None:
+        contents = await file.read()
+        version = version or hashlib.sha256(contents).hexdigest()[:12]
+        suffix = ".npz" if (file.filename or "").endswith(".npz") else ".pt"
+        path = os.path.join(MODEL_VERSIONS_DIR, name, f"{version}{suffix}")
+        await run_in_threadpool(write_model_file, path, contents)
+    elif path is None or not os.path.exists(path):
+        # Registered paths may also be model package directories
+        raise HTTPException(status_code=400, detail="Upload a model file or give the path of an existing one")
+    else:
+        version = version or datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    try:
+        deploy = model_registry.deploy(name, version, path)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    audit_log.log("model_deploy", current_user.username, f"model:{name}", client_ip(request),
+                  version=version, path=path)
+    return deploy
+
+@app.post("/admin/models/{name}/rollback")
+async def rollback_model(name: str, request: Request, current_user: User = Depends(get_current_admin)):
+    if name not in model_registry.status():
+        raise HTTPException(status_code=404, detail=f"Unknown model '{name}'")
+    try:
+        status = model_registry.rollback(name)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    audit_log.log("model_rollback", current_user.username, f"model:{name}", client_ip(request),
+                  version=status["active"]["version"])
+    return status
+
+@app.get("/admin/serialization")
+async def read_serialization_stats(current_user: User = Depends(get_current_admin)):
+    return serialization_stats.snapshot()
+
+@app.get("/admin/previews")
+async def read_preview_cache_stats(current_user: User = Depends(get_current_admin)):
+    return await run_in_threadpool(preview_cache.stats)
+
+@app.get("/admin/audit-log")
+async def read_audit_log_stats(current_user: User = Depends(get_current_admin)):
+    return audit_log.stats()
+
+@app.post("/analyze/xray", response_model=ImagingAnalysisResult)
+async def analyze_xray(
+    request: Request,
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    result = await analyze_upload("xray", request, file, current_user, db)
+    return respond(request, ImagingAnalysisResult, result)
 
-@app.post("/analyze/mri")
+@app.post("/analyze/mri", response_model=ImagingAnalysisResult)
 async def analyze_mri(
+    request: Request,
     file: UploadFile = File(...),
-    current_user: str = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    try:
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        result = imaging_services["mri"].analyze(image)
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    result = await analyze_upload("mri", request, file, current_user, db)
+    return respond(request, ImagingAnalysisResult, result)
 
-@app.post("/analyze/ct")
+@app.post("/analyze/ct", response_model=ImagingAnalysisResult)
 async def analyze_ct(
+    request: Request,
     file: UploadFile = File(...),
-    current_user: str = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    result = await analyze_upload("ct", request, file, current_user, db)
+    return respond(request, ImagingAnalysisResult, result)
+
+@app.post("/analyze/test-results", response_model=LabAnalysisResult)
+async def analyze_test_results(
+    request: Request,
+    data: Dict[str, Any],
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    await ensure_model("lab")
     try:
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        result = imaging_services["ct"].analyze(image)
-        return result
+        with model_registry.lease("lab") as model:
+            result = await run_in_threadpool(model.service.analyze, data)
+            values = model.service.extract_numeric_values(data)
+        result["model_version"] = model.version
+        patient_id = data.get("patient_id")
+        if patient_id is not None:
+            collected_at = data.get("collected_at")
+            result["trends"] = await db.run_sync(
+                lab_history_service.record,
+                str(patient_id),
+                values,
+                datetime.fromisoformat(collected_at) if collected_at else None,
+            )
+        await record_analysis(
+            db, request, current_user, "lab", result, str(patient_id) if patient_id is not None else None
+        )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    return respond(request, LabAnalysisResult, result)
 
-@app.post("/analyze/test-results")
-async def analyze_test_results(
-    data: Dict[str, Any],
-    current_user: str = Depends(get_current_user)
+@app.post("/analyze/test-results/batch", response_model=List[LabAnalysisResult])
+async def analyze_test_results_batch(
+    request: Request,
+    data: List[Dict[str, Any]],
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    await ensure_model("lab")
     try:
-        result = test_service.analyze(data)
-        return result
+        with model_registry.lease("lab") as model:
+            results = await run_in_threadpool(model.service.analyze_batch, data)
+        for result in results:
+            result["model_version"] = model.version
+        patient_ids = [
+            str(row["patient_id"]) if row.get("patient_id") is not None else None for row in data
+        ]
+        analyses = await db.run_sync(history_service.record_many, current_user.id, "lab", results, patient_ids)
+        for result, analysis, patient_id in zip(results, analyses, patient_ids):
+            result["analysis_id"] = analysis.id
+            audit_log.log("analysis", current_user.username, f"analysis:{analysis.id}", client_ip(request),
+                          modality="lab", patient_id=patient_id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    return respond(request, LabAnalysisResult, results)
+
+@app.get("/patients/{patient_id}/trends")
+async def get_patient_trends(
+    patient_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    await ensure_patient_access(db, patient_id, current_user)
+    return await db.run_sync(lab_history_service.get_trends, patient_id)
+
+@app.get("/patients/{patient_id}/history/{test}/{parameter}")
+async def get_patient_history(
+    patient_id: str,
+    test: str,
+    parameter: str,
+    limit: int = 100,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    await ensure_patient_access(db, patient_id, current_user)
+    return await db.run_sync(lab_history_service.get_history, patient_id, test, parameter, limit)
+
+@app.get("/history")
+async def list_history(
+    modality: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    abnormal: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    user_id: Optional[int] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Only admins may look at other users' history
+    if not current_user.is_admin:
+        user_id = current_user.id
+    try:
+        return await db.run_sync(
+            history_service.list, user_id, modality, start, end, abnormal, cursor, limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/history/{analysis_id}")
+async def get_history_entry(
+    analysis_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await get_owned_analysis(db, analysis_id, current_user)
+
+@app.post("/reports/{analysis_id}", status_code=202)
+async def create_report(
+    analysis_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    analysis = await get_owned_analysis(db, analysis_id, current_user)
+    return report_service.submit(analysis)
+
+@app.get("/reports/{analysis_id}")
+async def get_report_status(
+    analysis_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    await get_owned_analysis(db, analysis_id, current_user)
+    return report_service.status(analysis_id)
+
+@app.get("/reports/{analysis_id}/download")
+async def download_report(
+    analysis_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    await get_owned_analysis(db, analysis_id, current_user)
+    if report_service.status(analysis_id)["status"] != "done":
+        raise HTTPException(status_code=404, detail="Report not ready")
+    sha256, size = await run_in_threadpool(artifact_store.write_file, report_service.report_path(analysis_id))
+    artifact = await db.run_sync(
+        artifact_store.index, sha256, size, "application/pdf", f"neurolab_analysis_{analysis_id}.pdf", "report"
+    )
+    audit_log.log("report_download", current_user.username, f"report:{analysis_id}", client_ip(request))
+    return artifact_response(request, artifact)
+
+@app.get("/artifacts/{sha256}")
+async def download_artifact(
+    sha256: str,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    artifact = await get_readable_artifact(db, sha256, current_user)
+    return artifact_response(request, artifact)
+
+@app.get("/artifacts/{sha256}/preview")
+async def read_preview_manifest(
+    sha256: str,
+    slice_index: Optional[int] = Query(None, alias="slice", ge=0),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Levels and tile grid of an artifact's preview pyramid, laid out from its header on first request."""
+    await get_readable_artifact(db, sha256, current_user)
+    # Indexed DICOM is described by its index row instead of parsing the file
+    instance = await db.run_sync(dicom_index.get_instance_by_artifact, sha256)
+    try:
+        return await run_in_threadpool(
+            preview_cache.manifest, sha256, artifact_store.path(sha256), slice_index, instance
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/artifacts/{sha256}/tiles/{level}/{column}/{row}")
+async def read_preview_tile(
+    sha256: str,
+    level: str,
+    column: int,
+    row: int,
+    request: Request,
+    slice_index: Optional[int] = Query(None, alias="slice", ge=0),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Tiles are derived from immutable content, so they never change either
+    etag = f'"{sha256}-{slice_index}-{level}-{column}-{row}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=31536000, immutable"}
+    await get_readable_artifact(db, sha256, current_user)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    instance = await db.run_sync(dicom_index.get_instance_by_artifact, sha256)
+    try:
+        tile = await run_in_threadpool(
+            preview_cache.tile_bytes, sha256, artifact_store.path(sha256), level, column, row, slice_index, instance
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(tile, media_type="image/jpeg", headers=headers)
+
+# The DICOM index spans every patient and re-ingesting an instance replaces
+# its row, so only admins may add to it or browse it
+@app.post("/dicom/instances")
+async def ingest_dicom(
+    request: Request,
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Store a DICOM file and index its header, up to but not including the pixel data."""
+    contents = await file.read()
+    try:
+        header = await run_in_threadpool(read_header, contents)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    artifact = await store_artifact(db, contents, "application/dicom", file.filename, "dicom")
+    instance = await db.run_sync(dicom_index.index, header, artifact["sha256"])
+    audit_log.log("dicom_ingest", current_user.username, f"dicom:{instance['sop_instance_uid']}",
+                  client_ip(request), patient_id=header["patient_id"])
+    return instance
+
+@app.get("/dicom/series")
+async def find_dicom_series(
+    patient_id: Optional[str] = None,
+    modality: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    study_instance_uid: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    current_user: User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await db.run_sync(
+        dicom_index.find_series, patient_id, modality, date_from, date_to, study_instance_uid, limit
+    )
+
+@app.get("/dicom/series/{series_instance_uid}/instances")
+async def list_dicom_instances(
+    series_instance_uid: str,
+    current_user: User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db)
+):
+    instances = await db.run_sync(dicom_index.list_instances, series_instance_uid)
+    if not instances:
+        raise HTTPException(status_code=404, detail="Series not found")
+    return instances
+
+IMPORT_SECONDS = round(time.perf_counter() - _import_started, 3)
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=511, reload=True) 
\ No newline at end of file
+    # The reloader adds a file watcher process; opt in for development
+    uvicorn.run("main:app", host="0.0.0.0", port=511, reload=os.getenv("UVICORN_RELOAD", "0") == "1") 
\ No newline at end of file
@@ -0,0 +1,38 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, Index
+from services.database import Base
+# Register the users and artifacts tables that these tables refer to
+from models.artifact import Artifact  # noqa: F401
+from models.user import User  # noqa: F401
+
+class Analysis(Base):
+    __tablename__ = "analyses"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    modality = Column(String, nullable=False)
+    patient_id = Column(String, index=True)
+    result = Column(String)
+    confidence = Column(Float)
+    is_abnormal = Column(Boolean, nullable=False, default=False)
+    details = Column(Text)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # The trailing id keeps keyset pagination on (created_at, id) inside the index
+    __table_args__ = (
+        Index("ix_analyses_user_created", "user_id", "created_at", "id"),
+        Index("ix_analyses_modality_created", "modality", "created_at", "id"),
+        Index("ix_analyses_created", "created_at", "id"),
+    )
+
+class AnalysisArtifact(Base):
+    """The stored upload an analysis ran on, so artifact access can be checked by owner."""
+    __tablename__ = "analysis_artifacts"
+
+    analysis_id = Column(Integer, ForeignKey("analyses.id"), primary_key=True)
+    artifact_sha256 = Column(String(64), ForeignKey("artifacts.sha256"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+
+    __table_args__ = (
+        Index("ix_analysis_artifacts_user_artifact", "user_id", "artifact_sha256"),
+    )
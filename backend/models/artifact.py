@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger
+from services.database import Base
+
+class Artifact(Base):
+    """Metadata for one stored blob, keyed by the SHA-256 of its content."""
+    __tablename__ = "artifacts"
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String, nullable=False)
+    kind = Column(String, index=True)
+    filename = Column(String)
+    upload_count = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime, nullable=False)
+    last_uploaded_at = Column(DateTime, nullable=False)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from services.database import Base
+
+class AuditEvent(Base):
+    """One audited action; rows are written in batches by the audit log writer."""
+    __tablename__ = "audit_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String, nullable=False)
+    username = Column(String, index=True)
+    resource = Column(String)
+    client_ip = Column(String)
+    details = Column(Text)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_audit_events_type_created", "event_type", "created_at"),
+    )
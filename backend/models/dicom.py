@@ -0,0 +1,59 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, BigInteger, Boolean, ForeignKey, Index
+from services.database import Base
+# Registers the artifacts table that instances refer to
+from models.artifact import Artifact  # noqa: F401
+
+class DicomStudy(Base):
+    __tablename__ = "dicom_studies"
+
+    study_instance_uid = Column(String(64), primary_key=True)
+    patient_id = Column(String, index=True)
+    patient_name = Column(String)
+    study_date = Column(Date, index=True)
+    study_description = Column(String)
+    accession_number = Column(String)
+    indexed_at = Column(DateTime, nullable=False)
+
+class DicomSeries(Base):
+    __tablename__ = "dicom_series"
+
+    series_instance_uid = Column(String(64), primary_key=True)
+    study_instance_uid = Column(String(64), ForeignKey("dicom_studies.study_instance_uid"), nullable=False, index=True)
+    modality = Column(String(16))
+    # The study date when the series has none, so date queries need one table
+    series_date = Column(Date)
+    series_number = Column(Integer)
+    series_description = Column(String)
+    body_part = Column(String)
+
+    __table_args__ = (
+        Index("ix_dicom_series_modality_date", "modality", "series_date"),
+    )
+
+class DicomInstance(Base):
+    """One indexed DICOM file: its header tags and where its pixel data starts."""
+    __tablename__ = "dicom_instances"
+
+    sop_instance_uid = Column(String(64), primary_key=True)
+    series_instance_uid = Column(String(64), ForeignKey("dicom_series.series_instance_uid"), nullable=False)
+    artifact_sha256 = Column(String(64), ForeignKey("artifacts.sha256"), nullable=False, index=True)
+    sop_class_uid = Column(String(64))
+    instance_number = Column(Integer)
+    transfer_syntax_uid = Column(String(64))
+    rows = Column(Integer)
+    columns = Column(Integer)
+    number_of_frames = Column(Integer, nullable=False, default=1)
+    samples_per_pixel = Column(Integer)
+    bits_allocated = Column(Integer)
+    pixel_representation = Column(Integer)
+    photometric_interpretation = Column(String(16))
+    # File offset and length of the pixel data value; the length is null when
+    # the pixel data is encapsulated (compressed) with undefined length
+    pixel_data_offset = Column(BigInteger)
+    pixel_data_length = Column(BigInteger)
+    encapsulated = Column(Boolean, nullable=False, default=False)
+    indexed_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_dicom_instances_series", "series_instance_uid", "instance_number"),
+    )
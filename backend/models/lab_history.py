@@ -0,0 +1,40 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index
+from services.database import Base
+
+class LabObservation(Base):
+    __tablename__ = "lab_observations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    patient_id = Column(String, nullable=False)
+    test = Column(String, nullable=False)
+    parameter = Column(String, nullable=False)
+    value = Column(Float, nullable=False)
+    unit = Column(String)
+    observed_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_lab_observations_series", "patient_id", "test", "parameter", "observed_at"),
+    )
+
+class LabTrend(Base):
+    """Running aggregates for one patient's parameter, updated on every insert."""
+    __tablename__ = "lab_trends"
+
+    patient_id = Column(String, primary_key=True)
+    test = Column(String, primary_key=True)
+    parameter = Column(String, primary_key=True)
+    unit = Column(String)
+    count = Column(Integer, nullable=False, default=0)
+    first_observed_at = Column(DateTime)
+    last_observed_at = Column(DateTime)
+    last_value = Column(Float)
+    previous_value = Column(Float)
+    delta = Column(Float)
+    # Exponentially weighted rolling mean and variance
+    rolling_mean = Column(Float)
+    rolling_var = Column(Float)
+    # Least-squares sums over (days since first observation, value)
+    sum_t = Column(Float, nullable=False, default=0.0)
+    sum_y = Column(Float, nullable=False, default=0.0)
+    sum_tt = Column(Float, nullable=False, default=0.0)
+    sum_ty = Column(Float, nullable=False, default=0.0)
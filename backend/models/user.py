@@ -1,8 +1,6 @@
 from sqlalchemy import Column, Integer, String, Boolean
 from services.database import Base
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from services.password_hashing import password_hasher
 
 class User(Base):
     __tablename__ = "users"
@@ -16,7 +14,7 @@ class User(Base):
 
     @staticmethod
     def get_password_hash(password: str) -> str:
-        return pwd_context.hash(password)
+        return password_hasher.hash(password)
 
     def verify_password(self, plain_password: str) -> bool:
-        return pwd_context.verify(plain_password, self.hashed_password) 
\ No newline at end of file
+        return password_hasher.verify(plain_password, self.hashed_password) 
\ No newline at end of file
@@ -0,0 +1,131 @@
+from typing import Any, Dict, List, Literal, Optional, Union
+from pydantic import BaseModel, field_validator
+
+# Response schemas for the analysis endpoints. Services return plain dicts
+# that may hold NumPy arrays and scalars; the validators below turn those
+# into lists and Python numbers so every response has a fixed shape.
+
+
+def _to_python(value: Any) -> Any:
+    # NumPy arrays and scalars; checked by duck type so numpy is not imported here
+    return value.tolist() if hasattr(value, "tolist") else value
+
+
+class CascadeDecision(BaseModel):
+    # 1 when the low-resolution pass decided, 2 when the full model ran
+    stage: int
+    first_stage_abnormal_probability: float
+    first_stage_resolution: int
+    band: List[float]
+
+
+class EncodedMask(BaseModel):
+    # "rle": flat start, length pairs of runs of mask voxels in C order;
+    # "bitpacked": base64 of numpy.packbits of the flattened mask
+    encoding: Literal["rle", "bitpacked"]
+    runs: Optional[List[int]] = None
+    bits: Optional[str] = None
+
+
+class BoundingBox(BaseModel):
+    # Inclusive voxel indices
+    min: List[int]
+    max: List[int]
+
+
+class SegmentedClass(BaseModel):
+    label: int
+    voxels: int
+    volume_ml: float
+    bbox: Optional[BoundingBox] = None
+    mask: EncodedMask
+
+
+class SegmentationResult(BaseModel):
+    shape: List[int]
+    spacing_mm: List[float]
+    order: str
+    foreground_voxels: int
+    classes: List[SegmentedClass]
+
+
+class ImagingAnalysisResult(BaseModel):
+    result: str
+    confidence: float
+    is_abnormal: bool
+    modality: str
+    timestamp: str
+    model_version: str
+    artifact_sha256: Optional[str] = None
+    analysis_id: Optional[int] = None
+    cascade: Optional[CascadeDecision] = None
+    segmentation: Optional[SegmentationResult] = None
+
+    @field_validator("confidence", mode="before")
+    @classmethod
+    def _numpy_scalar(cls, value: Any) -> Any:
+        return _to_python(value)
+
+
+class ReferenceRange(BaseModel):
+    min: Optional[float] = None
+    max: Optional[float] = None
+    unit: Optional[str] = None
+    # Accepted values of a categorical test
+    normal: Optional[List[str]] = None
+
+
+class AbnormalFlag(BaseModel):
+    category: str
+    test: str
+    parameter: str
+    value: Union[int, float, str, None]
+    direction: str
+    severity: str
+    range: ReferenceRange
+
+    @field_validator("value", mode="before")
+    @classmethod
+    def _numpy_scalar(cls, value: Any) -> Any:
+        return _to_python(value)
+
+
+class LabPrediction(BaseModel):
+    probabilities: List[List[float]]
+    predictions: List[int]
+
+    @field_validator("probabilities", "predictions", mode="before")
+    @classmethod
+    def _numpy_array(cls, value: Any) -> Any:
+        return _to_python(value)
+
+
+class LabTrendSummary(BaseModel):
+    count: int
+    unit: Optional[str] = None
+    last_value: Optional[float] = None
+    previous_value: Optional[float] = None
+    delta: Optional[float] = None
+    rolling_mean: Optional[float] = None
+    rolling_std: Optional[float] = None
+    slope_per_day: Optional[float] = None
+    first_observed_at: Optional[str] = None
+    last_observed_at: Optional[str] = None
+
+
+class LabAnalysisResult(BaseModel):
+    results: LabPrediction
+    interpretation: str
+    abnormal_flags: List[AbnormalFlag]
+    confidence: float
+    timestamp: str
+    recommendations: List[str]
+    model_version: str
+    analysis_id: Optional[int] = None
+    # Per "<test>.<parameter>", when the request named a patient
+    trends: Optional[Dict[str, LabTrendSummary]] = None
+
+    @field_validator("confidence", mode="before")
+    @classmethod
+    def _numpy_scalar(cls, value: Any) -> Any:
+        return _to_python(value)
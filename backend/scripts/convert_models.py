@@ -0,0 +1,65 @@
+"""Convert pickled ``*_model.pt`` files into model packages.
+
+A package is a directory holding ``config.json`` (the architecture and its
+arguments) and ``model.safetensors`` (the weights). Services build the
+network from the config and memory-map the weights into it, so loading
+unpickles nothing. ``models/xray_model.pt`` becomes ``models/xray_model/``,
+which the services prefer over the ``.pt`` file; the original is left in
+place.
+
+Usage (from the backend directory):
+    python scripts/convert_models.py [models/xray_model.pt ...] [--output-dir models]
+"""
+import argparse
+import glob
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from services.imaging_service import ImagingAnalysisService
+from services.test_analysis_service import TestAnalysisService
+
+SUFFIX = "_model.pt"
+
+
+def convert(model_path: str, output_dir: str) -> str:
+    """Convert one ``<name>_model.pt`` file and return the package path."""
+    name = os.path.basename(model_path)[:-len(SUFFIX)]
+    package_path = os.path.join(output_dir, f"{name}_model")
+    if name == "test_analysis":
+        service = TestAnalysisService(model_path=model_path)
+    elif name in ("xray", "mri", "ct"):
+        service = ImagingAnalysisService(name, model_path=model_path)
+    else:
+        raise ValueError(f"No service for model '{name}'")
+    return service.export_package(package_path, source=os.path.basename(model_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("models", nargs="*", help=f"files to convert (default: models/*{SUFFIX})")
+    parser.add_argument("--output-dir", help="where to write packages (default: next to each file)")
+    args = parser.parse_args()
+
+    paths = args.models or sorted(glob.glob(os.path.join(BACKEND_DIR, "models", f"*{SUFFIX}")))
+    if not paths:
+        sys.exit(f"No *{SUFFIX} files found")
+    failed = 0
+    for path in paths:
+        if not path.endswith(SUFFIX):
+            print(f"Skipping {path}: not a *{SUFFIX} file")
+            continue
+        try:
+            package_path = convert(path, args.output_dir or os.path.dirname(os.path.abspath(path)))
+        except Exception as e:
+            failed += 1
+            print(f"Failed to convert {path}: {e}")
+        else:
+            print(f"Wrote {package_path}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Export the lab test model to a NumPy ``.npz`` file.
+
+BatchNorm layers are folded into the Linear weights, so the exported model
+runs as a few float32 matmuls and loads without torch. Place the output at
+``models/test_analysis_model.npz`` to have the service pick it up.
+
+Usage (from the backend directory):
+    python scripts/export_lab_model.py [--model models/test_analysis_model.pt] [--output PATH]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.test_analysis_service import TestAnalysisService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="torch model to export (defaults to the service's model)")
+    parser.add_argument("--output", default=os.path.join("models", "test_analysis_model.npz"))
+    args = parser.parse_args()
+
+    service = TestAnalysisService()
+    if args.model:
+        service.load_model(args.model)
+    service.export_numpy_model(args.output)
+    layers = service.numpy_model.layers
+    print(f"Exported {len(layers)} dense layers "
+          f"({service.numpy_model.in_features} -> {service.numpy_model.out_features}) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
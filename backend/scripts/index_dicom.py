@@ -0,0 +1,60 @@
+"""Store DICOM files in the artifact store and index their headers.
+
+Walks the given files and directories, parses each DICOM header up to the
+pixel data, copies the file into the artifact store and records its
+patient, study, series and instance tags with the pixel data offset.
+Files that are not DICOM are reported and skipped. Re-running over the
+same files updates their rows rather than duplicating them.
+
+Usage (from the backend directory):
+    python scripts/index_dicom.py /path/to/studies [more paths...]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.artifact_store import ArtifactStore
+from services.database import SessionLocal, init_db
+from services.dicom_index import DicomIndexService, read_header
+
+
+def iter_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for parent, _, names in os.walk(path):
+                for name in sorted(names):
+                    yield os.path.join(parent, name)
+        else:
+            yield path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="DICOM files or directories to index")
+    args = parser.parse_args()
+
+    store = ArtifactStore()
+    index = DicomIndexService()
+    init_db()
+    indexed = skipped = 0
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        for path in iter_files(args.paths):
+            try:
+                header = read_header(path)
+            except (ValueError, OSError) as e:
+                print(f"{path}: skipped: {e}")
+                skipped += 1
+                continue
+            artifact = store.put_file(db, path, "application/dicom", kind="dicom")
+            index.index(db, header, artifact["sha256"])
+            indexed += 1
+    elapsed = time.perf_counter() - start
+    print(f"Indexed {indexed} DICOM files ({skipped} skipped) in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Link analyses stored before the analysis_artifacts table existed to their uploads.
+
+Artifact downloads, previews and tiles are served to a non-admin user only
+through these links. Run once after upgrading; analyses that are already
+linked are skipped, so running it again is harmless.
+
+Usage (from the backend directory):
+    python scripts/link_analysis_artifacts.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.database import SessionLocal, init_db
+from services.history_service import AnalysisHistoryService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    init_db()
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        added = AnalysisHistoryService().link_artifacts(db, args.batch_size)
+    print(f"Linked {added} analyses to their artifacts in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
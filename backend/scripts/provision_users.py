@@ -0,0 +1,46 @@
+"""Create users in bulk from a CSV file.
+
+The CSV needs a header with ``username``, ``email`` and ``password``
+columns and may add an ``is_admin`` column (true/false). Rows that are
+invalid or already registered are reported and skipped; all others are
+created in one transaction.
+
+Usage (from the backend directory):
+    python scripts/provision_users.py users.csv
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.database import SessionLocal, init_db
+from services.user_provisioning import UserProvisioningService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv", help="CSV file of users to create")
+    args = parser.parse_args()
+
+    with open(args.csv, encoding="utf-8-sig") as f:
+        text = f.read()
+    service = UserProvisioningService()
+    init_db()
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        try:
+            summary = service.provision(db, service.parse_csv(text))
+        except ValueError as e:
+            sys.exit(f"error: {e}")
+    elapsed = time.perf_counter() - start
+
+    for error in summary["errors"]:
+        print(f"line {error['line']}: {error['username'] or '-'}: {error['error']}")
+    print(f"Created {summary['created']} of {summary['total']} users in {elapsed:.2f}s")
+    sys.exit(1 if summary["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Run the backend with several worker processes sharing model weights.
+
+Before starting uvicorn, every model without a trained file is built once
+and saved to the weights directory: imaging models as state dicts, the lab
+model as an exported NumPy model. Workers then memory-map those files, so
+the weights sit once in the page cache however many workers there are,
+and every worker serves identical weights. The JWT key is created up
+front for the same reason. A model deploy or rollback made through any
+worker is published in the model versions directory, and the other
+workers switch to it within MODEL_SYNC_INTERVAL_SECONDS plus its load time.
+
+Usage (from the backend directory):
+    python scripts/serve.py [--workers 4] [--port 511] [--weights-dir data/weights]
+"""
+import argparse
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def prepare_shared_weights(weights_dir: str) -> None:
+    """Write weight files for every model that has no trained file yet."""
+    import torch
+    from services.imaging_service import ImagingAnalysisService
+    from services.test_analysis_service import TestAnalysisService
+
+    os.makedirs(weights_dir, exist_ok=True)
+    for modality in ("xray", "mri", "ct"):
+        path = os.path.join(weights_dir, f"{modality}.weights.pt")
+        if os.path.exists(path):
+            continue
+        service = ImagingAnalysisService(modality)
+        tmp_path = f"{path}.tmp"
+        torch.save(service.model.state_dict(), tmp_path)
+        os.replace(tmp_path, path)
+        print(f"Wrote {path}")
+    path = os.path.join(weights_dir, "lab.npz")
+    if not os.path.exists(path):
+        TestAnalysisService().export_numpy_model(path)
+        print(f"Wrote {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=511)
+    parser.add_argument("--weights-dir", default=os.path.join(BACKEND_DIR, "data", "weights"))
+    args = parser.parse_args()
+
+    weights_dir = os.path.abspath(args.weights_dir)
+    prepare_shared_weights(weights_dir)
+    os.environ["MODEL_WEIGHTS_DIR"] = weights_dir
+    # Each worker loads everything before it accepts requests
+    os.environ.setdefault("MODEL_LOADING", "eager")
+
+    os.chdir(BACKEND_DIR)
+    # Importing the auth service creates the JWT key file before any worker starts
+    import services.auth_service  # noqa: F401
+    import uvicorn
+
+    uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
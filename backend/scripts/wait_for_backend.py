@@ -0,0 +1,39 @@
+"""Wait until the backend answers a health check.
+
+Used by the desktop launcher scripts in place of a fixed sleep: it polls
+the URL until it returns 200 and exits 0, or exits 1 after the timeout.
+
+Usage:
+    python backend/scripts/wait_for_backend.py [URL] [--timeout 120]
+"""
+import argparse
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+def wait_for(url: str, timeout: float, interval: float = 0.2) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            pass
+        time.sleep(interval)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url", nargs="?", default="http://localhost:511/health/live")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+    if not wait_for(args.url, args.timeout):
+        sys.exit(f"Backend did not become healthy at {args.url} within {args.timeout:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models.artifact import Artifact
+
+ARTIFACT_ROOT = os.getenv(
+    "ARTIFACT_ROOT", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "artifacts")
+)
+CHUNK_SIZE = 1024 * 1024
+
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Return the inclusive ``(start, end)`` of a single-range ``Range`` header.
+
+    Returns None when the whole body should be sent, which includes missing,
+    malformed and multi-range headers. Raises ValueError when the range
+    cannot be satisfied, for a 416 response.
+    """
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Range not satisfiable")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+class ArtifactStore:
+    """Content-addressed blob store on the local filesystem.
+
+    A blob lives at ``<root>/<sha[:2]>/<sha[2:4]>/<sha>``, so identical
+    uploads share one file and no directory grows past a few thousand
+    entries. Blobs never change once written, which makes the hash a strong
+    ETag. Metadata (size, content type, upload count) is kept in the
+    ``artifacts`` table.
+    """
+
+    def __init__(self, root: str = ARTIFACT_ROOT):
+        self.root = root
+
+    def path(self, sha256: str) -> str:
+        if not _SHA256.match(sha256):
+            raise ValueError("Invalid artifact id")
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def write_bytes(self, data: bytes) -> str:
+        """Write a blob unless identical content is already stored; return its hash."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.path(sha256)
+        if not os.path.exists(path):
+            self._write_atomic(path, lambda f: f.write(data))
+        return sha256
+
+    def write_file(self, source: str) -> Tuple[str, int]:
+        """Write a file from disk, hashing it in chunks; return its hash and size."""
+        digest = hashlib.sha256()
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+        path = self.path(sha256)
+        if not os.path.exists(path):
+            with open(source, "rb") as src:
+                self._write_atomic(path, lambda f: shutil.copyfileobj(src, f, CHUNK_SIZE))
+        return sha256, os.path.getsize(source)
+
+    def index(self, db: Session, sha256: str, size: int, content_type: str = "application/octet-stream",
+              filename: Optional[str] = None, kind: Optional[str] = None) -> Dict[str, Any]:
+        """Record a written blob in the metadata table, counting repeated uploads."""
+        now = datetime.utcnow()
+        artifact = db.get(Artifact, sha256)
+        if artifact is None:
+            artifact = Artifact(sha256=sha256, size=size, content_type=content_type, kind=kind,
+                                filename=filename, upload_count=1, created_at=now, last_uploaded_at=now)
+            db.add(artifact)
+            try:
+                db.commit()
+                return self._summarize(artifact)
+            except IntegrityError:
+                # A concurrent upload of the same content indexed it first
+                db.rollback()
+                artifact = db.get(Artifact, sha256)
+        artifact.upload_count += 1
+        artifact.last_uploaded_at = now
+        db.commit()
+        return self._summarize(artifact)
+
+    def put_bytes(self, db: Session, data: bytes, content_type: str = "application/octet-stream",
+                  filename: Optional[str] = None, kind: Optional[str] = None) -> Dict[str, Any]:
+        return self.index(db, self.write_bytes(data), len(data), content_type, filename, kind)
+
+    def put_file(self, db: Session, source: str, content_type: str = "application/octet-stream",
+                 filename: Optional[str] = None, kind: Optional[str] = None) -> Dict[str, Any]:
+        sha256, size = self.write_file(source)
+        return self.index(db, sha256, size, content_type, filename or os.path.basename(source), kind)
+
+    def get(self, db: Session, sha256: str) -> Optional[Dict[str, Any]]:
+        """Return the metadata of a stored blob, or None if it is unknown."""
+        if not _SHA256.match(sha256):
+            return None
+        artifact = db.get(Artifact, sha256)
+        if artifact is None or not os.path.exists(self.path(sha256)):
+            return None
+        return self._summarize(artifact)
+
+    def iter_range(self, sha256: str, start: int, end: int) -> Iterator[bytes]:
+        """Yield the bytes ``start`` to ``end`` inclusive of a blob."""
+        with open(self.path(sha256), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    return
+                remaining -= len(chunk)
+                yield chunk
+
+    @staticmethod
+    def etag(sha256: str) -> str:
+        return f'"{sha256}"'
+
+    def _write_atomic(self, path: str, write) -> None:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def _summarize(artifact: Artifact) -> Dict[str, Any]:
+        return {
+            "sha256": artifact.sha256,
+            "size": artifact.size,
+            "content_type": artifact.content_type,
+            "kind": artifact.kind,
+            "filename": artifact.filename,
+            "upload_count": artifact.upload_count,
+            "created_at": artifact.created_at.isoformat(),
+        }
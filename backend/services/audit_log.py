@@ -0,0 +1,266 @@
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from models.audit import AuditEvent
+from services.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+AUDIT_FLUSH_INTERVAL_SECONDS = float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", "1.0"))
+AUDIT_FALLBACK_PATH = os.getenv("AUDIT_FALLBACK_PATH", "data/audit_fallback.jsonl")
+# A worker replays the fallback file from ``<fallback>.<pid>-<id>.replaying``
+REPLAY_SUFFIX = ".replaying"
+
+_STOP = object()
+
+
+def _abandoned(pid: int) -> bool:
+    """Whether a fallback file claimed by process ``pid`` was left without being replayed."""
+    if pid == os.getpid():
+        # Left by an earlier process that had this pid
+        return True
+    if os.name != "posix":
+        # os.kill would terminate the process here rather than probe it
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass
+    return False
+
+
+class AuditLogWriter:
+    """Write-behind audit log.
+
+    ``log`` only builds a row and puts it on a bounded in-memory queue. A
+    background thread takes up to ``batch_size`` events, or whatever has
+    arrived within ``flush_interval`` seconds, and inserts them in a single
+    transaction. Events that cannot reach the database (a failed flush, a
+    full queue, or the queue left over at shutdown) are appended to a JSON
+    lines fallback file, which is replayed into the table on the next start.
+    Every worker process replays at start, so each first claims the file by
+    renaming it; only the worker whose rename succeeds inserts its events.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        max_queue: int = AUDIT_QUEUE_SIZE,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL_SECONDS,
+        fallback_path: str = AUDIT_FALLBACK_PATH,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fallback_path = fallback_path
+        self.written = 0
+        self.batches = 0
+        self.spilled = 0
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._fallback_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def log(
+        self,
+        event_type: str,
+        username: Optional[str] = None,
+        resource: Optional[str] = None,
+        client_ip: Optional[str] = None,
+        **details: Any,
+    ) -> None:
+        """Queue one audit event; never blocks and never touches the database."""
+        event = {
+            "event_type": event_type,
+            "username": username,
+            "resource": resource,
+            "client_ip": client_ip,
+            "details": json.dumps(details, default=str) if details else None,
+            "created_at": datetime.utcnow(),
+        }
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # Keep the event rather than drop it; this only happens when the
+            # database has fallen far behind
+            self._spill([event])
+
+    def start(self) -> None:
+        """Replay any fallback file and start the writer thread."""
+        if self._thread is not None:
+            return
+        self.replay_fallback()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Flush what is queued and stop the writer thread."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        # Anything logged while stopping goes straight to the fallback file
+        remaining = self._drain()
+        if remaining:
+            self._spill(remaining)
+
+    def flush(self) -> None:
+        """Write every queued event now, from the calling thread."""
+        events = self._drain()
+        if events:
+            self._write(events)
+
+    def replay_fallback(self) -> int:
+        """Insert events saved in the fallback file and remove the file.
+
+        The file is claimed first, so workers starting together insert it
+        once. Claimed files that could not be inserted are left for the
+        next start.
+        """
+        with self._fallback_lock:
+            claimed = self._claim_fallback()
+            if not claimed:
+                return 0
+            events = []
+            for path in claimed:
+                with open(path) as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        event = json.loads(line)
+                        event["created_at"] = datetime.fromisoformat(event["created_at"])
+                        events.append(event)
+            if events and not self._insert(events):
+                return 0
+            for path in claimed:
+                os.remove(path)
+        logger.info("Replayed %d audit events from %s", len(events), self.fallback_path)
+        return len(events)
+
+    def _claim_fallback(self) -> List[str]:
+        """Rename the fallback file, and any claim its process abandoned, to names only this process uses.
+
+        ``os.rename`` is atomic, so of several workers claiming the same
+        file exactly one succeeds; the others find it gone.
+        """
+        directory = os.path.dirname(self.fallback_path) or "."
+        prefix = os.path.basename(self.fallback_path) + "."
+        try:
+            names = sorted(os.listdir(directory))
+        except FileNotFoundError:
+            return []
+        sources = [self.fallback_path]
+        for name in names:
+            if not (name.startswith(prefix) and name.endswith(REPLAY_SUFFIX)):
+                continue
+            pid = name[len(prefix):-len(REPLAY_SUFFIX)].split("-")[0]
+            if pid.isdigit() and _abandoned(int(pid)):
+                sources.append(os.path.join(directory, name))
+        claimed = []
+        for source in sources:
+            target = f"{self.fallback_path}.{os.getpid()}-{uuid.uuid4().hex[:8]}{REPLAY_SUFFIX}"
+            try:
+                os.rename(source, target)
+            except OSError:
+                # Another worker claimed it first, or on Windows has it open
+                continue
+            claimed.append(target)
+        return claimed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "max_queue": self._queue.maxsize,
+            "written": self.written,
+            "batches": self.batches,
+            "spilled": self.spilled,
+            "running": self._thread is not None,
+        }
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    event = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if event is _STOP:
+                    stopping = True
+                    break
+                batch.append(event)
+            self._write(batch)
+        # Write what was queued ahead of the stop marker
+        remaining = self._drain()
+        for start in range(0, len(remaining), self.batch_size):
+            self._write(remaining[start:start + self.batch_size])
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        events = []
+        while True:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                return events
+            if event is not _STOP:
+                events.append(event)
+
+    def _write(self, events: List[Dict[str, Any]]) -> None:
+        if not self._insert(events):
+            self._spill(events)
+
+    def _insert(self, events: List[Dict[str, Any]]) -> bool:
+        db = self.session_factory()
+        try:
+            db.execute(insert(AuditEvent), events)
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Failed to write %d audit events", len(events))
+            return False
+        finally:
+            db.close()
+        self.written += len(events)
+        self.batches += 1
+        return True
+
+    def _spill(self, events: List[Dict[str, Any]]) -> None:
+        with self._fallback_lock:
+            directory = os.path.dirname(self.fallback_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.fallback_path, "a") as f:
+                for event in events:
+                    f.write(json.dumps({**event, "created_at": event["created_at"].isoformat()}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.spilled += len(events)
+
+
+audit_log = AuditLogWriter(SessionLocal)
@@ -0,0 +1,131 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+import os
+import threading
+import time
+
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+
+
+class UserCache:
+    """Bounded LRU cache of authenticated users keyed on the bearer token.
+
+    Entries expire after ``ttl`` seconds or when the token itself expires,
+    whichever comes first, and can be dropped for a username at once when
+    that user changes. The cache is per process. With a ``signal_path``,
+    ``signal_change`` touches that file and every process sharing it drops
+    all its entries on its next lookup, so a change reaches other workers
+    at once; without one they only see it when their entries expire, at
+    most ``ttl`` seconds later.
+    """
+
+    def __init__(self, max_size: int = AUTH_CACHE_SIZE, ttl: float = AUTH_CACHE_TTL_SECONDS,
+                 signal_path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.signal_path = signal_path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.signals = 0
+        self._signal_seen = self._signal_mtime()
+        self._entries: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+        self._tokens_by_user: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Any]:
+        """Return the cached user for a token, or None on a miss."""
+        now = time.monotonic()
+        signal = self._signal_mtime()
+        with self._lock:
+            if signal != self._signal_seen:
+                # Users changed in some process since the last lookup
+                self._signal_seen = signal
+                self._entries.clear()
+                self._tokens_by_user.clear()
+                self.signals += 1
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, username, user = entry
+            if expires_at <= now:
+                self._remove(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return user
+
+    def put(self, token: str, username: str, user: Any, token_expires_at: Optional[float] = None) -> None:
+        """Cache a user for a token.
+
+        ``token_expires_at`` is the token's ``exp`` claim as a Unix timestamp.
+        """
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, time.monotonic() + token_expires_at - time.time())
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (expires_at, username, user)
+            self._tokens_by_user.setdefault(username, set()).add(token)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, username: str) -> None:
+        """Drop every cached token of a user."""
+        with self._lock:
+            for token in list(self._tokens_by_user.get(username, ())):
+                self._remove(token)
+
+    def signal_change(self) -> None:
+        """Make every process sharing ``signal_path`` drop its cached users."""
+        if self.signal_path is None:
+            return
+        with open(self.signal_path, "a"):
+            pass
+        now = time.time_ns()
+        os.utime(self.signal_path, ns=(now, now))
+
+    def _signal_mtime(self) -> Optional[int]:
+        if self.signal_path is None:
+            return None
+        try:
+            return os.stat(self.signal_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "signals": self.signals,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _remove(self, token: str) -> None:
+        """Remove one entry; the caller holds the lock."""
+        _, username, _ = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(username)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[username]
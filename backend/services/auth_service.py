@@ -2,21 +2,85 @@ from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
+from sqlalchemy import event, inspect, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from models.user import User
 from services.database import get_db
+from services.auth_cache import UserCache
+from services.password_hashing import password_hasher
 import os
+import time
 from pathlib import Path
 
 # Create config directory if it doesn't exist
 config_dir = Path("config")
 config_dir.mkdir(exist_ok=True)
 
+def _load_secret_key(path: str) -> str:
+    """Return the JWT signing key shared by every worker process.
+
+    ``SECRET_KEY`` wins if set. Otherwise the key is read from ``path``;
+    the first process to start creates the file exclusively, so concurrent
+    workers agree on one key and tokens survive restarts.
+    """
+    if os.getenv("SECRET_KEY"):
+        return os.environ["SECRET_KEY"]
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another worker may still be writing it
+        for _ in range(50):
+            with open(path) as f:
+                key = f.read().strip()
+            if key:
+                return key
+            time.sleep(0.01)
+        raise RuntimeError(f"Secret key file {path} is empty")
+    key = os.urandom(32).hex()
+    with os.fdopen(fd, "w") as f:
+        f.write(key)
+    return key
+
 # Secret key for JWT
-SECRET_KEY = os.urandom(32).hex()
+SECRET_KEY_PATH = os.getenv("SECRET_KEY_PATH", str(config_dir / "secret_key"))
+SECRET_KEY = _load_secret_key(SECRET_KEY_PATH)
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Authenticated users by token, so validating a known token skips the
+# database. Workers share the signal file, so a user change made by one of
+# them empties every worker's cache.
+AUTH_CACHE_SIGNAL_PATH = os.getenv("AUTH_CACHE_SIGNAL_PATH", str(config_dir / "auth_cache_signal"))
+user_cache = UserCache(signal_path=AUTH_CACHE_SIGNAL_PATH)
+
+# Changed users are collected at flush but dropped from the cache only after
+# commit: dropping them at flush would let a concurrent request cache the
+# still-committed old row again.
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    changed = session.info.setdefault("changed_usernames", set())
+    for target in list(session.dirty) + list(session.deleted):
+        if isinstance(target, User) and (target in session.deleted or session.is_modified(target)):
+            changed.add(target.username)
+            changed.update(inspect(target).attrs.username.history.deleted or ())
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    changed = session.info.pop("changed_usernames", None)
+    if changed:
+        for username in changed:
+            user_cache.invalidate_user(username)
+        user_cache.signal_change()
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session):
+    session.info.pop("changed_usernames", None)
+
+def _detached_copy(user: User) -> User:
+    """Copy a user's column values into an instance not bound to any session."""
+    return User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
+
 class AuthService:
     @staticmethod
     def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -30,11 +94,10 @@ class AuthService:
         return encoded_jwt
 
     @staticmethod
-    def verify_token(token: str, db: Session):
+    def _decode_token(token: str) -> dict:
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            username: str = payload.get("sub")
-            if username is None:
+            if payload.get("sub") is None:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Could not validate credentials",
@@ -44,35 +107,91 @@ class AuthService:
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials",
             )
-        user = db.query(User).filter(User.username == username).first()
+        return payload
+
+    @staticmethod
+    def _accept_token_user(token: str, payload: dict, user: Optional[User]) -> User:
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User not found",
             )
+        if not user.is_active:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Inactive user",
+            )
+        user_cache.put(token, user.username, _detached_copy(user), payload.get("exp"))
         return user
 
+    @staticmethod
+    def verify_token(token: str, db: Session):
+        cached_user = user_cache.get(token)
+        if cached_user is not None:
+            return cached_user
+
+        payload = AuthService._decode_token(token)
+        user = db.query(User).filter(User.username == payload["sub"]).first()
+        return AuthService._accept_token_user(token, payload, user)
+
+    @staticmethod
+    async def verify_token_async(token: str, db: AsyncSession):
+        cached_user = user_cache.get(token)
+        if cached_user is not None:
+            return cached_user
+
+        payload = AuthService._decode_token(token)
+        result = await db.execute(select(User).where(User.username == payload["sub"]))
+        return AuthService._accept_token_user(token, payload, result.scalars().first())
+
     @staticmethod
     def authenticate_user(username: str, password: str, db: Session):
         user = db.query(User).filter(User.username == username).first()
-        if not user or not user.verify_password(password):
+        if not user:
+            return False
+        valid, new_hash = password_hasher.verify_and_update(password, user.hashed_password)
+        if not valid:
             return False
+        if new_hash:
+            # The stored hash predates the current bcrypt cost policy
+            user.hashed_password = new_hash
+            db.commit()
         return user
 
     @staticmethod
-    def create_user(username: str, email: str, password: str, db: Session):
-        # Check if user already exists
-        if db.query(User).filter(User.username == username).first():
+    async def authenticate_user_async(username: str, password: str, db: AsyncSession):
+        result = await db.execute(select(User).where(User.username == username))
+        user = result.scalars().first()
+        if not user:
+            return False
+        valid, new_hash = await password_hasher.verify_and_update_async(password, user.hashed_password)
+        if not valid:
+            return False
+        if new_hash:
+            # The stored hash predates the current bcrypt cost policy
+            user.hashed_password = new_hash
+            await db.commit()
+        return user
+
+    @staticmethod
+    def _raise_if_taken(existing: list, username: str, email: str) -> None:
+        if any(user.username == username for user in existing):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Username already registered",
             )
-        if db.query(User).filter(User.email == email).first():
+        if existing:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered",
             )
 
+    @staticmethod
+    def create_user(username: str, email: str, password: str, db: Session):
+        # Check if user already exists
+        existing = db.query(User).filter(or_(User.username == username, User.email == email)).all()
+        AuthService._raise_if_taken(existing, username, email)
+
         # Create new user
         hashed_password = User.get_password_hash(password)
         db_user = User(
@@ -83,4 +202,22 @@ class AuthService:
         db.add(db_user)
         db.commit()
         db.refresh(db_user)
-        return db_user 
\ No newline at end of file
+        return db_user
+
+    @staticmethod
+    async def create_user_async(username: str, email: str, password: str, db: AsyncSession):
+        # Check if user already exists
+        result = await db.execute(select(User).where(or_(User.username == username, User.email == email)))
+        AuthService._raise_if_taken(result.scalars().all(), username, email)
+
+        # Create new user
+        hashed_password = await password_hasher.hash_async(password)
+        db_user = User(
+            username=username,
+            email=email,
+            hashed_password=hashed_password,
+        )
+        db.add(db_user)
+        await db.commit()
+        await db.refresh(db_user)
+        return db_user
@@ -1,11 +1,24 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional
-import torch
+import json
 import os
 
+try:
+    import torch
+except ImportError:  # Lab-only deployments run exported NumPy models without torch
+    torch = None
+
+def _json_default(value: Any) -> Any:
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
 class BaseAnalysisService(ABC):
     def __init__(self):
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        if torch is not None:
+            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        else:
+            self.device = "cpu"
         self.model = None
         self.model_path = None
 
@@ -26,10 +39,28 @@ class BaseAnalysisService(ABC):
         return model_path if os.path.exists(model_path) else None
 
     def save_analysis_result(self, result: Dict[str, Any], filename: str) -> str:
-        """Save analysis results to a file."""
-        reports_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static", "reports")
-        os.makedirs(reports_dir, exist_ok=True)
-        file_path = os.path.join(reports_dir, filename)
-        
-        # TODO: Implement result saving logic
-        return file_path 
\ No newline at end of file
+        """Save analysis results to a file.
+
+        ``.pdf`` files are rendered as a report in the calling process; any
+        other name gets the result as JSON. Request handlers should use
+        ``ReportService`` instead, which renders in background processes.
+        """
+        from .report_service import DEFAULT_REPORTS_DIR, render_report
+        os.makedirs(DEFAULT_REPORTS_DIR, exist_ok=True)
+        file_path = os.path.join(DEFAULT_REPORTS_DIR, filename)
+
+        if filename.endswith(".pdf"):
+            modality = getattr(self, "modality", "lab")
+            analysis = {
+                "id": os.path.splitext(filename)[0],
+                "patient_id": result.get("patient_id"),
+                "result": result.get("result", result.get("interpretation")),
+                "confidence": result.get("confidence"),
+                "is_abnormal": result.get("is_abnormal", bool(result.get("abnormal_flags"))),
+                "created_at": result.get("timestamp"),
+                "details": json.loads(json.dumps(result, default=_json_default)),
+            }
+            return render_report(modality, analysis, file_path)
+        with open(file_path, "w") as f:
+            json.dump(result, f, default=_json_default, indent=2)
+        return file_path
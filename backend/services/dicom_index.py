@@ -0,0 +1,310 @@
+from datetime import date, datetime
+from typing import Any, BinaryIO, Dict, List, Optional, Union
+import io
+import struct
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models.dicom import DicomInstance, DicomSeries, DicomStudy
+
+MAX_PAGE_SIZE = 500
+PIXEL_DATA_TAG = 0x7FE00010
+# Explicit VRs whose length field is 4 bytes after 2 reserved ones
+_LONG_VRS = (b"OB", b"OD", b"OF", b"OL", b"OV", b"OW", b"SQ", b"UC", b"UN", b"UR", b"UT")
+UNDEFINED_LENGTH = 0xFFFFFFFF
+# pydicom and numpy are imported where they are used, so importing the app
+# does not load them
+DEFLATED_TRANSFER_SYNTAX = "1.2.840.10008.1.2.1.99"
+
+
+def _date(value: Any) -> Optional[date]:
+    try:
+        return datetime.strptime(str(value).strip(), "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def _int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _text(value: Any) -> Optional[str]:
+    text = str(value).strip() if value is not None else ""
+    return text or None
+
+
+def read_header(source: Union[str, bytes, BinaryIO]) -> Dict[str, Any]:
+    """Parse the tags the index keeps from a DICOM Part 10 file, without its pixel data.
+
+    pydicom stops at the pixel data element and leaves the file positioned
+    on it, so its value offset is that position plus the element header.
+    The offset is None when the file has no integer pixel data or is
+    deflated (offsets in the inflated stream do not match the file). Raises
+    ValueError for anything that is not an indexable DICOM file.
+    """
+    import pydicom
+    from pydicom.errors import InvalidDicomError
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    f = open(source, "rb") if isinstance(source, str) else source
+    try:
+        try:
+            dataset = pydicom.dcmread(f, stop_before_pixels=True)
+        except (InvalidDicomError, EOFError, struct.error) as e:
+            raise ValueError(f"Not a DICOM file: {e}")
+        element_start = f.tell()
+        element_header = f.read(12)
+    finally:
+        if f is not source:
+            f.close()
+
+    meta = getattr(dataset, "file_meta", None) or {}
+    transfer_syntax = _text(meta.get("TransferSyntaxUID"))
+    uids = {
+        "study_instance_uid": _text(dataset.get("StudyInstanceUID")),
+        "series_instance_uid": _text(dataset.get("SeriesInstanceUID")),
+        "sop_instance_uid": _text(dataset.get("SOPInstanceUID") or meta.get("MediaStorageSOPInstanceUID")),
+    }
+    missing = [name for name, uid in uids.items() if uid is None]
+    if missing:
+        raise ValueError(f"DICOM file lacks {', '.join(missing)}")
+
+    offset = length = None
+    encapsulated = False
+    if len(element_header) >= 8 and transfer_syntax != DEFLATED_TRANSFER_SYNTAX:
+        order = "<" if dataset.is_little_endian else ">"
+        group, element = struct.unpack(order + "HH", element_header[:4])
+        # Float pixel data is left to pydicom
+        if (group << 16 | element) == PIXEL_DATA_TAG:
+            if dataset.is_implicit_VR:
+                header_size, (length,) = 8, struct.unpack(order + "L", element_header[4:8])
+            elif element_header[4:6] in _LONG_VRS:
+                header_size, (length,) = 12, struct.unpack(order + "L", element_header[8:12])
+            else:
+                header_size, (length,) = 8, struct.unpack(order + "H", element_header[6:8])
+            offset = element_start + header_size
+            if length == UNDEFINED_LENGTH:
+                encapsulated, length = True, None
+
+    study_date = _date(dataset.get("StudyDate"))
+    return {
+        **uids,
+        "patient_id": _text(dataset.get("PatientID")),
+        "patient_name": _text(dataset.get("PatientName")),
+        "study_date": study_date,
+        "study_description": _text(dataset.get("StudyDescription")),
+        "accession_number": _text(dataset.get("AccessionNumber")),
+        "modality": _text(dataset.get("Modality")),
+        "series_date": _date(dataset.get("SeriesDate")) or study_date,
+        "series_number": _int(dataset.get("SeriesNumber")),
+        "series_description": _text(dataset.get("SeriesDescription")),
+        "body_part": _text(dataset.get("BodyPartExamined")),
+        "sop_class_uid": _text(dataset.get("SOPClassUID") or meta.get("MediaStorageSOPClassUID")),
+        "instance_number": _int(dataset.get("InstanceNumber")),
+        "transfer_syntax_uid": transfer_syntax,
+        "rows": _int(dataset.get("Rows")),
+        "columns": _int(dataset.get("Columns")),
+        "number_of_frames": _int(dataset.get("NumberOfFrames")) or 1,
+        "samples_per_pixel": _int(dataset.get("SamplesPerPixel")),
+        "bits_allocated": _int(dataset.get("BitsAllocated")),
+        "pixel_representation": _int(dataset.get("PixelRepresentation")),
+        "photometric_interpretation": _text(dataset.get("PhotometricInterpretation")),
+        "pixel_data_offset": offset,
+        "pixel_data_length": length,
+        "encapsulated": encapsulated,
+    }
+
+
+def read_pixels(path: str, instance: Dict[str, Any]) -> "numpy.ndarray":
+    """Load an indexed instance's stored pixel values.
+
+    Uncompressed single-sample data is memory-mapped straight from the
+    recorded offset, so the header is not parsed again and only the pages
+    that are used get read. Frames come first for multi-frame instances.
+    Encapsulated, bit-packed or colour data is decoded by pydicom instead.
+    Values are as stored, without rescale slope and intercept, like
+    pydicom's ``pixel_array``.
+    """
+    import numpy as np
+    import pydicom
+    from pydicom.uid import UID
+
+    bits = instance["bits_allocated"]
+    direct = (
+        instance["pixel_data_offset"] is not None
+        and not instance["encapsulated"]
+        and instance["samples_per_pixel"] in (None, 1)
+        and bits in (8, 16, 32)
+        and instance["rows"] and instance["columns"]
+    )
+    if not direct:
+        return pydicom.dcmread(path).pixel_array
+    little_endian = UID(instance["transfer_syntax_uid"] or "1.2.840.10008.1.2.1").is_little_endian
+    kind = "i" if instance["pixel_representation"] else "u"
+    dtype = np.dtype(f"{'<' if little_endian else '>'}{kind}{bits // 8}")
+    frames = instance["number_of_frames"] or 1
+    shape = (instance["rows"], instance["columns"])
+    if frames > 1:
+        shape = (frames,) + shape
+    if instance["pixel_data_length"] is not None and instance["pixel_data_length"] < dtype.itemsize * np.prod(shape):
+        raise ValueError(f"Pixel data of {instance['sop_instance_uid']} is shorter than its dimensions")
+    return np.memmap(path, dtype=dtype, mode="r", offset=instance["pixel_data_offset"], shape=shape)
+
+
+class DicomIndexService:
+    """Study, series and instance tables built from DICOM headers.
+
+    Each stored DICOM file is parsed once, up to its pixel data, when it is
+    indexed. Lookups by patient, modality or date are then plain indexed
+    queries, and pixel data is read by seeking to the recorded offset in
+    the file's artifact blob rather than by parsing the file again.
+    """
+
+    def index(self, db: Session, header: Dict[str, Any], artifact_sha256: str) -> Dict[str, Any]:
+        """Insert or update the study, series and instance rows of one parsed file."""
+        for attempt in range(2):
+            try:
+                instance = self._upsert(db, header, artifact_sha256)
+                db.commit()
+                return self._summarize(instance)
+            except IntegrityError:
+                # A concurrent ingest of the same study or series inserted it first
+                db.rollback()
+                if attempt:
+                    raise
+
+    def _upsert(self, db: Session, header: Dict[str, Any], artifact_sha256: str) -> DicomInstance:
+        values = {**header, "artifact_sha256": artifact_sha256}
+        now = datetime.utcnow()
+        tables = (
+            (DicomStudy, "study_instance_uid",
+             ("patient_id", "patient_name", "study_date", "study_description", "accession_number")),
+            (DicomSeries, "series_instance_uid",
+             ("study_instance_uid", "modality", "series_date", "series_number", "series_description", "body_part")),
+            (DicomInstance, "sop_instance_uid",
+             ("series_instance_uid", "artifact_sha256", "sop_class_uid", "instance_number", "transfer_syntax_uid",
+              "rows", "columns", "number_of_frames", "samples_per_pixel", "bits_allocated", "pixel_representation",
+              "photometric_interpretation", "pixel_data_offset", "pixel_data_length", "encapsulated")),
+        )
+        for model, key, fields in tables:
+            row = db.get(model, values[key])
+            if row is None:
+                row = model(**{key: values[key]})
+                db.add(row)
+            for field in fields:
+                # Study and series tags are not repeated in every instance
+                if values[field] is not None or model is DicomInstance:
+                    setattr(row, field, values[field])
+            if hasattr(model, "indexed_at"):
+                row.indexed_at = now
+            # Parents first, for the foreign keys
+            db.flush()
+        return row
+
+    def find_series(
+        self,
+        db: Session,
+        patient_id: Optional[str] = None,
+        modality: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        study_instance_uid: Optional[str] = None,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """Series matching all given filters, newest first, with their instance counts.
+
+        Dates are inclusive and compare the series date (or the study date
+        when a series has none). Instances are counted only for the page of
+        series returned, from the series index on ``dicom_instances``.
+        """
+        query = (
+            db.query(DicomSeries, DicomStudy)
+            .join(DicomStudy, DicomSeries.study_instance_uid == DicomStudy.study_instance_uid)
+        )
+        if patient_id is not None:
+            query = query.filter(DicomStudy.patient_id == patient_id)
+        if modality is not None:
+            query = query.filter(DicomSeries.modality == modality.upper())
+        if date_from is not None:
+            query = query.filter(DicomSeries.series_date >= date_from)
+        if date_to is not None:
+            query = query.filter(DicomSeries.series_date <= date_to)
+        if study_instance_uid is not None:
+            query = query.filter(DicomSeries.study_instance_uid == study_instance_uid)
+        query = query.order_by(
+            DicomSeries.series_date.desc(), DicomSeries.study_instance_uid, DicomSeries.series_number
+        ).limit(max(1, min(limit, MAX_PAGE_SIZE)))
+        rows = query.all()
+        counts = dict(
+            db.query(DicomInstance.series_instance_uid, func.count())
+            .filter(DicomInstance.series_instance_uid.in_([series.series_instance_uid for series, _ in rows]))
+            .group_by(DicomInstance.series_instance_uid)
+            .all()
+        ) if rows else {}
+        return [
+            {
+                "series_instance_uid": series.series_instance_uid,
+                "study_instance_uid": study.study_instance_uid,
+                "patient_id": study.patient_id,
+                "patient_name": study.patient_name,
+                "study_date": study.study_date.isoformat() if study.study_date else None,
+                "study_description": study.study_description,
+                "modality": series.modality,
+                "series_date": series.series_date.isoformat() if series.series_date else None,
+                "series_number": series.series_number,
+                "series_description": series.series_description,
+                "body_part": series.body_part,
+                "instances": counts.get(series.series_instance_uid, 0),
+            }
+            for series, study in rows
+        ]
+
+    def list_instances(self, db: Session, series_instance_uid: str) -> List[Dict[str, Any]]:
+        """The instances of a series in instance number order."""
+        instances = (
+            db.query(DicomInstance)
+            .filter(DicomInstance.series_instance_uid == series_instance_uid)
+            .order_by(DicomInstance.instance_number, DicomInstance.sop_instance_uid)
+            .all()
+        )
+        return [self._summarize(instance) for instance in instances]
+
+    def get_instance(self, db: Session, sop_instance_uid: str) -> Optional[Dict[str, Any]]:
+        instance = db.get(DicomInstance, sop_instance_uid)
+        return self._summarize(instance) if instance is not None else None
+
+    def get_instance_by_artifact(self, db: Session, artifact_sha256: str) -> Optional[Dict[str, Any]]:
+        """The indexed instance stored as an artifact, or None if the artifact is not indexed DICOM."""
+        instance = (
+            db.query(DicomInstance)
+            .filter(DicomInstance.artifact_sha256 == artifact_sha256)
+            .order_by(DicomInstance.sop_instance_uid)
+            .first()
+        )
+        return self._summarize(instance) if instance is not None else None
+
+    @staticmethod
+    def _summarize(instance: DicomInstance) -> Dict[str, Any]:
+        return {
+            "sop_instance_uid": instance.sop_instance_uid,
+            "series_instance_uid": instance.series_instance_uid,
+            "artifact_sha256": instance.artifact_sha256,
+            "sop_class_uid": instance.sop_class_uid,
+            "instance_number": instance.instance_number,
+            "transfer_syntax_uid": instance.transfer_syntax_uid,
+            "rows": instance.rows,
+            "columns": instance.columns,
+            "number_of_frames": instance.number_of_frames,
+            "samples_per_pixel": instance.samples_per_pixel,
+            "bits_allocated": instance.bits_allocated,
+            "pixel_representation": instance.pixel_representation,
+            "photometric_interpretation": instance.photometric_interpretation,
+            "pixel_data_offset": instance.pixel_data_offset,
+            "pixel_data_length": instance.pixel_data_length,
+            "encapsulated": instance.encapsulated,
+            "indexed_at": instance.indexed_at.isoformat(),
+        }
@@ -0,0 +1,193 @@
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+import base64
+import json
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+from models.analysis import Analysis, AnalysisArtifact
+from models.artifact import Artifact
+
+MAX_PAGE_SIZE = 200
+
+
+def _json_default(value: Any) -> Any:
+    # NumPy arrays and scalars; checked by duck type so numpy is not imported here
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_cursor(created_at: datetime, analysis_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{analysis_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, analysis_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(analysis_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid history cursor")
+
+
+class AnalysisHistoryService:
+    """Stores analysis results and lists them newest first with keyset pagination.
+
+    A page ends with a cursor holding the last row's ``(created_at, id)``.
+    The next page starts strictly after that key, so every page is an index
+    range scan on the composite indexes no matter how deep the client has
+    paged.
+    """
+
+    def record(
+        self,
+        db: Session,
+        user_id: Optional[int],
+        modality: str,
+        result: Dict[str, Any],
+        patient_id: Optional[str] = None,
+    ) -> Analysis:
+        """Persist one analysis result and return the stored row."""
+        return self.record_many(db, user_id, modality, [result], [patient_id])[0]
+
+    def record_many(
+        self,
+        db: Session,
+        user_id: Optional[int],
+        modality: str,
+        results: List[Dict[str, Any]],
+        patient_ids: List[Optional[str]],
+    ) -> List[Analysis]:
+        """Persist several analysis results in one transaction."""
+        created_at = datetime.utcnow()
+        analyses = []
+        for result, patient_id in zip(results, patient_ids):
+            if modality == "lab":
+                summary = result.get("interpretation")
+                is_abnormal = bool(result.get("abnormal_flags"))
+            else:
+                summary = result.get("result")
+                is_abnormal = bool(result.get("is_abnormal"))
+            analyses.append(Analysis(
+                user_id=user_id,
+                modality=modality,
+                patient_id=patient_id,
+                result=summary,
+                confidence=result.get("confidence"),
+                is_abnormal=is_abnormal,
+                details=json.dumps(result, default=_json_default),
+                created_at=created_at,
+            ))
+        db.add_all(analyses)
+        db.flush()
+        # Uploads are linked to the analysis so access checks can find them
+        db.add_all(
+            AnalysisArtifact(analysis_id=analysis.id, artifact_sha256=result["artifact_sha256"], user_id=user_id)
+            for analysis, result in zip(analyses, results) if result.get("artifact_sha256")
+        )
+        db.commit()
+        return analyses
+
+    def list(
+        self,
+        db: Session,
+        user_id: Optional[int] = None,
+        modality: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        abnormal: Optional[bool] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+    ) -> Dict[str, Any]:
+        """Return one page of analyses, newest first, plus the cursor for the next page."""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        query = db.query(Analysis)
+        if user_id is not None:
+            query = query.filter(Analysis.user_id == user_id)
+        if modality is not None:
+            query = query.filter(Analysis.modality == modality)
+        if start is not None:
+            query = query.filter(Analysis.created_at >= start)
+        if end is not None:
+            query = query.filter(Analysis.created_at < end)
+        if abnormal is not None:
+            query = query.filter(Analysis.is_abnormal == abnormal)
+        if cursor:
+            created_at, analysis_id = decode_cursor(cursor)
+            query = query.filter(tuple_(Analysis.created_at, Analysis.id) < tuple_(created_at, analysis_id))
+
+        rows = (
+            query.order_by(Analysis.created_at.desc(), Analysis.id.desc())
+            .limit(limit + 1)
+            .all()
+        )
+        page = rows[:limit]
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].id) if len(rows) > limit else None
+        return {"items": [self._summarize(row) for row in page], "next_cursor": next_cursor}
+
+    def get(self, db: Session, analysis_id: int) -> Optional[Dict[str, Any]]:
+        """Return one analysis including its full stored result."""
+        analysis = db.get(Analysis, analysis_id)
+        if analysis is None:
+            return None
+        summary = self._summarize(analysis)
+        summary["details"] = json.loads(analysis.details) if analysis.details else None
+        return summary
+
+    def references_artifact(self, db: Session, user_id: int, sha256: str) -> bool:
+        """Whether any of the user's analyses was run on the stored artifact ``sha256``."""
+        query = db.query(AnalysisArtifact.analysis_id).filter(
+            AnalysisArtifact.user_id == user_id, AnalysisArtifact.artifact_sha256 == sha256
+        )
+        return db.query(query.exists()).scalar()
+
+    def analyzed_patient(self, db: Session, user_id: int, patient_id: str) -> bool:
+        """Whether the user has recorded any analysis for the patient."""
+        query = db.query(Analysis.id).filter(Analysis.patient_id == patient_id, Analysis.user_id == user_id)
+        return db.query(query.exists()).scalar()
+
+    def link_artifacts(self, db: Session, batch_size: int = 1000) -> int:
+        """Link analyses stored before ``analysis_artifacts`` existed to their uploads.
+
+        Reads the hash each stored result recorded, in id order, and
+        returns how many links were added. Analyses already linked are
+        skipped, so it can be run again.
+        """
+        linked = select(AnalysisArtifact.analysis_id)
+        added, last_id = 0, 0
+        while True:
+            rows = (
+                db.query(Analysis.id, Analysis.user_id, Analysis.details)
+                .filter(Analysis.id > last_id, Analysis.details.isnot(None), Analysis.id.not_in(linked))
+                .order_by(Analysis.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                return added
+            for analysis_id, user_id, details in rows:
+                try:
+                    sha256 = json.loads(details).get("artifact_sha256")
+                except (ValueError, AttributeError):
+                    sha256 = None
+                if sha256 and db.get(Artifact, sha256) is not None:
+                    db.add(AnalysisArtifact(analysis_id=analysis_id, artifact_sha256=sha256, user_id=user_id))
+                    added += 1
+            db.commit()
+            last_id = rows[-1][0]
+
+    @staticmethod
+    def _summarize(analysis: Analysis) -> Dict[str, Any]:
+        return {
+            "id": analysis.id,
+            "user_id": analysis.user_id,
+            "modality": analysis.modality,
+            "patient_id": analysis.patient_id,
+            "result": analysis.result,
+            "confidence": analysis.confidence,
+            "is_abnormal": analysis.is_abnormal,
+            "created_at": analysis.created_at.isoformat(),
+        }
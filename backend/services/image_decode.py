@@ -0,0 +1,65 @@
+from typing import BinaryIO, Optional, Tuple, Union
+import io
+import numpy as np
+from PIL import Image
+
+# 16-bit and 32-bit modes are kept at full depth; clipping them to 8 bits
+# would flatten most radiographs
+_DEEP_MODES = ("I", "F")
+_SINGLE_CHANNEL_MODES = ("L",) + _DEEP_MODES
+# Keep at least this many source pixels per output pixel after the integer
+# reduce, so the final resample still filters properly (as PIL's reducing_gap)
+REDUCING_GAP = 2
+
+
+def decode_image_2d(
+    source: Union[str, bytes, BinaryIO, Image.Image],
+    size: Tuple[int, int] = (224, 224),
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Decode a 2D image straight to a single-channel float32 ``size`` array in [0, 1].
+
+    Axes are in MONAI's order, as ``LoadImage`` returns them: the first is
+    the image's x (width) and the second its y (height), so ``size`` is
+    ``(width, height)`` and the array is the transpose of PIL's rows.
+
+    Large images are never materialised at full resolution in colour:
+
+    * JPEGs are decoded by libjpeg at the smallest 1/2, 1/4 or 1/8 scale
+      that still covers ``size``, and as luminance only (``draft``).
+    * Other formats are shrunk by an integer box filter (``reduce``)
+      before they are converted to one channel and resampled.
+
+    The result is written into ``out`` when given (for example a view of
+    the model's input tensor), and min-max scaled in place like MONAI's
+    ``ScaleIntensity``.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    image = source if isinstance(source, Image.Image) else Image.open(source)
+    width, height = size
+
+    if image.format == "JPEG":
+        # Only takes effect before the pixels are loaded
+        image.draft("L", (width, height))
+    if image.mode.startswith("I;16"):
+        image = image.convert("I")
+    elif image.mode in ("1", "P", "PA"):
+        image = image.convert("L")
+    factor = min(image.width // (REDUCING_GAP * width), image.height // (REDUCING_GAP * height))
+    if factor > 1:
+        image = image.reduce(factor)
+    if image.mode not in _SINGLE_CHANNEL_MODES:
+        image = image.convert("L")
+    image = image.resize((width, height), Image.BILINEAR)
+
+    if out is None:
+        out = np.empty((width, height), dtype=np.float32)
+    out[...] = np.asarray(image).T
+    low, high = out.min(), out.max()
+    if high > low:
+        out -= low
+        out *= 1.0 / (high - low)
+    else:
+        out[...] = 0
+    return out
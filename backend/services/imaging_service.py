@@ -7,92 +7,414 @@ from monai.transforms import (
     Resize,
     ToTensor,
 )
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
 import numpy as np
-from typing import Dict, Any, Union
+from typing import Dict, Any, List, Optional, Tuple, Union
+import io
 import os
+import threading
 from .base_service import BaseAnalysisService
+from .image_decode import decode_image_2d
+from .model_package import is_package, load_package, save_package, skip_init
+from .precision import FP32, PRECISIONS, accuracy_report, autocast, memory_format
+from .segmentation import summarize_logits
+from .shared_weights import release_freed_memory, shared_weights_path
+
+INPUT_SIZE_2D = (224, 224)
+INPUT_SIZE_3D = (32, 32, 32)
+# Images (xray) or .npy volumes (mri, ct) in per-modality subdirectories,
+# used to check reduced-precision modes against fp32
+REFERENCE_IMAGES_DIR = os.getenv(
+    "REFERENCE_IMAGES_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "reference_images")
+)
+REFERENCE_SAMPLES = 16
+# Cascaded triage: 2D models first score a low-resolution copy of the
+# image and only run at full resolution when the first-stage probability of
+# an abnormal finding falls inside the uncertainty band
+CASCADE_MODALITIES = [m.strip() for m in os.getenv("CASCADE_MODALITIES", "").split(",") if m.strip()]
+CASCADE_RESOLUTION = int(os.getenv("CASCADE_RESOLUTION", "112"))
+CASCADE_BAND = (float(os.getenv("CASCADE_BAND_LOW", "0.2")), float(os.getenv("CASCADE_BAND_HIGH", "0.8")))
+# Segmentation output of the 3D models: "rle" or "bitpacked" masks
+SEGMENTATION_MASK_ENCODING = os.getenv("SEGMENTATION_MASK_ENCODING", "rle")
+# Volumes longer than this along any axis are resampled down before inference
+SEGMENTATION_MAX_SIZE = int(os.getenv("SEGMENTATION_MAX_SIZE", "256"))
+# A scan is reported abnormal once this many voxels are segmented as findings
+SEGMENTATION_MIN_VOXELS = int(os.getenv("SEGMENTATION_MIN_VOXELS", "1"))
 
 class ImagingAnalysisService(BaseAnalysisService):
-    def __init__(self, modality: str):
+    def __init__(self, modality: str, model_path: Optional[str] = None):
         super().__init__()
         self.modality = modality.lower()
+        self.spatial_dims = 2 if self.modality == "xray" else 3
+        self.precision = FP32
+        self.precision_report: Optional[Dict[str, Any]] = None
+        self.cascade: Optional[Dict[str, Any]] = None
+        self.cascade_stats = {"requests": 0, "first_stage": 0, "escalated": 0}
+        self._stats_lock = threading.Lock()
+        self.mask_encoding = SEGMENTATION_MASK_ENCODING
         self.transforms = self._get_transforms()
-        self._load_default_model()
+        if model_path:
+            self.load_model(model_path)
+        else:
+            self._load_default_model()
 
     def _get_transforms(self):
         """Get the appropriate transforms for the imaging modality."""
+        if self.spatial_dims == 3:
+            # Volumes keep their own size and spacing; see _prepare_volume
+            return Compose([LoadImage(image_only=True, ensure_channel_first=True)])
         return Compose([
             LoadImage(image_only=True),
             ScaleIntensity(),
-            Resize((224, 224)),
+            Resize(INPUT_SIZE_2D),
             ToTensor(),
         ])
 
+    def network_config(self) -> Dict[str, Any]:
+        """Describe the modality's network as a MONAI class name and its arguments."""
+        if self.modality == "xray":
+            return {
+                "architecture": "DenseNet121",
+                "params": {"spatial_dims": 2, "in_channels": 1, "out_channels": 2},
+            }
+        return {
+            "architecture": "UNet",
+            "params": {
+                "spatial_dims": 3,
+                "in_channels": 1,
+                "out_channels": 2,
+                "channels": [16, 32, 64, 128, 256],
+                "strides": [2, 2, 2, 2],
+            },
+        }
+
+    def _build_network(self, config: Optional[Dict[str, Any]] = None) -> torch.nn.Module:
+        """Build the untrained network described by ``config`` (the modality's by default)."""
+        config = config or self.network_config()
+        network = getattr(monai.networks.nets, config["architecture"], None)
+        if not (isinstance(network, type) and issubclass(network, torch.nn.Module)):
+            raise ValueError(f"Unknown network architecture '{config['architecture']}'")
+        return network(**config["params"])
+
     def _load_default_model(self):
         """Load the default model for the specified modality."""
-        model_name = f"{self.modality}_model.pt"
-        model_path = self.get_model_path(model_name)
-        if model_path:
+        package_path = self.get_model_path(f"{self.modality}_model")
+        model_path = self.get_model_path(f"{self.modality}_model.pt")
+        shared_path = shared_weights_path(self.modality)
+        if package_path and is_package(package_path):
+            self.load_package(package_path)
+        elif model_path:
             self.load_model(model_path)
+        elif shared_path:
+            self.load_state_dict(shared_path)
         else:
             # Load a pre-trained model from MONAI
-            if self.modality == "xray":
-                self.model = monai.networks.nets.DenseNet121(
-                    spatial_dims=2,
-                    in_channels=1,
-                    out_channels=2
-                )
-            elif self.modality in ["mri", "ct"]:
-                self.model = monai.networks.nets.UNet(
-                    spatial_dims=3,
-                    in_channels=1,
-                    out_channels=2,
-                    channels=(16, 32, 64, 128, 256),
-                    strides=(2, 2, 2, 2),
-                )
-            self.model = self.model.to(self.device)
+            self.model = self._build_network().to(self.device)
+            self.model.eval()
 
     def load_model(self, model_path: str) -> None:
-        """Load a custom model from the specified path."""
+        """Load a model package directory or a saved torch model."""
         try:
-            self.model = torch.load(model_path, map_location=self.device)
-            self.model.eval()
+            if is_package(model_path):
+                self.load_package(model_path)
+                return
+            # Memory-mapped so worker processes share the weight pages
+            model = torch.load(model_path, map_location=self.device, mmap=True, weights_only=False)
+            if isinstance(model, dict):
+                # A state dict for the modality's standard architecture
+                self.load_state_dict(model_path)
+                return
+            self.model = model.eval()
             self.model_path = model_path
         except Exception as e:
             raise Exception(f"Failed to load model: {str(e)}")
 
-    def analyze(self, image_path: Union[str, Image.Image]) -> Dict[str, Any]:
+    def load_state_dict(self, weights_path: str) -> None:
+        """Load a saved state dict into the modality's architecture without copying it.
+
+        The parameters are replaced by the memory-mapped tensors, so on CPU
+        the weights stay in the page cache and are shared by every process
+        that maps the file. The network is built normally rather than on
+        the meta device, whose first use imports about 150 MB of torch
+        internals per process; the initial weights are freed afterwards.
+        """
+        with skip_init():
+            model = self._build_network()
+        state_dict = torch.load(weights_path, map_location=self.device, mmap=True, weights_only=True)
+        model.load_state_dict(state_dict, assign=True)
+        self.model = model.eval()
+        self.model_path = weights_path
+        del model, state_dict
+        release_freed_memory()
+
+    def load_package(self, package_path: str) -> None:
+        """Build the network from a model package's config and map its weights in."""
+        config, state_dict = load_package(package_path)
+        if config.get("model") != self.modality:
+            raise ValueError(f"{package_path} holds a {config.get('model')} model, not {self.modality}")
+        with skip_init():
+            model = self._build_network(config)
+        model.load_state_dict(state_dict, assign=True)
+        self.model = model.to(self.device).eval()
+        self.model_path = package_path
+        del model, state_dict
+        release_freed_memory()
+
+    def export_package(self, package_path: str, source: Optional[str] = None) -> str:
+        """Write the current model as a package of architecture config and safetensors weights.
+
+        Only models whose weights fit the modality's standard network can be
+        described by a config; anything else raises ValueError.
+        """
+        config = {"model": self.modality, **self.network_config()}
+        state_dict = self.model.state_dict()
+        try:
+            self._build_network(config).load_state_dict(state_dict)
+        except RuntimeError as e:
+            raise ValueError(f"The current model does not match the {config['architecture']} config: {e}")
+        return save_package(package_path, config, state_dict, source=source or self.model_path)
+
+    def warm_up(self) -> None:
+        """Run one blank input through the model.
+
+        This faults memory-mapped weights into the page cache and lets torch
+        set up its kernels before the first real request.
+        """
+        spatial = INPUT_SIZE_2D if self.spatial_dims == 2 else INPUT_SIZE_3D
+        self._forward(torch.zeros((1, 1) + spatial, device=self.device))
+        if self.cascade is not None:
+            resolution = self.cascade["resolution"]
+            self._forward(torch.zeros((1, 1, resolution, resolution), device=self.device))
+
+    def set_precision(self, precision: str, inputs: Optional[List[torch.Tensor]] = None) -> Dict[str, Any]:
+        """Switch inference to fp32, bf16 autocast or channels-last memory format.
+
+        Other modes are first run against fp32 on the reference inputs
+        (``reference_inputs`` by default). If predictions disagree or
+        confidences drift more than allowed, ValueError is raised and the
+        service keeps its current precision.
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown inference precision '{precision}'")
+        if precision == FP32:
+            report = {"precision": FP32, "passed": True}
+        else:
+            report = accuracy_report(self.model, inputs or self.reference_inputs(), precision, self.spatial_dims)
+        if not report["passed"]:
+            self.model.to(memory_format=memory_format(self.precision, self.spatial_dims))
+            raise ValueError(
+                f"{precision} is not accurate enough for {self.modality}: "
+                f"{report['prediction_agreement']:.2%} of predictions agree with fp32, "
+                f"confidence drifts up to {report['max_confidence_drift']}"
+            )
+        self.model.to(memory_format=memory_format(precision, self.spatial_dims))
+        self.precision = precision
+        self.precision_report = report
+        self.warm_up()
+        return report
+
+    def reference_inputs(self, limit: int = REFERENCE_SAMPLES) -> List[torch.Tensor]:
+        """Load the modality's reference set as model inputs.
+
+        Falls back to a fixed synthetic set (smooth random fields) when no
+        reference images have been provided.
+        """
+        spatial = INPUT_SIZE_2D if self.spatial_dims == 2 else INPUT_SIZE_3D
+        mode = "bilinear" if self.spatial_dims == 2 else "trilinear"
+        directory = os.path.join(REFERENCE_IMAGES_DIR, self.modality)
+        names = sorted(os.listdir(directory))[:limit] if os.path.isdir(directory) else []
+        inputs = []
+        for name in names:
+            path = os.path.join(directory, name)
+            if name.endswith(".npy"):
+                # Volumes are expected already scaled to [0, 1]
+                volume = torch.from_numpy(np.load(path).astype(np.float32))
+                inputs.append(torch.nn.functional.interpolate(volume[None, None], size=spatial, mode=mode))
+            elif self.spatial_dims == 3:
+                inputs.append(torch.nn.functional.interpolate(self._prepare_input(path), size=spatial, mode=mode))
+            else:
+                inputs.append(self._prepare_input(path))
+        if inputs:
+            return inputs
+        generator = torch.Generator().manual_seed(0)
+        coarse = torch.rand((limit, 1) + tuple(max(size // 8, 1) for size in spatial), generator=generator)
+        return list(torch.nn.functional.interpolate(coarse, size=spatial, mode=mode).split(1))
+
+    def enable_cascade(self, band: Tuple[float, float] = CASCADE_BAND,
+                       resolution: int = CASCADE_RESOLUTION) -> None:
+        """Score images at ``resolution`` first and escalate only uncertain ones.
+
+        An image goes to the full-resolution pass when the first stage's
+        probability of an abnormal finding lies strictly inside ``band``.
+        """
+        if self.spatial_dims != 2:
+            raise ValueError(f"Cascaded triage needs a 2D classifier, not {self.modality}")
+        low, high = band
+        if not 0 <= low <= high <= 1:
+            raise ValueError(f"Invalid uncertainty band {band}")
+        self.cascade = {"band": [low, high], "resolution": resolution}
+
+    def _forward(self, image: torch.Tensor) -> torch.Tensor:
+        """Run the model at the configured precision and return float logits."""
+        image = image.contiguous(memory_format=memory_format(self.precision, self.spatial_dims))
+        with torch.no_grad():
+            with autocast(self.precision):
+                output = self.model(image)
+        return output.float()
+
+    def _cascade(self, image: torch.Tensor) -> Tuple[torch.Tensor, Dict[str, Any]]:
+        """Return the logits of the deciding stage and which stage it was."""
+        resolution = self.cascade["resolution"]
+        low, high = self.cascade["band"]
+        # Area averaging of the decoded input, so the image is decoded once
+        small = torch.nn.functional.interpolate(image, size=(resolution, resolution), mode="area")
+        output = self._forward(small)
+        abnormal = float(torch.softmax(output, dim=1)[0, 1])
+        stage = 2 if low < abnormal < high else 1
+        if stage == 2:
+            output = self._forward(image)
+        with self._stats_lock:
+            self.cascade_stats["requests"] += 1
+            self.cascade_stats["first_stage" if stage == 1 else "escalated"] += 1
+        return output, {
+            "stage": stage,
+            "first_stage_abnormal_probability": round(abnormal, 4),
+            "first_stage_resolution": resolution,
+            "band": [low, high],
+        }
+
+    def _prepare_input(self, image_path: Union[str, bytes, Image.Image, np.ndarray]) -> torch.Tensor:
+        """Turn an image file, its bytes or a PIL image into a batch of one."""
+        if self.spatial_dims == 3:
+            return self._prepare_volume(image_path)[0]
+        if self.modality == "xray":
+            try:
+                # Decoded at reduced size straight into the input tensor
+                batch = torch.empty((1, 1) + INPUT_SIZE_2D)
+                decode_image_2d(image_path, INPUT_SIZE_2D, out=batch.numpy()[0, 0])
+                return batch
+            except UnidentifiedImageError:
+                if not isinstance(image_path, str):
+                    raise
+                # DICOM and other formats PIL cannot read go through MONAI
+        if isinstance(image_path, str):
+            image = self.transforms(image_path)
+        else:
+            image = self.transforms(np.array(image_path))
+        # Add batch dimension
+        return image.unsqueeze(0)
+
+    def _prepare_volume(
+        self, source: Union[str, bytes, Image.Image, np.ndarray]
+    ) -> Tuple[torch.Tensor, Tuple[int, int, int], List[float]]:
+        """Load a volume as a padded batch of one, with its size and voxel spacing in mm.
+
+        Volume files (NIfTI, DICOM series, .npy) go through MONAI and keep
+        their header spacing; .npy bytes and arrays are taken as they are.
+        2D images become a single slice at ``INPUT_SIZE_2D`` with 1 mm
+        spacing assumed. Volumes longer than ``SEGMENTATION_MAX_SIZE`` are
+        resampled down (and their spacing scaled to match), and every axis is
+        zero-padded at its end to a multiple of the UNet's total stride.
+        """
+        spacing = [1.0, 1.0, 1.0]
+        if isinstance(source, np.ndarray):
+            volume = torch.as_tensor(source, dtype=torch.float32)
+        else:
+            try:
+                volume = torch.from_numpy(decode_image_2d(source, INPUT_SIZE_2D))
+            except UnidentifiedImageError:
+                if isinstance(source, bytes):
+                    try:
+                        array = np.load(io.BytesIO(source), allow_pickle=False)
+                    except ValueError:
+                        raise ValueError("Unsupported volume format; upload an image or a .npy volume")
+                    volume = torch.as_tensor(array, dtype=torch.float32)
+                elif isinstance(source, str):
+                    image = self.transforms(source)
+                    spacing = [float(value) for value in image.pixdim][:3]
+                    volume = image[0].as_tensor().float()
+                else:
+                    raise
+        if volume.ndim == 2:
+            volume = volume[..., None]
+        if volume.ndim != 3:
+            raise ValueError(f"Expected a 2D image or a 3D volume, got shape {tuple(volume.shape)}")
+        spacing += [1.0] * (3 - len(spacing))
+
+        largest = max(volume.shape)
+        if largest > SEGMENTATION_MAX_SIZE:
+            size = tuple(max(1, round(length * SEGMENTATION_MAX_SIZE / largest)) for length in volume.shape)
+            spacing = [step * length / new for step, length, new in zip(spacing, volume.shape, size)]
+            volume = torch.nn.functional.interpolate(volume[None, None], size=size, mode="trilinear")[0, 0]
+        # Min-max scaling as ScaleIntensity
+        low, high = volume.min(), volume.max()
+        volume = (volume - low) / (high - low) if high > low else torch.zeros_like(volume)
+
+        shape = tuple(volume.shape)
+        divisor = int(np.prod(self.network_config()["params"]["strides"]))
+        padding = []
+        for length in reversed(shape):
+            padding += [0, -length % divisor]
+        return torch.nn.functional.pad(volume[None, None], padding), shape, spacing
+
+    def analyze(self, image_path: Union[str, bytes, Image.Image, np.ndarray]) -> Dict[str, Any]:
         """Analyze the medical image and return results."""
         try:
+            if self.spatial_dims == 3:
+                return self._segment(image_path)
+
             # Prepare the image
-            if isinstance(image_path, str):
-                image = self.transforms(image_path)
-            else:
-                image = self.transforms(np.array(image_path))
-            
-            # Add batch dimension and move to device
-            image = image.unsqueeze(0).to(self.device)
+            image = self._prepare_input(image_path).to(self.device)
 
             # Perform inference
-            with torch.no_grad():
-                output = self.model(image)
-                probabilities = torch.softmax(output, dim=1)
-                confidence, prediction = torch.max(probabilities, dim=1)
+            cascade = None
+            if self.cascade is not None:
+                output, cascade = self._cascade(image)
+            else:
+                output = self._forward(image)
+            probabilities = torch.softmax(output, dim=1)
+            confidence, prediction = torch.max(probabilities, dim=1)
 
             # Get the result based on modality
             result = self._get_result(prediction.item(), confidence.item())
 
-            return {
+            response = {
                 "result": result,
                 "confidence": confidence.item(),
+                "is_abnormal": bool(prediction.item()),
                 "modality": self.modality,
                 "timestamp": str(np.datetime64('now')),
             }
+            if cascade is not None:
+                response["cascade"] = cascade
+            return response
 
         except Exception as e:
             raise Exception(f"Analysis failed: {str(e)}")
 
+    def _segment(self, source: Union[str, bytes, Image.Image, np.ndarray]) -> Dict[str, Any]:
+        """Segment a volume and summarise the masks instead of collapsing them to one label.
+
+        The scan counts as abnormal when at least ``SEGMENTATION_MIN_VOXELS``
+        voxels are assigned a finding class; the confidence is the mean
+        probability of the chosen class over those voxels.
+        """
+        image, shape, spacing = self._prepare_volume(source)
+        output = self._forward(image.to(self.device))[0]
+        # Drop the padding; a view, so nothing is copied
+        logits = output[(slice(None),) + tuple(slice(0, length) for length in shape)]
+        segmentation = summarize_logits(logits, spacing, self.mask_encoding)
+        confidence = segmentation.pop("confidence")
+        abnormal = segmentation["foreground_voxels"] >= SEGMENTATION_MIN_VOXELS
+        return {
+            "result": self._get_result(int(abnormal), confidence),
+            "confidence": confidence,
+            "is_abnormal": abnormal,
+            "modality": self.modality,
+            "timestamp": str(np.datetime64('now')),
+            "segmentation": segmentation,
+        }
+
     def _get_result(self, prediction: int, confidence: float) -> str:
         """Get the analysis result based on the prediction."""
         if self.modality == "xray":
@@ -0,0 +1,153 @@
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+import math
+import os
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from models.lab_history import LabObservation, LabTrend
+
+# Weight of the newest value in the exponentially weighted rolling statistics
+ROLLING_ALPHA = float(os.getenv("LAB_TREND_ALPHA", "0.3"))
+SECONDS_PER_DAY = 86400.0
+
+
+class LabHistoryService:
+    """Per-patient lab time series with incrementally maintained trends.
+
+    Every recorded value is appended to ``lab_observations`` and folded into
+    the matching ``lab_trends`` row, so reading a parameter's trend is a
+    single primary-key lookup no matter how long the history is.
+
+    Concurrent reports for one patient are serialised on the trend rows:
+    missing rows are created with ``INSERT ... ON CONFLICT DO NOTHING`` and
+    then read ``FOR UPDATE``, so neither a first insert nor an update is
+    lost. On SQLite the insert takes the database write lock before the
+    rows are read, which serialises the same way.
+    """
+
+    def __init__(self, alpha: float = ROLLING_ALPHA):
+        if not 0 < alpha <= 1:
+            raise ValueError("Rolling alpha must be in (0, 1]")
+        self.alpha = alpha
+
+    def record(
+        self,
+        db: Session,
+        patient_id: str,
+        values: Dict[Tuple[str, str], Tuple[float, str]],
+        observed_at: Optional[datetime] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Store one set of results and return the updated trend per parameter.
+
+        ``values`` maps ``(test, parameter)`` to ``(value, unit)``.
+        """
+        observed_at = observed_at or datetime.utcnow()
+        trends = {}
+        if values:
+            insert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}[db.get_bind().dialect.name]
+            db.execute(insert(LabTrend).values([
+                {"patient_id": patient_id, "test": test, "parameter": parameter} for test, parameter in values
+            ]).on_conflict_do_nothing())
+            parameters = {parameter for _, parameter in values}
+            trends = {
+                (trend.test, trend.parameter): trend
+                for trend in db.query(LabTrend)
+                .filter(LabTrend.patient_id == patient_id, LabTrend.parameter.in_(parameters))
+                .with_for_update()
+                .populate_existing()
+                .all()
+            }
+
+        for (test, parameter), (value, unit) in values.items():
+            db.add(LabObservation(
+                patient_id=patient_id,
+                test=test,
+                parameter=parameter,
+                value=value,
+                unit=unit,
+                observed_at=observed_at,
+            ))
+            self._update_trend(trends[(test, parameter)], value, unit, observed_at)
+
+        db.commit()
+        return {
+            f"{test}.{parameter}": self._summarize(trends[(test, parameter)])
+            for test, parameter in values
+        }
+
+    def get_trends(self, db: Session, patient_id: str) -> Dict[str, Dict[str, Any]]:
+        """Return the current trend of every parameter recorded for a patient."""
+        trends = db.query(LabTrend).filter(LabTrend.patient_id == patient_id).all()
+        return {f"{trend.test}.{trend.parameter}": self._summarize(trend) for trend in trends}
+
+    def get_history(
+        self, db: Session, patient_id: str, test: str, parameter: str, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Return the most recent observations of one parameter, newest first."""
+        observations = (
+            db.query(LabObservation)
+            .filter(
+                LabObservation.patient_id == patient_id,
+                LabObservation.test == test,
+                LabObservation.parameter == parameter,
+            )
+            .order_by(LabObservation.observed_at.desc())
+            .limit(limit)
+            .all()
+        )
+        return [
+            {"value": obs.value, "unit": obs.unit, "observed_at": obs.observed_at.isoformat()}
+            for obs in observations
+        ]
+
+    def _update_trend(self, trend: LabTrend, value: float, unit: str, observed_at: datetime) -> None:
+        """Fold one observation into the running aggregates in O(1)."""
+        if not trend.count:
+            trend.count = 0
+            trend.first_observed_at = observed_at
+            trend.sum_t = trend.sum_y = trend.sum_tt = trend.sum_ty = 0.0
+
+        t = (observed_at - trend.first_observed_at).total_seconds() / SECONDS_PER_DAY
+        trend.count += 1
+        trend.unit = unit
+        trend.sum_t += t
+        trend.sum_y += value
+        trend.sum_tt += t * t
+        trend.sum_ty += t * value
+
+        # Backfilled observations count towards the slope but not the latest value
+        if trend.last_observed_at is not None and observed_at < trend.last_observed_at:
+            return
+
+        if trend.rolling_mean is None:
+            trend.rolling_mean = value
+            trend.rolling_var = 0.0
+        else:
+            diff = value - trend.rolling_mean
+            increment = self.alpha * diff
+            trend.rolling_mean += increment
+            trend.rolling_var = (1 - self.alpha) * (trend.rolling_var + diff * increment)
+
+        trend.previous_value = trend.last_value
+        trend.delta = value - trend.last_value if trend.last_value is not None else None
+        trend.last_value = value
+        trend.last_observed_at = observed_at
+
+    @staticmethod
+    def _summarize(trend: LabTrend) -> Dict[str, Any]:
+        """Turn a trend row into the response payload."""
+        n = trend.count
+        denominator = n * trend.sum_tt - trend.sum_t ** 2
+        slope = (n * trend.sum_ty - trend.sum_t * trend.sum_y) / denominator if n > 1 and denominator > 1e-12 else None
+        return {
+            "count": n,
+            "unit": trend.unit,
+            "last_value": trend.last_value,
+            "previous_value": trend.previous_value,
+            "delta": trend.delta,
+            "rolling_mean": trend.rolling_mean,
+            "rolling_std": math.sqrt(trend.rolling_var) if trend.rolling_var is not None else None,
+            "slope_per_day": slope,
+            "first_observed_at": trend.first_observed_at.isoformat() if trend.first_observed_at else None,
+            "last_observed_at": trend.last_observed_at.isoformat() if trend.last_observed_at else None,
+        }
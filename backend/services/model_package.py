@@ -0,0 +1,207 @@
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+import functools
+import json
+import os
+import shutil
+import struct
+import threading
+import torch
+
+# A model package is a directory holding the architecture config and the
+# weights in the safetensors layout: an 8-byte little-endian header length,
+# a JSON header mapping tensor names to dtype, shape and byte range, then
+# the raw little-endian tensor data.
+PACKAGE_FORMAT = "neurolab-model"
+PACKAGE_VERSION = 1
+CONFIG_NAME = "config.json"
+WEIGHTS_NAME = "model.safetensors"
+HEADER_ALIGNMENT = 8
+
+_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+_DTYPE_NAMES = {dtype: name for name, dtype in _DTYPES.items()}
+
+
+# Set per thread by skip_init; the wrapped torch.nn.init functions check it
+_skipping = threading.local()
+_wrap_lock = threading.Lock()
+_wrapped = False
+
+
+def _skippable(function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if getattr(_skipping, "depth", 0):
+            return args[0] if args else kwargs.get("tensor")
+        return function(*args, **kwargs)
+    return wrapper
+
+
+def _wrap_init_functions() -> None:
+    """Replace each public ``torch.nn.init`` function, once, with one that honours skip_init."""
+    global _wrapped
+    with _wrap_lock:
+        if _wrapped:
+            return
+        for name in dir(torch.nn.init):
+            if name.endswith("_") and not name.startswith("_"):
+                setattr(torch.nn.init, name, _skippable(getattr(torch.nn.init, name)))
+        _wrapped = True
+
+
+@contextmanager
+def skip_init() -> Iterator[None]:
+    """Build modules without initialising their weights.
+
+    Random initialisation is most of the cost of building a network whose
+    weights are about to be replaced by loaded ones (about 110 ms of 180 ms
+    for DenseNet121 on CPU). Every ``torch.nn.init`` function is a no-op
+    inside the block, so parameters keep whatever memory they were given;
+    load a full state dict into anything built here.
+
+    Only the calling thread is affected: the init functions are wrapped
+    once and check a thread-local depth, so loads may overlap and networks
+    built on other threads meanwhile are initialised as usual.
+    """
+    _wrap_init_functions()
+    _skipping.depth = getattr(_skipping, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        _skipping.depth -= 1
+
+
+def save_safetensors(tensors: Dict[str, torch.Tensor], path: str,
+                     metadata: Optional[Dict[str, str]] = None) -> None:
+    """Write tensors to a safetensors file.
+
+    Tensors are laid out largest element size first, so every tensor starts
+    on a multiple of its element size and can be viewed in place on load.
+    """
+    tensors = {name: tensor.detach().cpu().contiguous() for name, tensor in tensors.items()}
+    order = sorted(tensors, key=lambda name: (-tensors[name].element_size(), name))
+    header: Dict[str, Any] = {"__metadata__": dict(metadata)} if metadata else {}
+    offset = 0
+    for name in order:
+        tensor = tensors[name]
+        if tensor.dtype not in _DTYPE_NAMES:
+            raise ValueError(f"Tensor '{name}' has unsupported dtype {tensor.dtype}")
+        size = tensor.numel() * tensor.element_size()
+        header[name] = {"dtype": _DTYPE_NAMES[tensor.dtype], "shape": list(tensor.shape),
+                        "data_offsets": [offset, offset + size]}
+        offset += size
+    raw_header = json.dumps(header, separators=(",", ":")).encode()
+    raw_header += b" " * (-len(raw_header) % HEADER_ALIGNMENT)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack("<Q", len(raw_header)))
+        f.write(raw_header)
+        for name in order:
+            f.write(tensors[name].reshape(-1).view(torch.uint8).numpy())
+    os.replace(tmp_path, path)
+
+
+def read_safetensors_header(path: str) -> Tuple[Dict[str, Any], int]:
+    """Return a safetensors file's header and the byte offset of its data."""
+    with open(path, "rb") as f:
+        prefix = f.read(8)
+        if len(prefix) != 8:
+            raise ValueError(f"{path} is not a safetensors file")
+        header_size = struct.unpack("<Q", prefix)[0]
+        if header_size > os.fstat(f.fileno()).st_size - 8:
+            raise ValueError(f"{path} has a truncated header")
+        header = json.loads(f.read(header_size))
+    return header, 8 + header_size
+
+
+def load_safetensors(path: str, device: Any = "cpu") -> Dict[str, torch.Tensor]:
+    """Load a safetensors file without copying it.
+
+    The file is mapped copy-on-write and every tensor is a view into that
+    one mapping, so loading only parses the header; pages are read when
+    the weights are first used and stay shared with other processes
+    mapping the same file.
+    """
+    header, data_start = read_safetensors_header(path)
+    header.pop("__metadata__", None)
+    size = os.path.getsize(path)
+    storage = torch.UntypedStorage.from_file(path, False, size)
+    data = torch.empty(0, dtype=torch.uint8).set_(storage)
+
+    tensors = {}
+    for name, info in header.items():
+        dtype = _DTYPES.get(info["dtype"])
+        if dtype is None:
+            raise ValueError(f"Tensor '{name}' has unsupported dtype {info['dtype']}")
+        begin, end = info["data_offsets"]
+        if data_start + end > size:
+            raise ValueError(f"Tensor '{name}' runs past the end of {path}")
+        raw = data[data_start + begin:data_start + end]
+        itemsize = torch.empty(0, dtype=dtype).element_size()
+        if (data_start + begin) % itemsize:
+            # Written by a tool that did not align the data; copy this one
+            raw = raw.clone()
+        tensor = raw.view(dtype).reshape(info["shape"])
+        tensors[name] = tensor if str(device) == "cpu" else tensor.to(device)
+    return tensors
+
+
+def is_package(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, CONFIG_NAME))
+
+
+def read_package_config(path: str) -> Dict[str, Any]:
+    with open(os.path.join(path, CONFIG_NAME)) as f:
+        config = json.load(f)
+    if config.get("format") != PACKAGE_FORMAT:
+        raise ValueError(f"{path} is not a model package")
+    if config.get("format_version", 0) > PACKAGE_VERSION:
+        raise ValueError(f"{path} needs a newer model package reader (version {config['format_version']})")
+    return config
+
+
+def save_package(path: str, config: Dict[str, Any], state_dict: Dict[str, torch.Tensor],
+                 source: Optional[str] = None) -> str:
+    """Write a model package directory, replacing any existing one.
+
+    ``config`` names the model, its architecture and the architecture's
+    parameters; the service that loads the package builds the network from
+    it, so no code is unpickled.
+    """
+    config = {
+        "format": PACKAGE_FORMAT,
+        "format_version": PACKAGE_VERSION,
+        **config,
+        "source": source,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    tmp_path = f"{path.rstrip(os.sep)}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    save_safetensors(state_dict, os.path.join(tmp_path, WEIGHTS_NAME),
+                     metadata={"model": str(config.get("model")), "architecture": str(config.get("architecture"))})
+    with open(os.path.join(tmp_path, CONFIG_NAME), "w") as f:
+        json.dump(config, f, indent=2)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_package(path: str, device: Any = "cpu") -> Tuple[Dict[str, Any], Dict[str, torch.Tensor]]:
+    """Return a package's config and its memory-mapped state dict."""
+    config = read_package_config(path)
+    return config, load_safetensors(os.path.join(path, WEIGHTS_NAME), device)
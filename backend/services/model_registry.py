@@ -0,0 +1,277 @@
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+COLD, LOADING, READY, FAILED = "cold", "loading", "ready", "failed"
+DEFAULT_VERSION = "default"
+# How long a deploy waits for requests on the replaced version to finish
+MODEL_DRAIN_TIMEOUT_SECONDS = float(os.getenv("MODEL_DRAIN_TIMEOUT_SECONDS", "300"))
+# How often a worker checks whether another worker switched a model's version
+MODEL_SYNC_INTERVAL_SECONDS = float(os.getenv("MODEL_SYNC_INTERVAL_SECONDS", "2"))
+
+
+class ModelVersion:
+    """One loaded service plus the number of requests currently using it."""
+
+    def __init__(self, version: str, service: Any, path: Optional[str] = None):
+        self.version = version
+        self.service = service
+        self.path = path
+        self.loaded_at = datetime.utcnow()
+        self.in_flight = 0
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "path": self.path,
+            "loaded_at": self.loaded_at.isoformat(),
+            "in_flight": self.in_flight,
+            "precision": getattr(self.service, "precision", None),
+            "cascade": getattr(self.service, "cascade_stats", None),
+        }
+
+
+class _Slot:
+    def __init__(self, factory: Callable[[Optional[str]], Any]):
+        self.factory = factory
+        self.state = COLD
+        self.active: Optional[ModelVersion] = None
+        self.previous: Optional[ModelVersion] = None
+        self.deploy: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.load_lock = threading.Lock()
+        self.checked_at = 0.0
+
+
+class ModelRegistry:
+    """Builds analysis services on first use or in the background, and swaps versions live.
+
+    Each factory takes an optional model file and imports its heavy
+    dependencies itself, so importing the app does not pull in torch or
+    MONAI. Requests hold a lease on the active version; ``deploy`` builds
+    and warms a new version off the request path and then switches new
+    leases to it in one step, while requests already running finish on the
+    version they started with. The replaced version stays loaded for an
+    instant ``rollback``.
+
+    With a ``state_dir``, every switch is also written to
+    ``<state_dir>/<name>.active.json`` so that worker processes agree on the
+    active version. Each worker reads that file at most every
+    ``MODEL_SYNC_INTERVAL_SECONDS`` before handing out a lease and, when
+    another worker has switched, loads the published version in the
+    background and switches to it as a deploy would. Workers therefore
+    converge within the interval plus the load time, and a worker that
+    starts later loads the published version rather than the default.
+    """
+
+    def __init__(self, factories: Dict[str, Callable[[Optional[str]], Any]], state_dir: Optional[str] = None):
+        self._slots = {name: _Slot(factory) for name, factory in factories.items()}
+        self.state_dir = state_dir
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def get(self, name: str) -> Any:
+        """Return the active service, building the default one if nobody has yet."""
+        return self._active(name).service
+
+    @contextmanager
+    def lease(self, name: str) -> Iterator[ModelVersion]:
+        """Hold the active version for the duration of one request."""
+        self._active(name)
+        with self._lock:
+            version = self._slots[name].active
+            version.in_flight += 1
+        try:
+            yield version
+        finally:
+            with self._lock:
+                version.in_flight -= 1
+
+    def is_ready(self, name: str) -> bool:
+        return self._slots[name].active is not None
+
+    def preload(self, names: Optional[Iterable[str]] = None) -> None:
+        """Build the given services (all by default) on the calling thread."""
+        for name in names or list(self._slots):
+            try:
+                self.get(name)
+            except RuntimeError:
+                logger.exception("Preloading %s failed", name)
+
+    def preload_in_background(self, names: Optional[Iterable[str]] = None) -> None:
+        """Build services one after another on a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self.preload, args=(list(names) if names else None,), name="model-preload", daemon=True
+            )
+            self._thread.start()
+
+    def deploy(self, name: str, version: str, path: Optional[str], wait: bool = False,
+               publish: bool = True) -> Dict[str, Any]:
+        """Load, warm and activate a model file as a new version.
+
+        Runs on a background thread unless ``wait`` is set. If loading
+        fails, the active version keeps serving and the error is reported
+        in ``status``. Once it is active the version is published to the
+        other workers, unless it came from them.
+        """
+        slot = self._slots[name]
+        with self._lock:
+            if slot.deploy is not None and slot.deploy["state"] == LOADING:
+                raise ValueError(f"Version {slot.deploy['version']} of '{name}' is still being deployed")
+            slot.deploy = {"version": version, "path": path, "state": LOADING, "error": None,
+                           "started_at": datetime.utcnow().isoformat()}
+        if wait:
+            self._deploy(name, slot, version, path, publish)
+        else:
+            threading.Thread(target=self._deploy, args=(name, slot, version, path, publish),
+                             name=f"model-deploy-{name}", daemon=True).start()
+        return dict(slot.deploy)
+
+    def rollback(self, name: str) -> Dict[str, Any]:
+        """Switch back to the version that was active before the last switch."""
+        slot = self._slots[name]
+        with self._lock:
+            if slot.previous is None:
+                raise ValueError(f"No previous version of '{name}' to roll back to")
+            slot.active, slot.previous = slot.previous, slot.active
+        self._publish(name, slot.active)
+        logger.info("Rolled %s back to version %s", name, slot.active.version)
+        return self._describe(slot)
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: self._describe(slot) for name, slot in self._slots.items()}
+
+    @property
+    def ready(self) -> bool:
+        """True once nothing is loading or failed; services never requested stay cold."""
+        return all(slot.state in (READY, COLD) for slot in self._slots.values()) and \
+            (self._thread is None or not self._thread.is_alive())
+
+    def _state_path(self, name: str) -> str:
+        return os.path.join(self.state_dir, f"{name}.active.json")
+
+    def _published(self, name: str) -> Optional[Dict[str, Any]]:
+        """The version other workers switched to last, if versions are shared."""
+        if self.state_dir is None:
+            return None
+        try:
+            with open(self._state_path(name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _publish(self, name: str, version: ModelVersion) -> None:
+        if self.state_dir is None:
+            return
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = self._state_path(name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": version.version, "path": version.path,
+                       "switched_at": datetime.utcnow().isoformat()}, f)
+        os.replace(tmp_path, path)
+
+    def _sync(self, name: str, slot: _Slot) -> None:
+        """Follow a switch another worker published, without blocking the request."""
+        now = time.monotonic()
+        if self.state_dir is None or now - slot.checked_at < MODEL_SYNC_INTERVAL_SECONDS:
+            return
+        slot.checked_at = now
+        published = self._published(name)
+        if published is None or published["version"] == slot.active.version:
+            return
+        with self._lock:
+            if slot.previous is not None and slot.previous.version == published["version"]:
+                slot.active, slot.previous = slot.previous, slot.active
+                logger.info("Switched %s to version %s as another worker did", name, published["version"])
+                return
+            if slot.deploy is not None and slot.deploy["version"] == published["version"] \
+                    and slot.deploy["state"] in (LOADING, FAILED):
+                # Already loading it, or it failed here; the failure is in status
+                return
+        try:
+            self.deploy(name, published["version"], published["path"], publish=False)
+        except ValueError:
+            # Another deploy is loading; check again next time
+            slot.checked_at = 0.0
+
+    def _active(self, name: str) -> ModelVersion:
+        slot = self._slots[name]
+        if slot.active is not None:
+            self._sync(name, slot)
+            return slot.active
+        with slot.load_lock:
+            if slot.active is None:
+                self._load_default(name, slot)
+        if slot.active is None:
+            raise RuntimeError(f"Model '{name}' failed to load: {slot.error}")
+        return slot.active
+
+    def _load_default(self, name: str, slot: _Slot) -> None:
+        slot.state = LOADING
+        slot.error = None
+        start = time.perf_counter()
+        # A worker starting after a switch loads the version the others use
+        published = self._published(name) or {"version": DEFAULT_VERSION, "path": None}
+        slot.checked_at = time.monotonic()
+        try:
+            service = slot.factory(published["path"])
+        except Exception as e:
+            slot.state = FAILED
+            slot.error = str(e)
+            logger.exception("Loading %s failed", name)
+        else:
+            with self._lock:
+                # A deploy may have finished first; it wins
+                if slot.active is None:
+                    slot.active = ModelVersion(published["version"], service, published["path"])
+            slot.state = READY
+        slot.load_seconds = round(time.perf_counter() - start, 3)
+
+    def _deploy(self, name: str, slot: _Slot, version: str, path: Optional[str], publish: bool) -> None:
+        try:
+            new = ModelVersion(version, slot.factory(path), path)
+        except Exception as e:
+            logger.exception("Deploying %s version %s failed", name, version)
+            with self._lock:
+                slot.deploy.update(state=FAILED, error=str(e))
+            return
+        with self._lock:
+            slot.previous, slot.active = slot.active, new
+            slot.state = READY
+            slot.deploy.update(state="draining")
+        if publish:
+            self._publish(name, new)
+        replaced = slot.previous
+        logger.info("Switched %s to version %s", name, version)
+
+        # New requests already use the new version; wait for the old ones
+        deadline = time.monotonic() + MODEL_DRAIN_TIMEOUT_SECONDS
+        while replaced is not None and replaced.in_flight and time.monotonic() < deadline:
+            time.sleep(0.05)
+        with self._lock:
+            slot.deploy.update(
+                state=READY if replaced is None or not replaced.in_flight else "drain_timeout",
+                finished_at=datetime.utcnow().isoformat(),
+            )
+
+    @staticmethod
+    def _describe(slot: _Slot) -> Dict[str, Any]:
+        return {
+            "state": slot.state,
+            "load_seconds": slot.load_seconds,
+            "error": slot.error,
+            "active": slot.active.describe() if slot.active else None,
+            "previous": slot.previous.describe() if slot.previous else None,
+            "deploy": dict(slot.deploy) if slot.deploy else None,
+        }
@@ -0,0 +1,126 @@
+from typing import Any, List, Optional, Tuple
+import numpy as np
+
+
+class NumpyMLP:
+    """Inference-only MLP made of dense layers with optional ReLU.
+
+    Layers are stored as contiguous float32 ``(inputs, outputs)`` weight
+    matrices, so a forward pass is one matmul, bias add and activation per
+    layer. Building or loading one does not need torch.
+    """
+
+    def __init__(self, layers: List[Tuple[np.ndarray, np.ndarray, bool]]):
+        self.layers = [
+            (
+                np.ascontiguousarray(weight, dtype=np.float32),
+                np.ascontiguousarray(bias, dtype=np.float32),
+                bool(relu),
+            )
+            for weight, bias, relu in layers
+        ]
+
+    @property
+    def in_features(self) -> int:
+        return self.layers[0][0].shape[0]
+
+    @property
+    def out_features(self) -> int:
+        return self.layers[-1][0].shape[1]
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        """Return the logits for a ``(rows, in_features)`` array."""
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        for weight, bias, relu in self.layers:
+            x = x @ weight
+            x += bias
+            if relu:
+                np.maximum(x, 0, out=x)
+        return x
+
+    def predict_proba(self, x: np.ndarray) -> np.ndarray:
+        """Return the softmax probabilities for a ``(rows, in_features)`` array."""
+        logits = self(x)
+        logits -= logits.max(axis=1, keepdims=True)
+        np.exp(logits, out=logits)
+        logits /= logits.sum(axis=1, keepdims=True)
+        return logits
+
+    def save(self, path: str) -> None:
+        """Write the layers to an ``.npz`` file."""
+        arrays = {}
+        for idx, (weight, bias, relu) in enumerate(self.layers):
+            arrays[f"weight_{idx}"] = weight
+            arrays[f"bias_{idx}"] = bias
+            arrays[f"relu_{idx}"] = np.array(relu)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyMLP":
+        """Read layers written by :meth:`save`."""
+        with np.load(path) as arrays:
+            count = sum(1 for name in arrays.files if name.startswith("weight_"))
+            return cls([
+                (arrays[f"weight_{idx}"], arrays[f"bias_{idx}"], bool(arrays[f"relu_{idx}"]))
+                for idx in range(count)
+            ])
+
+    @classmethod
+    def from_torch(cls, model: Any) -> "NumpyMLP":
+        """Fold an ``nn.Sequential`` of Linear, ReLU, BatchNorm1d and Dropout layers.
+
+        BatchNorm uses its running statistics, as in eval mode. It is folded
+        into the preceding Linear layer, or into the next one when a ReLU sits
+        in between. Dropout is dropped. Raises ValueError for any other layer.
+        """
+        import torch.nn as nn
+
+        layers = []
+        # Affine (scale, shift) from a BatchNorm that still has to be applied to the next input
+        pending: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        for module in model.children() if isinstance(model, nn.Sequential) else [model]:
+            if isinstance(module, nn.Linear):
+                weight = module.weight.detach().cpu().double().numpy().T
+                bias = (
+                    module.bias.detach().cpu().double().numpy()
+                    if module.bias is not None else np.zeros(weight.shape[1])
+                )
+                if pending is not None:
+                    scale, shift = pending
+                    bias = bias + shift @ weight
+                    weight = scale[:, None] * weight
+                    pending = None
+                layers.append([weight, bias, False])
+            elif isinstance(module, nn.ReLU):
+                if not layers or layers[-1][2] or pending is not None:
+                    raise ValueError("ReLU must directly follow a Linear layer")
+                layers[-1][2] = True
+            elif isinstance(module, nn.BatchNorm1d):
+                if module.running_mean is None:
+                    raise ValueError("BatchNorm1d without running statistics cannot be folded")
+                mean = module.running_mean.detach().cpu().double().numpy()
+                var = module.running_var.detach().cpu().double().numpy()
+                scale = 1.0 / np.sqrt(var + module.eps)
+                if module.affine:
+                    scale = scale * module.weight.detach().cpu().double().numpy()
+                    shift = module.bias.detach().cpu().double().numpy() - mean * scale
+                else:
+                    shift = -mean * scale
+                if pending is not None:
+                    pending = (pending[0] * scale, pending[1] * scale + shift)
+                elif layers and not layers[-1][2]:
+                    layers[-1][0] = layers[-1][0] * scale[None, :]
+                    layers[-1][1] = layers[-1][1] * scale + shift
+                else:
+                    pending = (scale, shift)
+            elif isinstance(module, (nn.Dropout, nn.Identity)):
+                continue
+            else:
+                raise ValueError(f"Cannot export layer {type(module).__name__} to NumPy")
+
+        if pending is not None:
+            scale, shift = pending
+            layers.append([np.diag(scale), shift, False])
+        if not layers:
+            raise ValueError("Model has no Linear layers to export")
+        return cls([tuple(layer) for layer in layers])
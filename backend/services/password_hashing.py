@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+import asyncio
+import os
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+
+
+class PasswordHasher:
+    """Runs bcrypt hashing and verification on a dedicated, size-limited thread pool.
+
+    bcrypt releases the GIL, so the pool caps how many CPU cores password
+    work can take at once, for example when every technician logs in at
+    shift change, and leaves the rest for inference. Hashes with a cost
+    other than ``rounds`` are reported as needing an update, so callers can
+    rehash them when the policy changes.
+    """
+
+    def __init__(self, rounds: int = BCRYPT_ROUNDS, max_workers: int = PASSWORD_HASH_WORKERS):
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=rounds,
+            bcrypt__min_rounds=rounds,
+            bcrypt__max_rounds=rounds,
+        )
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+
+    def hash(self, password: str) -> str:
+        return self._executor.submit(self.context.hash, password).result()
+
+    def hash_many(self, passwords: List[str]) -> List[str]:
+        """Hash several passwords in parallel across the pool."""
+        return list(self._executor.map(self.context.hash, passwords))
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        return self._executor.submit(self.context.verify, password, hashed_password).result()
+
+    def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password and return a new hash if the stored one uses an outdated cost."""
+        return self._executor.submit(self.context.verify_and_update, password, hashed_password).result()
+
+    async def hash_async(self, password: str) -> str:
+        return await asyncio.wrap_future(self._executor.submit(self.context.hash, password))
+
+    async def hash_many_async(self, passwords: List[str]) -> List[str]:
+        return await asyncio.gather(*(self.hash_async(password) for password in passwords))
+
+    async def verify_and_update_async(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await asyncio.wrap_future(
+            self._executor.submit(self.context.verify_and_update, password, hashed_password)
+        )
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+password_hasher = PasswordHasher()
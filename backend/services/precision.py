@@ -0,0 +1,85 @@
+from contextlib import nullcontext
+from typing import Any, ContextManager, Dict, List, Optional
+import os
+import torch
+
+# Inference precision per imaging modality, e.g. "xray=bf16,ct=channels_last".
+# Modalities not listed run fp32. The lab model is a NumPy MLP and always fp32.
+INFERENCE_PRECISION = os.getenv("INFERENCE_PRECISION", "")
+# A mode is only enabled if, on the reference inputs, it agrees with fp32 on
+# at least this share of predictions and moves no confidence by more than
+# PRECISION_MAX_DRIFT
+PRECISION_MIN_AGREEMENT = float(os.getenv("PRECISION_MIN_AGREEMENT", "1.0"))
+PRECISION_MAX_DRIFT = float(os.getenv("PRECISION_MAX_DRIFT", "0.02"))
+
+FP32, BF16, CHANNELS_LAST = "fp32", "bf16", "channels_last"
+PRECISIONS = (FP32, BF16, CHANNELS_LAST)
+
+
+def configured_precision(modality: str, setting: Optional[str] = None) -> str:
+    """Return the precision configured for a modality in ``INFERENCE_PRECISION``."""
+    setting = INFERENCE_PRECISION if setting is None else setting
+    for entry in filter(None, (part.strip() for part in setting.split(","))):
+        name, _, precision = entry.partition("=")
+        if name.strip().lower() == modality:
+            precision = precision.strip().lower()
+            if precision not in PRECISIONS:
+                raise ValueError(f"Unknown inference precision '{precision}' for {modality}")
+            return precision
+    return FP32
+
+
+def autocast(precision: str) -> ContextManager:
+    """The context to run a forward pass in."""
+    if precision == BF16:
+        return torch.autocast("cpu", dtype=torch.bfloat16)
+    return nullcontext()
+
+
+def memory_format(precision: str, spatial_dims: int) -> torch.memory_format:
+    if precision != CHANNELS_LAST:
+        return torch.contiguous_format
+    return torch.channels_last if spatial_dims == 2 else torch.channels_last_3d
+
+
+def compare_outputs(reference: torch.Tensor, candidate: torch.Tensor) -> Dict[str, Any]:
+    """Compare two batches of logits by prediction and softmax confidence."""
+    reference = torch.softmax(reference.float(), dim=1)
+    candidate = torch.softmax(candidate.float(), dim=1)
+    reference_confidence, reference_prediction = reference.max(dim=1)
+    candidate_prediction = candidate.argmax(dim=1)
+    # Drift of the confidence in the class fp32 chose
+    drift = (candidate.gather(1, reference_prediction[:, None])[:, 0] - reference_confidence).abs()
+    return {
+        "samples": len(reference),
+        "prediction_agreement": round(float((candidate_prediction == reference_prediction).float().mean()), 4),
+        "max_confidence_drift": round(float(drift.max()), 5),
+        "mean_confidence_drift": round(float(drift.mean()), 5),
+    }
+
+
+def accuracy_report(
+    model: torch.nn.Module,
+    inputs: List[torch.Tensor],
+    precision: str,
+    spatial_dims: int,
+    min_agreement: float = PRECISION_MIN_AGREEMENT,
+    max_drift: float = PRECISION_MAX_DRIFT,
+) -> Dict[str, Any]:
+    """Run the reference inputs in fp32 and in ``precision`` and compare them.
+
+    The model is left in the memory format of ``precision``; callers that
+    reject the mode should convert it back.
+    """
+    batch = torch.cat(inputs)
+    with torch.no_grad():
+        model.to(memory_format=torch.contiguous_format)
+        reference = model(batch)
+        model.to(memory_format=memory_format(precision, spatial_dims))
+        with autocast(precision):
+            candidate = model(batch.contiguous(memory_format=memory_format(precision, spatial_dims)))
+    report = {"precision": precision, **compare_outputs(reference, candidate),
+              "min_agreement": min_agreement, "max_drift": max_drift}
+    report["passed"] = (report["prediction_agreement"] >= min_agreement
+                        and report["max_confidence_drift"] <= max_drift)
+    return report
@@ -0,0 +1,471 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import functools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from services.dicom_index import read_header, read_pixels
+
+PREVIEW_CACHE_DIR = os.getenv(
+    "PREVIEW_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "previews")
+)
+# Least recently viewed pyramids are deleted once the cache grows past this
+PREVIEW_CACHE_MAX_BYTES = int(os.getenv("PREVIEW_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+TILE_SIZE = 256
+TILE_QUALITY = 90
+# Level name and the longest side it is scaled to fit (None: full resolution)
+PREVIEW_LEVELS = (("thumbnail", TILE_SIZE), ("mid", 1024), ("full", None))
+LEVEL_NAMES = tuple(name for name, _ in PREVIEW_LEVELS)
+
+# Decoded volumes kept in memory, so each slice of a study is not decoded again
+PREVIEW_VOLUME_CACHE_SIZE = int(os.getenv("PREVIEW_VOLUME_CACHE_SIZE", "2"))
+# Decoded slices kept in memory, so the larger levels of a pyramid reuse the
+# decode that built its thumbnail
+PREVIEW_IMAGE_CACHE_SIZE = int(os.getenv("PREVIEW_IMAGE_CACHE_SIZE", "2"))
+
+# numpy, PIL and pydicom are imported where they are used, so importing the
+# app does not load them
+_NPY_MAGIC = b"\x93NUMPY"
+MANIFEST = "manifest.json"
+
+
+def _to_8bit(pixels: "numpy.ndarray") -> "Image.Image":
+    """Min-max scale a 2D array of any depth to an 8-bit grayscale image."""
+    import numpy as np
+    from PIL import Image
+
+    pixels = np.asarray(pixels, dtype=np.float32)
+    low, high = float(pixels.min()), float(pixels.max())
+    scale = 255.0 / (high - low) if high > low else 0.0
+    return Image.fromarray(((pixels - low) * scale).astype(np.uint8))
+
+
+def _source_kind(path: str) -> str:
+    with open(path, "rb") as f:
+        head = f.read(132)
+    if head.startswith(_NPY_MAGIC):
+        return "npy"
+    if head[128:132] == b"DICM":
+        return "dicom"
+    return "image"
+
+
+def describe_instance(instance: Dict[str, Any]) -> Dict[str, Any]:
+    """Dimensions and slice count of a DICOM file from its parsed or indexed header."""
+    if not (instance["rows"] and instance["columns"]):
+        raise ValueError("This DICOM file has no pixel data")
+    return {"kind": "dicom", "width": instance["columns"], "height": instance["rows"],
+            "slices": instance["number_of_frames"] or 1, "instance": instance}
+
+
+@functools.lru_cache(maxsize=4096)
+def describe_source(path: str) -> Dict[str, Any]:
+    """Kind, dimensions and slice count of a stored file, read from its header without decoding pixels.
+
+    ``.npy`` volumes are sliced along their last axis and multi-frame DICOM
+    by frame; plain images have one slice. Stored files never change, so
+    the description is cached by path.
+    """
+    kind = _source_kind(path)
+    if kind == "npy":
+        import numpy as np
+
+        shape = np.load(path, mmap_mode="r", allow_pickle=False).shape
+        if len(shape) not in (2, 3):
+            raise ValueError(f"Cannot preview an array of shape {shape}")
+        return {"kind": kind, "width": shape[1], "height": shape[0], "slices": shape[2] if len(shape) == 3 else 1}
+    if kind == "dicom":
+        return describe_instance(read_header(path))
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+    except Exception as e:
+        raise ValueError(f"Cannot decode image: {e}")
+    return {"kind": kind, "width": width, "height": height, "slices": 1}
+
+
+def load_volume(path: str, header: Optional[Dict[str, Any]] = None) -> Optional[Tuple["numpy.ndarray", int]]:
+    """Pixels of a stored ``.npy`` array or DICOM file and the axis its slices lie on.
+
+    Arrays and uncompressed DICOM are memory mapped, so only the slices
+    that are used get read; compressed DICOM is decoded whole. A DICOM
+    ``header`` from the index saves parsing the file again. Colour
+    samples are averaged to gray. Returns None for other files.
+    """
+    kind = _source_kind(path)
+    if kind == "npy":
+        import numpy as np
+
+        return np.load(path, mmap_mode="r", allow_pickle=False), -1
+    if kind == "dicom":
+        header = header or read_header(path)
+        try:
+            pixels = read_pixels(path, header)
+        except Exception as e:
+            raise ValueError(f"Cannot decode DICOM pixel data: {e}")
+        if (header["samples_per_pixel"] or 1) > 1:
+            # Colour samples are the last axis; frames, if any, the first
+            pixels = pixels.mean(axis=-1)
+        return pixels, 0
+    return None
+
+
+def _pick_slice(pixels: "numpy.ndarray", index: Optional[int], axis: int) -> Tuple["numpy.ndarray", int, int]:
+    """Return one 2D slice of a 2D or 3D array, the middle one by default."""
+    if pixels.ndim == 2:
+        if index not in (None, 0):
+            raise ValueError("This image has no slices")
+        return pixels, 0, 1
+    if pixels.ndim != 3:
+        raise ValueError(f"Cannot preview an array of shape {pixels.shape}")
+    depth = pixels.shape[axis]
+    index = depth // 2 if index is None else index
+    if not 0 <= index < depth:
+        raise ValueError(f"Slice {index} is out of range (0-{depth - 1})")
+    return pixels.take(index, axis=axis), index, depth
+
+
+def load_preview_image(path: str, slice_index: Optional[int] = None,
+                       volume: Optional[Tuple["numpy.ndarray", int]] = None) -> Tuple["Image.Image", int, int]:
+    """Decode a stored image or one slice of a stored volume for display.
+
+    Returns the image with the slice index and the number of slices.
+    Volumes come from ``load_volume``, or ``volume`` when the caller has
+    already loaded it; anything else is opened with PIL. Images deeper
+    than 8 bits are min-max scaled to 8-bit grayscale.
+    """
+    import numpy as np
+    from PIL import Image
+
+    if volume is None:
+        volume = load_volume(path)
+    if volume is not None:
+        pixels, index, depth = _pick_slice(volume[0], slice_index, volume[1])
+        return _to_8bit(pixels), index, depth
+    try:
+        image = Image.open(path)
+        image.load()
+    except Exception as e:
+        raise ValueError(f"Cannot decode image: {e}")
+    if slice_index not in (None, 0):
+        raise ValueError("This image has no slices")
+    if image.mode in ("L", "RGB"):
+        return image, 0, 1
+    if image.mode in ("I", "F") or image.mode.startswith("I;16"):
+        return _to_8bit(np.asarray(image)), 0, 1
+    return image.convert("RGB"), 0, 1
+
+
+def level_layouts(width: int, height: int) -> List[Dict[str, Any]]:
+    """Size and tile grid of each level of a ``width`` x ``height`` image, coarsest first.
+
+    Each level is scaled down from the next larger one to fit its longest
+    side; none is scaled up.
+    """
+    levels = []
+    for name, longest in reversed(PREVIEW_LEVELS):
+        if longest is not None and max(width, height) > longest:
+            factor = longest / max(width, height)
+            width, height = max(1, round(width * factor)), max(1, round(height * factor))
+        levels.append({"name": name, "width": width, "height": height,
+                       "columns": -(-width // TILE_SIZE), "rows": -(-height // TILE_SIZE)})
+    return levels[::-1]
+
+
+def build_level(image: "Image.Image", layout: Dict[str, Any], directory: str) -> None:
+    """Write ``image``, scaled to one level's ``layout``, as ``TILE_SIZE`` JPEG tiles.
+
+    Tiles are ``<column>_<row>.jpg`` in ``directory``; edge tiles are
+    cropped, not padded.
+    """
+    from PIL import Image
+
+    size = (layout["width"], layout["height"])
+    if image.size != size:
+        image = image.resize(size, Image.LANCZOS, reducing_gap=2.0)
+    for row in range(layout["rows"]):
+        for column in range(layout["columns"]):
+            box = (column * TILE_SIZE, row * TILE_SIZE,
+                   min((column + 1) * TILE_SIZE, image.width), min((row + 1) * TILE_SIZE, image.height))
+            image.crop(box).save(os.path.join(directory, f"{column}_{row}.jpg"), "JPEG", quality=TILE_QUALITY)
+
+
+def _directory_size(directory: str) -> int:
+    total = 0
+    for parent, _, files in os.walk(directory):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(parent, name))
+            except OSError:
+                pass
+    return total
+
+
+class PreviewCache:
+    """Tiled preview pyramids of stored artifacts, built as they are viewed and kept on disk.
+
+    A pyramid covers one image, or one slice of a volume, and lives in
+    ``<root>/<sha[:2]>/<sha>[-s<slice>]/``; a volume viewed without a slice
+    shares the pyramid of its middle slice. Its manifest is laid out from
+    the source's header alone, and each level is written the first time
+    one of its tiles is asked for, so a viewer gets the thumbnail without
+    waiting for the full-resolution tiles. Concurrent requests for a level
+    wait for its build rather than decoding again. The last few decoded
+    slices and volumes stay in memory, so the levels of one pyramid, and
+    the slices of one study, share a decode. The cache is bounded by
+    ``max_bytes`` and evicts whole pyramids, least recently viewed first.
+    Recency survives restarts as the mtime of each pyramid's manifest.
+    """
+
+    def __init__(self, root: str = PREVIEW_CACHE_DIR, max_bytes: int = PREVIEW_CACHE_MAX_BYTES,
+                 volume_cache_size: int = PREVIEW_VOLUME_CACHE_SIZE,
+                 image_cache_size: int = PREVIEW_IMAGE_CACHE_SIZE):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.volume_cache_size = volume_cache_size
+        self.image_cache_size = image_cache_size
+        self._lock = threading.Lock()
+        self._building: Dict[str, threading.Lock] = {}
+        self._loading: Dict[Tuple[str, str], threading.Lock] = {}
+        self._volumes: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._images: "OrderedDict[str, Image.Image]" = OrderedDict()
+        self._entries: Optional["OrderedDict[str, int]"] = None
+        self._bytes = 0
+        self._stats = {"hits": 0, "builds": 0, "evictions": 0, "volume_loads": 0, "decodes": 0,
+                       "build_seconds": 0.0}
+
+    @staticmethod
+    def _source(source_path: str, instance: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return describe_instance(instance) if instance is not None else describe_source(source_path)
+
+    @staticmethod
+    def _resolve(sha256: str, source: Dict[str, Any], slice_index: Optional[int]) -> Tuple[str, int]:
+        """Return the pyramid key and slice index a request refers to.
+
+        The default slice is resolved here, from the header alone, so it
+        is cached under the same key as when it is asked for explicitly.
+        """
+        depth = source["slices"]
+        if depth == 1:
+            if slice_index not in (None, 0):
+                raise ValueError("This image has no slices")
+            return sha256, 0
+        index = depth // 2 if slice_index is None else slice_index
+        if not 0 <= index < depth:
+            raise ValueError(f"Slice {index} is out of range (0-{depth - 1})")
+        return f"{sha256}-s{index}", index
+
+    def _directory(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def _load_index(self) -> "OrderedDict[str, int]":
+        """Scan the cache directory once, ordering pyramids by when they were last viewed."""
+        if self._entries is None:
+            found = []
+            if os.path.isdir(self.root):
+                for prefix in os.listdir(self.root):
+                    parent = os.path.join(self.root, prefix)
+                    if not os.path.isdir(parent):
+                        continue
+                    for key in os.listdir(parent):
+                        manifest = os.path.join(parent, key, MANIFEST)
+                        if key.startswith(".") or not os.path.exists(manifest):
+                            continue
+                        found.append((os.path.getmtime(manifest), key, _directory_size(os.path.join(parent, key))))
+            self._entries = OrderedDict((key, size) for _, key, size in sorted(found))
+            self._bytes = sum(self._entries.values())
+        return self._entries
+
+    def manifest(self, sha256: str, source_path: str, slice_index: Optional[int] = None,
+                 instance: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Return a pyramid's layout, writing it from the header of ``source_path`` if it is not cached.
+
+        With no ``slice_index`` a volume is previewed at its middle slice.
+        ``instance`` is the DICOM index's row for the file, whose geometry
+        and pixel data offset are then used instead of parsing the file.
+        Raises ValueError if the source cannot be read or has no such slice.
+        """
+        source = self._source(source_path, instance)
+        key, index = self._resolve(sha256, source, slice_index)
+        return self._manifest(sha256, source, key, index)
+
+    def _manifest(self, sha256: str, source: Dict[str, Any], key: str, index: int) -> Dict[str, Any]:
+        directory = self._directory(key)
+        path = os.path.join(directory, MANIFEST)
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            pass
+        else:
+            self._touch(key, path)
+            return manifest
+        manifest = {"sha256": sha256, "slice": index, "slices": source["slices"], "tile_size": TILE_SIZE,
+                    "levels": level_layouts(source["width"], source["height"])}
+        os.makedirs(directory, exist_ok=True)
+        fd, staging = tempfile.mkstemp(dir=directory, prefix=".manifest-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f)
+        os.replace(staging, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            entries = self._load_index()
+            if key not in entries:
+                entries[key] = size
+                self._bytes += size
+            self._evict(keep=key)
+        return manifest
+
+    def tile(self, sha256: str, source_path: str, level: str, column: int, row: int,
+             slice_index: Optional[int] = None, instance: Optional[Dict[str, Any]] = None) -> str:
+        """Return the path of one tile, building its level first if needed."""
+        if level not in LEVEL_NAMES:
+            raise ValueError(f"Unknown preview level '{level}'")
+        source = self._source(source_path, instance)
+        key, index = self._resolve(sha256, source, slice_index)
+        path = os.path.join(self._directory(key), level, f"{column}_{row}.jpg")
+        if os.path.exists(path):
+            self._touch(key, os.path.join(self._directory(key), MANIFEST))
+            return path
+        manifest = self._manifest(sha256, source, key, index)
+        layout = next(entry for entry in manifest["levels"] if entry["name"] == level)
+        if not (0 <= column < layout["columns"] and 0 <= row < layout["rows"]):
+            raise LookupError(f"No tile {column},{row} at level {level}")
+        # An evicted pyramid between the checks above is rebuilt
+        if not os.path.exists(path):
+            self._build(sha256, source_path, source, key, index, layout)
+        return path
+
+    def tile_bytes(self, sha256: str, source_path: str, level: str, column: int, row: int,
+                   slice_index: Optional[int] = None, instance: Optional[Dict[str, Any]] = None) -> bytes:
+        """Read one tile as ``tile`` finds it, retrying once if it is evicted before the read."""
+        for attempt in range(2):
+            try:
+                with open(self.tile(sha256, source_path, level, column, row, slice_index, instance), "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                if attempt:
+                    raise
+
+    def _touch(self, key: str, manifest_path: str) -> None:
+        with self._lock:
+            entries = self._load_index()
+            if key in entries:
+                entries.move_to_end(key)
+            self._stats["hits"] += 1
+        try:
+            os.utime(manifest_path)
+        except OSError:
+            pass
+
+    def _load_once(self, cache: "OrderedDict[str, Any]", limit: int, key: str, stat: str,
+                   load: Callable[[], Any]) -> Any:
+        """Return ``cache[key]``, calling ``load`` once however many builds need it at the same time."""
+        with self._lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+            loading = self._loading.setdefault((stat, key), threading.Lock())
+        with loading:
+            try:
+                with self._lock:
+                    if key in cache:
+                        # Another build loaded it while this one waited
+                        return cache[key]
+                value = load()
+                with self._lock:
+                    self._stats[stat] += 1
+                    if limit > 0:
+                        cache[key] = value
+                        while len(cache) > limit:
+                            cache.popitem(last=False)
+                return value
+            finally:
+                with self._lock:
+                    self._loading.pop((stat, key), None)
+
+    def _image(self, sha256: str, source_path: str, source: Dict[str, Any], key: str, index: int) -> "Image.Image":
+        """Decode the slice a pyramid shows, loading its volume once for all of its slices."""
+        def decode():
+            volume = None
+            if source["kind"] != "image":
+                volume = self._load_once(self._volumes, self.volume_cache_size, sha256, "volume_loads",
+                                         lambda: load_volume(source_path, source.get("instance")))
+            return load_preview_image(source_path, index, volume)[0]
+
+        return self._load_once(self._images, self.image_cache_size, key, "decodes", decode)
+
+    def _build(self, sha256: str, source_path: str, source: Dict[str, Any], key: str, index: int,
+               layout: Dict[str, Any]) -> None:
+        building_key = f"{key}/{layout['name']}"
+        with self._lock:
+            building = self._building.setdefault(building_key, threading.Lock())
+        with building:
+            try:
+                directory = os.path.join(self._directory(key), layout["name"])
+                if os.path.isdir(directory):
+                    # Another request built it while this one waited
+                    return
+                start = time.perf_counter()
+                image = self._image(sha256, source_path, source, key, index)
+                staging = tempfile.mkdtemp(dir=os.path.dirname(directory), prefix=".build-")
+                try:
+                    build_level(image, layout, staging)
+                    os.replace(staging, directory)
+                except OSError:
+                    shutil.rmtree(staging, ignore_errors=True)
+                    if not os.path.isdir(directory):
+                        raise
+                    # Another worker process published the same level first
+                    return
+                except BaseException:
+                    shutil.rmtree(staging, ignore_errors=True)
+                    raise
+                size = _directory_size(directory)
+                with self._lock:
+                    entries = self._load_index()
+                    if key in entries:
+                        entries[key] += size
+                        self._bytes += size
+                    self._stats["builds"] += 1
+                    self._stats["build_seconds"] += time.perf_counter() - start
+                    self._evict(keep=key)
+            finally:
+                with self._lock:
+                    self._building.pop(building_key, None)
+
+    def _evict(self, keep: str) -> None:
+        # Called with self._lock held
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = next(iter(self._entries.items()))
+            if key == keep:
+                self._entries.move_to_end(key)
+                continue
+            del self._entries[key]
+            self._bytes -= size
+            self._stats["evictions"] += 1
+            shutil.rmtree(self._directory(key), ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._load_index()
+            builds = self._stats["builds"]
+            return {
+                "pyramids": len(entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._stats["hits"],
+                "builds": builds,
+                "evictions": self._stats["evictions"],
+                "volume_loads": self._stats["volume_loads"],
+                "decodes": self._stats["decodes"],
+                "build_ms_mean": round(self._stats["build_seconds"] * 1000 / builds, 1) if builds else None,
+            }
+
+
+preview_cache = PreviewCache()
@@ -0,0 +1,92 @@
+import json
+import os
+from typing import Dict, Any, List, Optional, Tuple
+
+SEVERITY_LEVELS = {"mild": 1, "moderate": 2, "severe": 3}
+DIRECTIONS = ("high", "low", "abnormal")
+
+DEFAULT_RULES_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "config", "recommendation_rules.json"
+)
+
+
+class RecommendationEngine:
+    """Declarative recommendation rules compiled into a flag index.
+
+    Each rule targets one structured abnormal flag, identified by
+    ``(parameter, direction)`` and optionally narrowed by category, test
+    type and a minimum severity. Rules are indexed once when the engine is
+    built, so evaluating a request only touches the rules its flags match.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = [self._compile_rule(position, rule) for position, rule in enumerate(rules)]
+        self._index: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        for rule in self.rules:
+            self._index.setdefault((rule["parameter"], rule["direction"]), []).append(rule)
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = None) -> "RecommendationEngine":
+        """Build an engine from a JSON rules file.
+
+        The path defaults to ``RECOMMENDATION_RULES_PATH`` if set, otherwise
+        to the rules shipped in ``config/recommendation_rules.json``.
+        """
+        path = path or os.getenv("RECOMMENDATION_RULES_PATH", DEFAULT_RULES_PATH)
+        with open(path) as f:
+            config = json.load(f)
+        return cls(config.get("rules", []))
+
+    @staticmethod
+    def _compile_rule(position: int, rule: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate a raw rule and normalize it for matching."""
+        for field in ("parameter", "direction", "recommendation"):
+            if field not in rule:
+                raise ValueError(f"Recommendation rule {position} is missing '{field}'")
+        direction = rule["direction"].lower()
+        if direction not in DIRECTIONS:
+            raise ValueError(
+                f"Recommendation rule {position} has unknown direction '{rule['direction']}'"
+            )
+        min_severity = rule.get("min_severity", "mild").lower()
+        if min_severity not in SEVERITY_LEVELS:
+            raise ValueError(
+                f"Recommendation rule {position} has unknown severity '{rule['min_severity']}'"
+            )
+        return {
+            "position": position,
+            "parameter": rule["parameter"],
+            "direction": direction,
+            "category": rule.get("category"),
+            "test": rule.get("test"),
+            "min_severity": SEVERITY_LEVELS[min_severity],
+            "recommendation": rule["recommendation"],
+        }
+
+    def candidates(self, flag: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Return the rules indexed under a flag's parameter and direction."""
+        return self._index.get((flag["parameter"], flag["direction"]), [])
+
+    def evaluate(self, flags: List[Dict[str, Any]]) -> List[str]:
+        """Return the recommendations triggered by a list of abnormal flags.
+
+        Recommendations keep the order of the rule table and each distinct
+        message is returned once.
+        """
+        matched = {}
+        for flag in flags:
+            severity = SEVERITY_LEVELS.get(flag.get("severity"), 1)
+            for rule in self.candidates(flag):
+                if rule["category"] and rule["category"] != flag.get("category"):
+                    continue
+                if rule["test"] and rule["test"] != flag.get("test"):
+                    continue
+                if severity < rule["min_severity"]:
+                    continue
+                matched[rule["position"]] = rule["recommendation"]
+
+        recommendations = []
+        for position in sorted(matched):
+            if matched[position] not in recommendations:
+                recommendations.append(matched[position])
+        return recommendations
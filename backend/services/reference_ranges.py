@@ -0,0 +1,131 @@
+import json
+import os
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+
+DEFAULT_RANGES_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "config", "reference_ranges.json"
+)
+
+SEX_ALIASES = {
+    "m": "male",
+    "male": "male",
+    "f": "female",
+    "female": "female",
+}
+
+MAX_AGE = 130
+
+
+class ReferenceRangeTable:
+    """Numeric reference ranges compiled into dense lookup arrays.
+
+    ``low`` and ``high`` have shape ``(fields, sexes, age_bands)``. Every
+    numeric parameter of ``test_categories`` is a field, identified by
+    ``(category, test, parameter)``. The base ranges in ``test_categories``
+    fill every cell, and the demographic overrides from the data file are
+    applied on top, least specific first. Ages are mapped to bands through
+    a precomputed table, so fetching one patient's ranges is plain integer
+    indexing.
+    """
+
+    def __init__(self, test_categories: Dict[str, Any], config: Dict[str, Any]):
+        self.sexes = ["any"] + [sex for sex in config.get("sexes", ["male", "female"]) if sex != "any"]
+        bands = sorted(config.get("age_bands", []), key=lambda band: band["min_age"])
+        if not bands or bands[0]["min_age"] != 0:
+            bands.insert(0, {"name": "all", "min_age": 0})
+        self.age_bands = [band["name"] for band in bands]
+        self.default_age_band = self.age_bands.index(config.get("default_age_band", self.age_bands[-1]))
+
+        self._age_to_band = np.zeros(MAX_AGE + 1, dtype=np.intp)
+        for band_idx, band in enumerate(bands):
+            self._age_to_band[band["min_age"]:] = band_idx
+
+        self.fields: List[Tuple[str, str, str]] = []
+        self.units: List[str] = []
+        for category, tests in test_categories.items():
+            for test_type, parameters in tests.items():
+                for param, ranges in parameters.items():
+                    if 'min' in ranges and 'max' in ranges:
+                        self.fields.append((category, test_type, param))
+                        self.units.append(ranges.get('unit', ''))
+        self.field_index = {field: idx for idx, field in enumerate(self.fields)}
+
+        shape = (len(self.fields), len(self.sexes), len(self.age_bands))
+        self.low = np.empty(shape, dtype=np.float64)
+        self.high = np.empty(shape, dtype=np.float64)
+        for idx, (category, test_type, param) in enumerate(self.fields):
+            ranges = test_categories[category][test_type][param]
+            self.low[idx] = ranges['min']
+            self.high[idx] = ranges['max']
+
+        overrides = config.get("ranges", [])
+        specificity = lambda entry: ('sex' in entry) + ('age_bands' in entry)
+        for entry in sorted(overrides, key=specificity):
+            self._apply_override(entry)
+
+    @classmethod
+    def from_file(cls, test_categories: Dict[str, Any], path: Optional[str] = None) -> "ReferenceRangeTable":
+        """Build the table from a JSON data file.
+
+        The path defaults to ``REFERENCE_RANGES_PATH`` if set, otherwise to
+        the ranges shipped in ``config/reference_ranges.json``.
+        """
+        path = path or os.getenv("REFERENCE_RANGES_PATH", DEFAULT_RANGES_PATH)
+        with open(path) as f:
+            config = json.load(f)
+        return cls(test_categories, config)
+
+    def _apply_override(self, entry: Dict[str, Any]) -> None:
+        """Write one demographic override into the lookup arrays."""
+        rows = [
+            idx for idx, (category, test_type, param) in enumerate(self.fields)
+            if param == entry["parameter"]
+            and entry.get("category", category) == category
+            and entry.get("test", test_type) == test_type
+        ]
+        if not rows:
+            raise ValueError(f"Reference range override for unknown parameter '{entry['parameter']}'")
+
+        if 'sex' in entry:
+            sex = SEX_ALIASES.get(entry['sex'].lower(), entry['sex'].lower())
+            if sex not in self.sexes:
+                raise ValueError(f"Reference range override has unknown sex '{entry['sex']}'")
+            sex_idx = [self.sexes.index(sex)]
+        else:
+            sex_idx = list(range(len(self.sexes)))
+
+        if 'age_bands' in entry:
+            unknown = [band for band in entry['age_bands'] if band not in self.age_bands]
+            if unknown:
+                raise ValueError(f"Reference range override has unknown age bands {unknown}")
+            band_idx = [self.age_bands.index(band) for band in entry['age_bands']]
+        else:
+            band_idx = list(range(len(self.age_bands)))
+
+        cells = np.ix_(rows, sex_idx, band_idx)
+        if 'min' in entry:
+            self.low[cells] = entry['min']
+        if 'max' in entry:
+            self.high[cells] = entry['max']
+
+    def sex_index(self, sex: Any) -> int:
+        """Map a sex value to its table index; unknown values use the base ranges."""
+        if not isinstance(sex, str):
+            return 0
+        sex = SEX_ALIASES.get(sex.strip().lower())
+        return self.sexes.index(sex) if sex in self.sexes else 0
+
+    def age_band_index(self, age: Any) -> int:
+        """Map an age in years to its band index; missing ages use the default band."""
+        try:
+            age = float(age)
+        except (TypeError, ValueError):
+            return self.default_age_band
+        if np.isnan(age):
+            return self.default_age_band
+        return int(self._age_to_band[int(min(max(age, 0), MAX_AGE))])
+
+    def lookup(self, sex_idx: np.ndarray, band_idx: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return ``(low, high)`` arrays of shape ``(patients, fields)``."""
+        return self.low[:, sex_idx, band_idx].T, self.high[:, sex_idx, band_idx].T
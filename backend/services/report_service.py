@@ -0,0 +1,217 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Optional
+import json
+import multiprocessing
+import os
+import threading
+
+DEFAULT_TEMPLATES_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "config", "report_templates.json"
+)
+# Outside static/, so reports are only served by the authenticated download route
+DEFAULT_REPORTS_DIR = os.getenv(
+    "REPORTS_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "reports")
+)
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+
+# Per-process render state, filled once by _init_worker so repeated renders
+# skip re-reading the templates, re-parsing TTF fonts and re-decoding the logo
+_templates: Optional[Dict[str, Any]] = None
+_fonts: Dict[str, str] = {}
+_logo: Any = None
+
+
+def _init_worker(templates_path: str) -> None:
+    """Load templates, register fonts and decode the logo for this process."""
+    global _templates, _logo
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    with open(templates_path) as f:
+        _templates = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(templates_path))
+    for role, font in _templates.get("fonts", {}).items():
+        # Fonts with a path are TrueType files; others are built-in PDF fonts
+        if font.get("path"):
+            pdfmetrics.registerFont(TTFont(font["name"], os.path.join(base_dir, font["path"])))
+        _fonts[role] = font["name"]
+    logo_path = os.getenv("REPORT_LOGO_PATH") or _templates.get("logo")
+    _logo = ImageReader(os.path.join(base_dir, logo_path)) if logo_path else None
+
+
+def render_report(modality: str, analysis: Dict[str, Any], output_path: str,
+                  templates_path: str = DEFAULT_TEMPLATES_PATH) -> str:
+    """Render one stored analysis to a PDF file and return its path.
+
+    ``analysis`` is the dict returned by ``AnalysisHistoryService.get``. The
+    file is written next to ``output_path`` and renamed into place, so a
+    reader never sees a partial PDF.
+    """
+    from reportlab.lib.pagesizes import A4, letter
+    from reportlab.lib.units import mm
+    from reportlab.lib.utils import simpleSplit
+    from reportlab.pdfgen import canvas
+
+    if _templates is None:
+        _init_worker(templates_path)
+    kind = "lab" if modality == "lab" else "imaging"
+    template = _templates["templates"][kind]
+    regular, bold = _fonts.get("regular", "Helvetica"), _fonts.get("bold", "Helvetica-Bold")
+    page_width, page_height = letter if _templates.get("page_size") == "letter" else A4
+    margin = 18 * mm
+    width = page_width - 2 * margin
+
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    pdf = canvas.Canvas(tmp_path, pagesize=(page_width, page_height))
+    pdf.setTitle(template["title"].format(modality=modality.upper()))
+    y = page_height - margin
+
+    def footer() -> None:
+        pdf.setFont(regular, 8)
+        pdf.drawString(margin, margin / 2, _templates.get("footer", ""))
+        pdf.drawRightString(page_width - margin, margin / 2, f"Page {pdf.getPageNumber()}")
+
+    def line(text: str, font: str = regular, size: float = 10, gap: float = 4) -> None:
+        nonlocal y
+        for chunk in simpleSplit(str(text), font, size, width) or [""]:
+            if y - size < margin:
+                footer()
+                pdf.showPage()
+                y = page_height - margin
+            pdf.setFont(font, size)
+            pdf.drawString(margin, y - size, chunk)
+            y -= size + gap
+
+    def heading(text: str) -> None:
+        nonlocal y
+        y -= 6
+        line(text, bold, 12)
+
+    if _logo is not None:
+        logo_width, logo_height = _logo.getSize()
+        scale = 14 * mm / logo_height
+        pdf.drawImage(_logo, page_width - margin - logo_width * scale, y - 14 * mm,
+                      logo_width * scale, 14 * mm, mask="auto")
+    line(template["title"].format(modality=modality.upper()), bold, 16, 8)
+    line(f"Analysis #{analysis['id']}    Created {analysis['created_at']}")
+    if analysis.get("patient_id"):
+        line(f"Patient {analysis['patient_id']}")
+
+    details = analysis.get("details") or {}
+    for section in template["sections"]:
+        if section == "summary":
+            heading("Summary")
+            line(f"Result: {analysis.get('result') or 'No abnormal findings'}")
+            if analysis.get("confidence") is not None:
+                line(f"Confidence: {analysis['confidence']:.1%}")
+            line(f"Abnormal: {'yes' if analysis.get('is_abnormal') else 'no'}")
+        elif section == "abnormal_flags" and details.get("abnormal_flags"):
+            heading("Abnormal results")
+            for flag in details["abnormal_flags"]:
+                ranges = flag.get("range") or {}
+                reference = f"{ranges.get('min')} - {ranges.get('max')} {ranges.get('unit', '')}".strip()
+                line(f"{flag['test']} - {flag['parameter']}: {flag['value']} "
+                     f"({flag['direction']}, {flag['severity']}; reference {reference})")
+        elif section == "interpretation" and details.get("interpretation"):
+            heading("Interpretation")
+            for entry in str(details["interpretation"]).split("\n"):
+                line(entry)
+        elif section == "recommendations" and details.get("recommendations"):
+            heading("Recommendations")
+            for recommendation in details["recommendations"]:
+                line(f"- {recommendation}")
+        elif section == "findings":
+            heading("Findings")
+            line(f"{details.get('result', analysis.get('result'))} "
+                 f"(model confidence {details.get('confidence', analysis.get('confidence'))})")
+    footer()
+    pdf.save()
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+class ReportService:
+    """Renders analysis reports to PDF in a background process pool.
+
+    Reports are keyed by analysis id and written to
+    ``<reports_dir>/analysis_<id>.pdf``, so a finished report is found on
+    disk after a restart. Rendering happens in worker processes that load
+    templates, fonts and the logo once at start-up; the request path only
+    submits a job and returns. Only running jobs are tracked in memory; a
+    finished job is dropped, keeping just its error if it failed.
+    """
+
+    def __init__(self, reports_dir: str = DEFAULT_REPORTS_DIR, max_workers: int = REPORT_WORKERS,
+                 templates_path: Optional[str] = None):
+        self.reports_dir = reports_dir
+        self.max_workers = max_workers
+        self.templates_path = templates_path or os.getenv("REPORT_TEMPLATES_PATH", DEFAULT_TEMPLATES_PATH)
+        self._jobs: Dict[int, Future] = {}
+        self._errors: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def report_path(self, analysis_id: int) -> str:
+        return os.path.join(self.reports_dir, f"analysis_{analysis_id}.pdf")
+
+    def submit(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a report for a stored analysis unless one exists or is in progress."""
+        analysis_id = analysis["id"]
+        job = None
+        with self._lock:
+            if analysis_id not in self._jobs and not os.path.exists(self.report_path(analysis_id)):
+                os.makedirs(self.reports_dir, exist_ok=True)
+                self._errors.pop(analysis_id, None)
+                job = self._jobs[analysis_id] = self._pool().submit(
+                    render_report, analysis["modality"], analysis,
+                    self.report_path(analysis_id), self.templates_path,
+                )
+        if job is not None:
+            # Added outside the lock: it runs at once if the job already finished
+            job.add_done_callback(lambda future: self._finish(analysis_id, future))
+        return self.status(analysis_id)
+
+    def _finish(self, analysis_id: int, job: Future) -> None:
+        with self._lock:
+            if self._jobs.get(analysis_id) is job:
+                del self._jobs[analysis_id]
+            if not job.cancelled() and job.exception() is not None:
+                self._errors[analysis_id] = str(job.exception())
+
+    def status(self, analysis_id: int) -> Dict[str, Any]:
+        """Return ``pending``, ``done``, ``failed`` or ``missing`` for a report."""
+        with self._lock:
+            job = self._jobs.get(analysis_id)
+            error = self._errors.get(analysis_id)
+        status = {"analysis_id": analysis_id}
+        if job is not None and not job.done():
+            status["status"] = "pending"
+        elif job is not None and job.exception() is not None:
+            status["status"] = "failed"
+            status["error"] = str(job.exception())
+        elif error is not None:
+            status["status"] = "failed"
+            status["error"] = error
+        elif os.path.exists(self.report_path(analysis_id)):
+            status["status"] = "done"
+            status["size"] = os.path.getsize(self.report_path(analysis_id))
+        else:
+            status["status"] = "missing"
+        return status
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned workers do not inherit the parent's torch threads and models
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.templates_path,),
+            )
+        return self._executor
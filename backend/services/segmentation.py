@@ -0,0 +1,152 @@
+from typing import Any, Dict, List, Optional, Sequence
+import base64
+import numpy as np
+import torch
+
+RLE, BITPACKED = "rle", "bitpacked"
+MASK_ENCODINGS = (RLE, BITPACKED)
+# Voxels per slab when walking the logits; bounds the temporary memory
+SLAB_VOXELS = 1 << 20
+
+
+class MaskEncoder:
+    """Builds one class's mask encoding and statistics slab by slab.
+
+    Slabs are consecutive ranges of the first axis, so in C order each one
+    continues the flattened mask exactly where the previous one stopped.
+    Run-length output is a flat list of ``start, length`` pairs of runs of
+    mask voxels; bit-packed output is ``numpy.packbits`` (big-endian bit
+    order) of the flattened mask, base64 encoded.
+    """
+
+    def __init__(self, shape: Sequence[int], encoding: str = RLE):
+        if encoding not in MASK_ENCODINGS:
+            raise ValueError(f"Unknown mask encoding '{encoding}'")
+        self.shape = tuple(shape)
+        self.encoding = encoding
+        self.voxels = 0
+        self._offset = 0
+        self._runs: List[int] = []
+        self._packed: List[bytes] = []
+        self._leftover = np.zeros(0, dtype=bool)
+        # Which indices along each axis hold at least one mask voxel
+        self._seen = [np.zeros(size, dtype=bool) for size in self.shape]
+
+    def add(self, mask: np.ndarray) -> None:
+        """Append the next slab, a boolean array of shape ``(rows,) + shape[1:]``."""
+        flat = mask.reshape(-1)
+        count = int(flat.sum())
+        if count:
+            row = self._offset // max(flat.size // mask.shape[0], 1)
+            for axis, seen in enumerate(self._seen):
+                projection = mask.any(axis=tuple(a for a in range(mask.ndim) if a != axis))
+                if axis == 0:
+                    seen[row:row + mask.shape[0]] = projection
+                else:
+                    seen |= projection
+        self.voxels += count
+        if self.encoding == RLE:
+            self._add_runs(flat)
+        else:
+            self._add_bits(flat)
+        self._offset += flat.size
+
+    def _add_runs(self, flat: np.ndarray) -> None:
+        if not flat.any():
+            return
+        edges = np.flatnonzero(np.diff(np.concatenate(([False], flat, [False])).astype(np.int8)))
+        starts, ends = edges[::2] + self._offset, edges[1::2] + self._offset
+        if self._runs and self._runs[-2] + self._runs[-1] == starts[0]:
+            # The previous slab ended inside this run
+            self._runs[-1] += int(ends[0] - starts[0])
+            starts, ends = starts[1:], ends[1:]
+        pairs = np.empty(2 * len(starts), dtype=np.int64)
+        pairs[0::2], pairs[1::2] = starts, ends - starts
+        self._runs.extend(pairs.tolist())
+
+    def _add_bits(self, flat: np.ndarray) -> None:
+        bits = np.concatenate((self._leftover, flat)) if len(self._leftover) else flat
+        whole = len(bits) - len(bits) % 8
+        self._packed.append(np.packbits(bits[:whole]).tobytes())
+        self._leftover = bits[whole:].copy()
+
+    def result(self, spacing: Sequence[float]) -> Dict[str, Any]:
+        voxel_ml = float(np.prod(spacing)) / 1000.0
+        bbox = None
+        if self.voxels:
+            bbox = {
+                "min": [int(np.argmax(seen)) for seen in self._seen],
+                "max": [len(seen) - 1 - int(np.argmax(seen[::-1])) for seen in self._seen],
+            }
+        if self.encoding == RLE:
+            mask = {"encoding": RLE, "runs": self._runs}
+        else:
+            packed = b"".join(self._packed) + (np.packbits(self._leftover).tobytes() if len(self._leftover) else b"")
+            mask = {"encoding": BITPACKED, "bits": base64.b64encode(packed).decode()}
+        return {"voxels": self.voxels, "volume_ml": round(self.voxels * voxel_ml, 4), "bbox": bbox, "mask": mask}
+
+
+def summarize_logits(
+    logits: torch.Tensor,
+    spacing: Optional[Sequence[float]] = None,
+    encoding: str = RLE,
+    slab_voxels: int = SLAB_VOXELS,
+) -> Dict[str, Any]:
+    """Turn ``(classes, *spatial)`` segmentation logits into masks and statistics.
+
+    The volume is walked in slabs along its first spatial axis. Each slab is
+    labelled by argmax over the logits (softmax preserves the order, so it
+    is never applied to the whole volume) and fed to one encoder per
+    foreground class; only a slab's worth of probabilities exists at a
+    time, for the confidence. Class 0 is background and gets no mask.
+    """
+    classes, *shape = logits.shape
+    spacing = list(spacing) if spacing is not None else [1.0] * len(shape)
+    encoders = {label: MaskEncoder(shape, encoding) for label in range(1, classes)}
+    plane = int(np.prod(shape[1:])) if len(shape) > 1 else 1
+    rows_per_slab = max(1, slab_voxels // plane)
+    confidence_sum = {label: 0.0 for label in range(classes)}
+    counts = {label: 0 for label in range(classes)}
+
+    with torch.no_grad():
+        for start in range(0, shape[0], rows_per_slab):
+            slab = logits[:, start:start + rows_per_slab].float()
+            confidence, labels = torch.softmax(slab, dim=0).max(dim=0)
+            labels = labels.to(torch.uint8).cpu().numpy()
+            confidence = confidence.cpu().numpy()
+            for label in range(classes):
+                mask = labels == label
+                counts[label] += int(mask.sum())
+                confidence_sum[label] += float(confidence[mask].sum())
+                if label in encoders:
+                    encoders[label].add(mask)
+
+    foreground = sum(counts[label] for label in encoders)
+    total = sum(counts.values())
+    if foreground:
+        confidence = sum(confidence_sum[label] for label in encoders) / foreground
+    else:
+        confidence = sum(confidence_sum.values()) / max(total, 1)
+    return {
+        "shape": [int(size) for size in shape],
+        "spacing_mm": [float(value) for value in spacing],
+        "order": "C",
+        "confidence": confidence,
+        "foreground_voxels": foreground,
+        "classes": [{"label": label, **encoder.result(spacing)} for label, encoder in encoders.items()],
+    }
+
+
+def decode_mask(mask: Dict[str, Any], shape: Sequence[int]) -> np.ndarray:
+    """Expand an encoded mask back into a boolean array (for clients and tests)."""
+    size = int(np.prod(shape))
+    if mask["encoding"] == RLE:
+        flat = np.zeros(size, dtype=bool)
+        runs = mask["runs"]
+        for start, length in zip(runs[0::2], runs[1::2]):
+            flat[start:start + length] = True
+    elif mask["encoding"] == BITPACKED:
+        flat = np.unpackbits(np.frombuffer(base64.b64decode(mask["bits"]), dtype=np.uint8), count=size).astype(bool)
+    else:
+        raise ValueError(f"Unknown mask encoding '{mask['encoding']}'")
+    return flat.reshape(shape)
@@ -0,0 +1,134 @@
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+import threading
+import time
+import orjson
+from pydantic import BaseModel
+from starlette.responses import Response
+
+try:
+    import msgpack
+except ImportError:  # MessagePack responses are optional
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+_MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _quality(accept: str, media_types: Tuple[str, ...]) -> float:
+    best = 0.0
+    for part in accept.split(","):
+        media_type, _, params = part.strip().partition(";")
+        if media_type.strip().lower() not in media_types:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        best = max(best, quality)
+    return best
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """Pick MessagePack when the client prefers it and msgpack is installed, JSON otherwise."""
+    if msgpack is None or not accept:
+        return JSON_MEDIA_TYPE
+    msgpack_quality = _quality(accept, _MSGPACK_MEDIA_TYPES)
+    if msgpack_quality > 0 and msgpack_quality >= _quality(accept, (JSON_MEDIA_TYPE,)):
+        return MSGPACK_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def encode(content: Any, media_type: str = JSON_MEDIA_TYPE) -> bytes:
+    if media_type == MSGPACK_MEDIA_TYPE:
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed")
+        return msgpack.packb(content, use_bin_type=True)
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+class SerializationStats:
+    """Per-endpoint totals of response validation and encoding time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, endpoint: str, media_type: str, validate_seconds: float,
+               encode_seconds: float, size: int) -> None:
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, {
+                "count": 0, "validate_seconds": 0.0, "encode_seconds": 0.0,
+                "max_seconds": 0.0, "bytes": 0, "media_types": {},
+            })
+            stats["count"] += 1
+            stats["validate_seconds"] += validate_seconds
+            stats["encode_seconds"] += encode_seconds
+            stats["max_seconds"] = max(stats["max_seconds"], validate_seconds + encode_seconds)
+            stats["bytes"] += size
+            stats["media_types"][media_type] = stats["media_types"].get(media_type, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Mean times in milliseconds and mean body size per endpoint."""
+        with self._lock:
+            return {
+                endpoint: {
+                    "count": stats["count"],
+                    "validate_ms_mean": round(stats["validate_seconds"] * 1000 / stats["count"], 3),
+                    "encode_ms_mean": round(stats["encode_seconds"] * 1000 / stats["count"], 3),
+                    "total_ms_max": round(stats["max_seconds"] * 1000, 3),
+                    "bytes_mean": stats["bytes"] // stats["count"],
+                    "media_types": dict(stats["media_types"]),
+                }
+                for endpoint, stats in self._endpoints.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+
+serialization_stats = SerializationStats()
+
+
+def typed_response(
+    endpoint: str,
+    schema: Type[BaseModel],
+    content: Union[Dict[str, Any], List[Dict[str, Any]]],
+    accept: Optional[str] = None,
+    status_code: int = 200,
+) -> Response:
+    """Validate a result (or list of results) against ``schema`` and encode it.
+
+    The body is JSON via orjson, or MessagePack when the Accept header asks
+    for it. Both steps are timed, recorded under ``endpoint`` and reported
+    in a ``Server-Timing`` header.
+    """
+    media_type = negotiate(accept)
+    # orjson encodes datetimes itself; MessagePack needs JSON-compatible values
+    mode = "json" if media_type == MSGPACK_MEDIA_TYPE else "python"
+    start = time.perf_counter()
+    if isinstance(content, list):
+        data = [schema.model_validate(item).model_dump(mode=mode) for item in content]
+    else:
+        data = schema.model_validate(content).model_dump(mode=mode)
+    validated = time.perf_counter()
+    body = encode(data, media_type)
+    encoded = time.perf_counter()
+
+    serialization_stats.record(endpoint, media_type, validated - start, encoded - validated, len(body))
+    return Response(
+        body,
+        status_code=status_code,
+        media_type=media_type,
+        headers={
+            "Server-Timing": f"validate;dur={(validated - start) * 1000:.3f}, "
+                             f"encode;dur={(encoded - validated) * 1000:.3f}",
+            "Vary": "Accept",
+        },
+    )
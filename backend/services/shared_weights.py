@@ -0,0 +1,80 @@
+from typing import Any, Dict, Optional
+import ctypes
+import os
+import re
+
+_ROLLUP_FIELD = re.compile(r"^(\w+):\s+(\d+) kB$")
+
+
+def shared_weights_path(name: str, suffix: str = ".weights.pt",
+                        weights_dir: Optional[str] = None) -> Optional[str]:
+    """Return the shared weight file for a model, if one has been prepared.
+
+    The directory defaults to ``MODEL_WEIGHTS_DIR``, which scripts/serve.py
+    sets for multi-worker serving.
+    """
+    weights_dir = weights_dir or os.getenv("MODEL_WEIGHTS_DIR")
+    if not weights_dir:
+        return None
+    path = os.path.join(weights_dir, f"{name}{suffix}")
+    return path if os.path.exists(path) else None
+
+
+def release_freed_memory() -> None:
+    """Return freed heap pages to the OS (glibc only; a no-op elsewhere).
+
+    Replacing a freshly built network's weights with mapped ones frees
+    tens of MB in small allocations that malloc would otherwise keep.
+    """
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def memory_report(pid: Any = "self", weights_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Split a process's memory into private and shared parts, in MiB.
+
+    Reads ``/proc/<pid>/smaps_rollup`` for the totals and ``/proc/<pid>/smaps``
+    for the mappings of the shared weight files. PSS divides shared pages
+    among the processes mapping them, so summing PSS over all workers gives
+    the real footprint. Returns an empty dict where /proc is unavailable.
+    """
+    weights_dir = weights_dir or os.getenv("MODEL_WEIGHTS_DIR")
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            rollup = _parse_smaps(f)
+    except OSError:
+        return {}
+    report = {
+        "pid": os.getpid() if pid == "self" else int(pid),
+        "rss_mib": rollup.get("Rss", 0) / 1024,
+        "pss_mib": rollup.get("Pss", 0) / 1024,
+        "shared_mib": (rollup.get("Shared_Clean", 0) + rollup.get("Shared_Dirty", 0)) / 1024,
+        "private_mib": (rollup.get("Private_Clean", 0) + rollup.get("Private_Dirty", 0)) / 1024,
+    }
+    if weights_dir:
+        weights = {"Rss": 0, "Pss": 0}
+        in_weights = False
+        weights_dir = os.path.abspath(weights_dir)
+        with open(f"/proc/{pid}/smaps") as f:
+            for line in f:
+                match = _ROLLUP_FIELD.match(line)
+                if match is None:
+                    # A mapping header line: "start-end perms offset dev inode [path]"
+                    fields = line.split()
+                    in_weights = len(fields) >= 6 and fields[5].startswith(weights_dir)
+                elif in_weights and match.group(1) in weights:
+                    weights[match.group(1)] += int(match.group(2))
+        report["weights_rss_mib"] = weights["Rss"] / 1024
+        report["weights_pss_mib"] = weights["Pss"] / 1024
+    return {key: round(value, 1) if isinstance(value, float) else value for key, value in report.items()}
+
+
+def _parse_smaps(lines) -> Dict[str, int]:
+    values = {}
+    for line in lines:
+        match = _ROLLUP_FIELD.match(line)
+        if match:
+            values[match.group(1)] = values.get(match.group(1), 0) + int(match.group(2))
+    return values
@@ -1,16 +1,21 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, List, Union
-from sklearn.preprocessing import StandardScaler
-import torch
-import torch.nn as nn
-from .base_service import BaseAnalysisService
+from typing import Dict, Any, List, Optional, Tuple, Union
+from .base_service import BaseAnalysisService, torch
+from .numpy_mlp import NumpyMLP
+from .shared_weights import shared_weights_path
+from .recommendation_engine import RecommendationEngine
+from .reference_ranges import ReferenceRangeTable
+from .unit_conversion import UnitConverter
+
+SEVERITIES = ('mild', 'moderate', 'severe')
+DEMOGRAPHIC_SECTIONS = ('patient', 'demographics')
 
 class TestAnalysisService(BaseAnalysisService):
-    def __init__(self):
+    def __init__(self, model_path: Optional[str] = None):
         super().__init__()
-        self.scaler = StandardScaler()
-        
+        self.numpy_model = None
+
         # Comprehensive test categories
         self.test_categories = {
             'blood': {
@@ -121,41 +126,143 @@ class TestAnalysisService(BaseAnalysisService):
                 }
             }
         }
-        self._load_default_model()
+        self._section_index, self._flat_index = self._build_parameter_index()
+        self._field_order = {
+            (category, test_type, param): position
+            for position, (category, test_type, param) in enumerate(
+                (category, test_type, param)
+                for category, tests in self.test_categories.items()
+                for test_type, parameters in tests.items()
+                for param in parameters
+            )
+        }
+        self.reference_ranges = ReferenceRangeTable.from_file(self.test_categories)
+        self.unit_converter = UnitConverter.from_file(self.reference_ranges.fields, self.reference_ranges.units)
+        self.recommendation_engine = RecommendationEngine.from_file()
+        if model_path:
+            self.load_model(model_path)
+        else:
+            self._load_default_model()
+
+    def _build_parameter_index(self) -> Tuple[Dict[str, List[Tuple[str, str]]], Dict[str, Tuple[str, str]]]:
+        """Index test sections by name and flat parameters by their first section."""
+        section_index = {}
+        flat_index = {}
+        for category, tests in self.test_categories.items():
+            section_index.setdefault(category.lower(), [])
+            for test_type, parameters in tests.items():
+                section_index[category.lower()].append((category, test_type))
+                section_index.setdefault(test_type.lower(), []).append((category, test_type))
+                for param in parameters:
+                    flat_index.setdefault(param, (category, test_type))
+        return section_index, flat_index
 
     def _load_default_model(self):
-        """Load the default model for test analysis."""
-        model_name = "test_analysis_model.pt"
-        model_path = self.get_model_path(model_name)
-        if model_path:
+        """Load the default model for test analysis.
+
+        An exported NumPy model is preferred, since it runs without torch.
+        """
+        numpy_model_path = self.get_model_path("test_analysis_model.npz")
+        package_path = self.get_model_path("test_analysis_model")
+        model_path = self.get_model_path("test_analysis_model.pt")
+        shared_path = shared_weights_path("lab", ".npz")
+        if numpy_model_path:
+            self.load_model(numpy_model_path)
+        elif shared_path:
+            self.load_model(shared_path)
+        elif package_path:
+            self.load_model(package_path)
+        elif model_path:
             self.load_model(model_path)
         else:
-            # Create a more sophisticated neural network for test analysis
-            self.model = nn.Sequential(
-                nn.Linear(50, 128),
-                nn.ReLU(),
-                nn.BatchNorm1d(128),
-                nn.Dropout(0.3),
-                nn.Linear(128, 64),
-                nn.ReLU(),
-                nn.BatchNorm1d(64),
-                nn.Dropout(0.2),
-                nn.Linear(64, 32),
-                nn.ReLU(),
-                nn.BatchNorm1d(32),
-                nn.Dropout(0.1),
-                nn.Linear(32, 2)
-            ).to(self.device)
+            if torch is None:
+                raise RuntimeError("No exported test analysis model found and torch is not installed")
+            self.model = self._build_network().to(self.device)
+            self.model.eval()
+            self.numpy_model = NumpyMLP.from_torch(self.model)
+
+    def network_config(self) -> Dict[str, Any]:
+        """Describe the lab network for a model package."""
+        return {"architecture": "LabMLP", "params": {"in_features": len(self.reference_ranges.fields)}}
+
+    def _build_network(self, config: Optional[Dict[str, Any]] = None):
+        """Build the untrained lab network described by ``config``."""
+        import torch.nn as nn
+
+        config = config or self.network_config()
+        if config["architecture"] != "LabMLP":
+            raise ValueError(f"Unknown network architecture '{config['architecture']}'")
+        # Create a more sophisticated neural network for test analysis
+        return nn.Sequential(
+            nn.Linear(config["params"]["in_features"], 128),
+            nn.ReLU(),
+            nn.BatchNorm1d(128),
+            nn.Dropout(0.3),
+            nn.Linear(128, 64),
+            nn.ReLU(),
+            nn.BatchNorm1d(64),
+            nn.Dropout(0.2),
+            nn.Linear(64, 32),
+            nn.ReLU(),
+            nn.BatchNorm1d(32),
+            nn.Dropout(0.1),
+            nn.Linear(32, 2)
+        )
 
     def load_model(self, model_path: str) -> None:
-        """Load a custom model from the specified path."""
+        """Load a custom model from the specified path.
+
+        ``.npz`` files hold an exported NumPy model. Model package
+        directories and torch models are folded into a NumPy model when
+        their layers allow it, and otherwise run through torch.
+        """
         try:
-            self.model = torch.load(model_path, map_location=self.device)
-            self.model.eval()
+            if model_path.endswith(".npz"):
+                self.model = self.numpy_model = NumpyMLP.load(model_path)
+            else:
+                if torch is None:
+                    raise RuntimeError("torch is not installed")
+                from .model_package import is_package, load_package, skip_init
+
+                if is_package(model_path):
+                    config, state_dict = load_package(model_path)
+                    if config.get("model") != "lab":
+                        raise ValueError(f"{model_path} holds a {config.get('model')} model, not lab")
+                    with skip_init():
+                        self.model = self._build_network(config)
+                    self.model.load_state_dict(state_dict, assign=True)
+                    self.model.to(self.device)
+                else:
+                    self.model = torch.load(model_path, map_location=self.device, weights_only=False)
+                self.model.eval()
+                try:
+                    self.numpy_model = NumpyMLP.from_torch(self.model)
+                except ValueError:
+                    self.numpy_model = None
             self.model_path = model_path
         except Exception as e:
             raise Exception(f"Failed to load model: {str(e)}")
 
+    def export_package(self, package_path: str, source: Optional[str] = None) -> str:
+        """Write the current torch model as a package of architecture config and safetensors weights."""
+        from .model_package import save_package
+
+        if torch is None or not isinstance(self.model, torch.nn.Module):
+            raise ValueError("The current model is not a torch model")
+        config = {"model": "lab", **self.network_config()}
+        state_dict = self.model.state_dict()
+        try:
+            self._build_network(config).load_state_dict(state_dict)
+        except RuntimeError as e:
+            raise ValueError(f"The current model does not match the LabMLP config: {e}")
+        return save_package(package_path, config, state_dict, source=source or self.model_path)
+
+    def export_numpy_model(self, path: str) -> None:
+        """Write the current model as a NumPy ``.npz`` model."""
+        if self.numpy_model is None:
+            raise ValueError("The current model cannot be exported to NumPy")
+        self.numpy_model.save(path)
+
     def analyze(self, test_data: Union[Dict[str, Any], pd.DataFrame]) -> Dict[str, Any]:
         """Analyze the test results and return interpretation."""
         try:
@@ -166,145 +273,275 @@ class TestAnalysisService(BaseAnalysisService):
                 df = test_data
 
             # Preprocess the data
-            processed_data = self._preprocess_data(df)
+            batch = self._extract_batch(df)
+            processed_data = self._preprocess_data(batch)
             
             # Perform analysis
             results = self._analyze_test_results(processed_data)
             
-            # Generate interpretation
-            interpretation = self._generate_interpretation(results, df)
-
-            return {
-                "results": results,
-                "interpretation": interpretation,
-                "confidence": self._calculate_confidence(results),
-                "timestamp": str(np.datetime64('now')),
-                "recommendations": self._generate_recommendations(interpretation)
-            }
+            # Flag abnormal values and generate interpretation
+            abnormal_tests = self._detect_abnormal_tests(batch)[0]
+            return self._build_result(results, abnormal_tests, str(np.datetime64('now')))
 
         except Exception as e:
             raise Exception(f"Analysis failed: {str(e)}")
 
-    def _preprocess_data(self, df: pd.DataFrame) -> torch.Tensor:
-        """Preprocess the test data for analysis."""
-        # Select numerical columns
-        numerical_cols = df.select_dtypes(include=[np.number]).columns
-        data = df[numerical_cols].values
+    def analyze_batch(self, test_data: Union[List[Dict[str, Any]], pd.DataFrame]) -> List[Dict[str, Any]]:
+        """Analyze one set of test results per row and return one interpretation per row."""
+        try:
+            df = pd.DataFrame(test_data) if isinstance(test_data, list) else test_data
 
-        # Scale the data
-        scaled_data = self.scaler.fit_transform(data)
-        
-        # Convert to tensor
-        return torch.FloatTensor(scaled_data).to(self.device)
+            batch = self._extract_batch(df)
+            processed_data = self._preprocess_data(batch)
+            results = self._analyze_test_results(processed_data)
+            batch_flags = self._detect_abnormal_tests(batch)
+
+            timestamp = str(np.datetime64('now'))
+            return [
+                self._build_result(
+                    {key: value[row:row + 1] for key, value in results.items()},
+                    abnormal_tests,
+                    timestamp,
+                )
+                for row, abnormal_tests in enumerate(batch_flags)
+            ]
+
+        except Exception as e:
+            raise Exception(f"Batch analysis failed: {str(e)}")
 
-    def _analyze_test_results(self, data: torch.Tensor) -> Dict[str, Any]:
+    def _build_result(self, results: Dict[str, Any], abnormal_tests: List[Dict[str, Any]], timestamp: str) -> Dict[str, Any]:
+        """Assemble the response for one set of test results."""
+        return {
+            "results": results,
+            "interpretation": self._generate_interpretation(abnormal_tests),
+            "abnormal_flags": abnormal_tests,
+            "confidence": self._calculate_confidence(results),
+            "timestamp": timestamp,
+            "recommendations": self._generate_recommendations(abnormal_tests)
+        }
+
+    def _preprocess_data(self, batch: Dict[str, Any]) -> np.ndarray:
+        """Build the model features for a batch.
+
+        Each numeric field is centred on its reference range and scaled by
+        half the range width. Missing values count as normal.
+        """
+        low, high = batch['low'], batch['high']
+        half_width = (high - low) / 2
+        half_width = np.where(half_width > 0, half_width, np.maximum(np.abs(high), 1))
+        features = (batch['values'] - (low + high) / 2) / half_width
+        return np.ascontiguousarray(np.nan_to_num(features, nan=0.0), dtype=np.float32)
+
+    def _analyze_test_results(self, data: np.ndarray) -> Dict[str, Any]:
         """Analyze the test results using the model."""
-        with torch.no_grad():
-            output = self.model(data)
-            probabilities = torch.softmax(output, dim=1)
-            return {
-                "probabilities": probabilities.cpu().numpy(),
-                "predictions": torch.argmax(probabilities, dim=1).cpu().numpy()
-            }
+        if self.numpy_model is not None:
+            if data.shape[1] != self.numpy_model.in_features:
+                raise ValueError(
+                    f"Model expects {self.numpy_model.in_features} features, got {data.shape[1]}"
+                )
+            probabilities = self.numpy_model.predict_proba(data)
+        else:
+            with torch.no_grad():
+                output = self.model(torch.from_numpy(data).to(self.device))
+                probabilities = torch.softmax(output, dim=1).cpu().numpy()
+        return {
+            "probabilities": probabilities,
+            "predictions": np.argmax(probabilities, axis=1)
+        }
+
+    def _extract_values(self, record: Dict[str, Any]) -> Dict[Tuple[str, str, str], Any]:
+        """Map a flat or section-nested record onto (category, test, parameter) keys.
+
+        Nested sections such as ``{"CBC": {"WBC": 12.5}}`` or
+        ``{"Urine": {"pH": 6.0}}`` are matched by test or category name. Flat
+        parameters belong to the first section that defines them. A value may
+        also be a measurement such as ``{"value": 7.2, "unit": "mmol/L"}``.
+        """
+        values = {}
+        for key, value in record.items():
+            if isinstance(value, dict) and 'value' in value and key in self._flat_index:
+                category, test_type = self._flat_index[key]
+                values.setdefault((category, test_type, key), value)
+            elif isinstance(value, dict):
+                for category, test_type in self._section_index.get(str(key).lower(), []):
+                    parameters = self.test_categories[category][test_type]
+                    for param, param_value in value.items():
+                        if param in parameters:
+                            values.setdefault((category, test_type, param), param_value)
+            elif key in self._flat_index:
+                if isinstance(value, float) and np.isnan(value):
+                    continue
+                category, test_type = self._flat_index[key]
+                values.setdefault((category, test_type, key), value)
+        return values
+
+    def extract_numeric_values(self, record: Dict[str, Any]) -> Dict[Tuple[str, str], Tuple[float, str]]:
+        """Return ``(test, parameter) -> (value, unit)`` for the record's numeric results."""
+        table = self.reference_ranges
+        numeric = {}
+        for field, value in self._extract_values(record).items():
+            if field in table.field_index:
+                col = table.field_index[field]
+                number, unit = self._split_measurement(field, value)
+                if unit is not None:
+                    number = float(self.unit_converter.convert(col, number, unit))
+                numeric[(field[1], field[2])] = (number, table.units[col])
+        return numeric
+
+    def _extract_demographics(self, record: Dict[str, Any]) -> Tuple[Any, Any]:
+        """Return the patient's ``(sex, age)`` from the record, if given."""
+        demographics = {}
+        for key, value in record.items():
+            if isinstance(value, dict) and str(key).lower() in DEMOGRAPHIC_SECTIONS:
+                demographics.update({str(k).lower(): v for k, v in value.items()})
+            elif not isinstance(value, dict):
+                demographics.setdefault(str(key).lower(), value)
+        return demographics.get('sex', demographics.get('gender')), demographics.get('age')
+
+    def _extract_batch(self, original_data: pd.DataFrame) -> Dict[str, Any]:
+        """Collect the numeric values and reference ranges of every row.
+
+        Numeric values go into a ``(rows, fields)`` array alongside each
+        patient's demographic ranges; categorical values are checked here.
+        """
+        table = self.reference_ranges
+        records = original_data.to_dict('records')
+        values = np.full((len(records), len(table.fields)), np.nan)
+        unit_codes = np.zeros((len(records), len(table.fields)), dtype=np.intp)
+        sex_idx = np.zeros(len(records), dtype=np.intp)
+        band_idx = np.zeros(len(records), dtype=np.intp)
+        raw_values = []
+        categorical_flags = []
+        for row, record in enumerate(records):
+            sex, age = self._extract_demographics(record)
+            sex_idx[row] = table.sex_index(sex)
+            band_idx[row] = table.age_band_index(age)
+
+            extracted = self._extract_values(record)
+            if not extracted:
+                raise ValueError(f"No recognized test results in row {row}")
+            row_raw = {}
+            row_flags = []
+            for field, value in extracted.items():
+                if isinstance(value, np.generic):
+                    value = value.item()
+                if field in table.field_index:
+                    col = table.field_index[field]
+                    values[row, col], unit = self._split_measurement(field, value)
+                    if unit is not None:
+                        unit_codes[row, col] = self.unit_converter.unit_code(col, unit)
+                    row_raw[col] = value['value'] if isinstance(value, dict) else value
+                    continue
+                if isinstance(value, dict):
+                    value = value.get('value')
+                category, test_type, param = field
+                ranges = self.test_categories[category][test_type][param]
+                if self._is_abnormal_category(value, ranges):
+                    row_flags.append(self._make_flag(field, value, 'abnormal', 'moderate', ranges))
+            raw_values.append(row_raw)
+            categorical_flags.append(row_flags)
 
-    def _generate_interpretation(self, results: Dict[str, Any], original_data: pd.DataFrame) -> str:
-        """Generate a human-readable interpretation of the results."""
+        # Normalize reported units to the reference units before range checks
+        converted = np.nonzero(unit_codes)
+        if len(converted[0]):
+            values = self.unit_converter.apply(values, unit_codes)
+            for row, col in zip(*converted):
+                raw_values[row][col] = round(float(values[row, col]), 4)
+
+        low, high = table.lookup(sex_idx, band_idx)
+        return {
+            'values': values,
+            'low': low,
+            'high': high,
+            'raw_values': raw_values,
+            'categorical_flags': categorical_flags,
+        }
+
+    def _detect_abnormal_tests(self, batch: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+        """Return the structured abnormal flags for every row of the batch.
+
+        Numeric values of the whole batch are checked at once against each
+        patient's demographic reference ranges.
+        """
+        table = self.reference_ranges
+        values, low, high = batch['values'], batch['low'], batch['high']
+        width = high - low
+        width = np.where(width > 0, width, np.maximum(np.abs(high), 1))
+        is_low = values < low
+        is_high = values > high
+        deviation = np.where(is_low, low - values, values - high) / width
+        severity = np.select([deviation >= 1.0, deviation >= 0.25], [2, 1], 0)
+
+        batch_flags = [list(row_flags) for row_flags in batch['categorical_flags']]
+        for row, col in zip(*np.nonzero(is_low | is_high)):
+            ranges = {'min': float(low[row, col]), 'max': float(high[row, col]), 'unit': table.units[col]}
+            batch_flags[row].append(self._make_flag(
+                table.fields[col],
+                batch['raw_values'][row][col],
+                'low' if is_low[row, col] else 'high',
+                SEVERITIES[severity[row, col]],
+                ranges,
+            ))
+        for row_flags in batch_flags:
+            row_flags.sort(key=lambda flag: self._field_order[(flag['category'], flag['test'], flag['parameter'])])
+        return batch_flags
+
+    @staticmethod
+    def _make_flag(field: Tuple[str, str, str], value: Any, direction: str, severity: str,
+                   ranges: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the structured flag for one abnormal value."""
+        category, test_type, param = field
+        return {
+            'category': category,
+            'test': test_type,
+            'parameter': param,
+            'value': value,
+            'direction': direction,
+            'severity': severity,
+            'range': ranges
+        }
+
+    @classmethod
+    def _split_measurement(cls, field: Tuple[str, str, str], value: Any) -> Tuple[float, Optional[str]]:
+        """Return the number and reported unit of a plain value or measurement dict."""
+        if isinstance(value, dict):
+            return cls._to_number(field, value.get('value')), value.get('unit')
+        return cls._to_number(field, value), None
+
+    @staticmethod
+    def _to_number(field: Tuple[str, str, str], value: Any) -> float:
+        """Convert a numeric test value, rejecting anything non-numeric."""
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value for {field[1]} - {field[2]}: {value!r}")
+
+    def _generate_interpretation(self, abnormal_tests: List[Dict[str, Any]]) -> str:
+        """Generate a human-readable interpretation of the abnormal flags."""
         interpretations = []
-        abnormal_tests = []
-        
-        # Check each test category
-        for category, tests in self.test_categories.items():
-            for test_type, parameters in tests.items():
-                for param, ranges in parameters.items():
-                    if param in original_data.columns:
-                        value = original_data[param].iloc[0]
-                        if self._is_abnormal(value, param, ranges):
-                            abnormal_tests.append({
-                                'test': test_type,
-                                'parameter': param,
-                                'value': value,
-                                'range': ranges
-                            })
-                            interpretations.append(
-                                f"{test_type} - {param}: {value} {ranges.get('unit', '')} "
-                                f"(Reference: {ranges.get('min', '')} - {ranges.get('max', '')})"
-                            )
+        for flag in abnormal_tests:
+            ranges = flag['range']
+            interpretations.append(
+                f"{flag['test']} - {flag['parameter']}: {flag['value']} {ranges.get('unit', '')} "
+                f"[{flag['direction'].capitalize()}] "
+                f"(Reference: {ranges.get('min', '')} - {ranges.get('max', '')})"
+            )
 
         if not interpretations:
             return "All test results are within normal ranges."
-        
+
         return " | ".join(interpretations)
 
-    def _is_abnormal(self, value: float, param: str, ranges: Dict[str, Any]) -> bool:
-        """Check if a test value is abnormal based on reference ranges."""
-        if 'normal' in ranges:
-            return value not in ranges['normal']
-        elif 'min' in ranges and 'max' in ranges:
-            return value < ranges['min'] or value > ranges['max']
-        return False
+    def _is_abnormal_category(self, value: Any, ranges: Dict[str, Any]) -> bool:
+        """Check if a categorical test value is outside its normal values."""
+        return 'normal' in ranges and value not in ranges['normal']
 
     def _calculate_confidence(self, results: Dict[str, Any]) -> float:
         """Calculate the confidence score for the analysis."""
         probabilities = results['probabilities']
         return float(np.max(probabilities, axis=1).mean())
 
-    def _generate_recommendations(self, interpretation: str) -> List[str]:
-        """Generate recommendations based on the interpretation."""
-        recommendations = []
-        
-        # Add general recommendations
-        if "CBC" in interpretation:
-            if "WBC" in interpretation and "high" in interpretation.lower():
-                recommendations.append("Consider follow-up for possible infection or inflammation")
-            if "Hemoglobin" in interpretation and "low" in interpretation.lower():
-                recommendations.append("Consider iron studies and dietary assessment")
-
-        if "LFT" in interpretation:
-            if any(x in interpretation.lower() for x in ["alt", "ast", "high"]):
-                recommendations.append("Consider viral hepatitis screening and alcohol assessment")
-            if "Bilirubin" in interpretation and "high" in interpretation.lower():
-                recommendations.append("Consider ultrasound of liver and biliary system")
-
-        if "KFT" in interpretation:
-            if "Creatinine" in interpretation and "high" in interpretation.lower():
-                recommendations.append("Consider renal ultrasound and proteinuria assessment")
-            if "eGFR" in interpretation and "low" in interpretation.lower():
-                recommendations.append("Consider nephrology consultation")
-
-        if "Lipid" in interpretation:
-            if "LDL" in interpretation and "high" in interpretation.lower():
-                recommendations.append("Consider lifestyle modifications and cardiovascular risk assessment")
-            if "HDL" in interpretation and "low" in interpretation.lower():
-                recommendations.append("Consider exercise and dietary modifications")
-
-        if "Thyroid" in interpretation:
-            if "TSH" in interpretation and "high" in interpretation.lower():
-                recommendations.append("Consider thyroid ultrasound and anti-TPO antibodies")
-            if "TSH" in interpretation and "low" in interpretation.lower():
-                recommendations.append("Consider thyroid scan and TRAb assessment")
-
-        if "Diabetes" in interpretation:
-            if "HbA1c" in interpretation and "high" in interpretation.lower():
-                recommendations.append("Consider OGTT and diabetes education")
-            if "Insulin" in interpretation and "high" in interpretation.lower():
-                recommendations.append("Consider insulin resistance assessment")
-
-        if "Inflammatory" in interpretation:
-            if "CRP" in interpretation and "high" in interpretation.lower():
-                recommendations.append("Consider autoimmune screening and inflammatory markers")
-            if "ESR" in interpretation and "high" in interpretation.lower():
-                recommendations.append("Consider temporal arteritis and polymyalgia rheumatica assessment")
-
-        if "Urine" in interpretation:
-            if "Protein" in interpretation and "high" in interpretation.lower():
-                recommendations.append("Consider 24-hour urine protein and renal function assessment")
-            if "Blood" in interpretation and "positive" in interpretation.lower():
-                recommendations.append("Consider urological evaluation and imaging")
-
-        if "Stool" in interpretation:
-            if "Occult_Blood" in interpretation and "positive" in interpretation.lower():
-                recommendations.append("Consider colonoscopy and upper GI endoscopy")
-            if "Parasites" in interpretation and "positive" in interpretation.lower():
-                recommendations.append("Consider antiparasitic treatment and follow-up testing")
-
-        return recommendations if recommendations else ["No specific recommendations at this time"] 
\ No newline at end of file
+    def _generate_recommendations(self, abnormal_tests: List[Dict[str, Any]]) -> List[str]:
+        """Generate recommendations from the structured abnormal flags."""
+        recommendations = self.recommendation_engine.evaluate(abnormal_tests)
+        return recommendations if recommendations else ["No specific recommendations at this time"]
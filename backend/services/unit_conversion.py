@@ -0,0 +1,92 @@
+import json
+import os
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+
+DEFAULT_CONVERSIONS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "config", "unit_conversions.json"
+)
+
+
+def normalize_unit(unit: Any) -> str:
+    """Canonical spelling of a unit for lookups (case, spaces and micro sign)."""
+    unit = "" if unit is None else str(unit)
+    return unit.strip().lower().replace(" ", "").replace("µ", "u").replace("μ", "u")
+
+
+class UnitConverter:
+    """Converts reported lab values to the units of the reference ranges.
+
+    Every numeric field accepts its reference unit plus the source units
+    listed in the conversion data file. Each ``(field, source unit)`` gets
+    an integer code, and ``scale``/``offset`` are dense ``(fields, codes)``
+    arrays, so a whole batch is normalized with one fancy-indexed
+    multiply-add. Code 0 is always the reference unit.
+    """
+
+    def __init__(self, fields: List[Tuple[str, str, str]], units: List[str], config: Dict[str, Any]):
+        self.fields = fields
+        self.units = units
+        self._codes: List[Dict[str, int]] = [{normalize_unit(unit): 0} for unit in units]
+        factors: List[List[Tuple[float, float]]] = [[(1.0, 0.0)] for _ in fields]
+
+        for entry in config.get("conversions", []):
+            rows = [
+                idx for idx, (category, test_type, param) in enumerate(fields)
+                if param == entry["parameter"]
+                and entry.get("category", category) == category
+                and entry.get("test", test_type) == test_type
+            ]
+            if not rows:
+                raise ValueError(f"Unit conversion for unknown parameter '{entry['parameter']}'")
+            unit = normalize_unit(entry["unit"])
+            for idx in rows:
+                if unit in self._codes[idx]:
+                    continue
+                self._codes[idx][unit] = len(factors[idx])
+                factors[idx].append((float(entry["scale"]), float(entry.get("offset", 0.0))))
+
+        width = max(len(field_factors) for field_factors in factors) if factors else 1
+        self.scale = np.ones((len(fields), width), dtype=np.float64)
+        self.offset = np.zeros((len(fields), width), dtype=np.float64)
+        for idx, field_factors in enumerate(factors):
+            for code, (scale, offset) in enumerate(field_factors):
+                self.scale[idx, code] = scale
+                self.offset[idx, code] = offset
+
+    @classmethod
+    def from_file(cls, fields: List[Tuple[str, str, str]], units: List[str],
+                  path: Optional[str] = None) -> "UnitConverter":
+        """Build the converter from a JSON data file.
+
+        The path defaults to ``UNIT_CONVERSIONS_PATH`` if set, otherwise to
+        the table shipped in ``config/unit_conversions.json``.
+        """
+        path = path or os.getenv("UNIT_CONVERSIONS_PATH", DEFAULT_CONVERSIONS_PATH)
+        with open(path) as f:
+            config = json.load(f)
+        return cls(fields, units, config)
+
+    def unit_code(self, field_idx: int, unit: Any) -> int:
+        """Return the code of a source unit, rejecting units that cannot be converted."""
+        code = self._codes[field_idx].get(normalize_unit(unit))
+        if code is None:
+            _, test_type, param = self.fields[field_idx]
+            accepted = [self.units[field_idx]] + [
+                name for name, idx in self._codes[field_idx].items() if idx
+            ]
+            raise ValueError(
+                f"Unknown unit {unit!r} for {test_type} - {param}; "
+                f"expected one of: {', '.join(repr(u) for u in accepted)}"
+            )
+        return code
+
+    def apply(self, values: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Convert a ``(rows, fields)`` array given the matching unit codes."""
+        columns = np.arange(values.shape[1])
+        return values * self.scale[columns, codes] + self.offset[columns, codes]
+
+    def convert(self, field_idx: int, value: float, unit: Any) -> float:
+        """Convert a single value to the field's reference unit."""
+        code = self.unit_code(field_idx, unit)
+        return value * self.scale[field_idx, code] + self.offset[field_idx, code]
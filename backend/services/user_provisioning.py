@@ -0,0 +1,147 @@
+from typing import Any, Dict, List, Tuple
+import csv
+import io
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from models.user import User
+from services.password_hashing import PasswordHasher, password_hasher
+
+REQUIRED_COLUMNS = ("username", "email", "password")
+TRUE_VALUES = {"1", "true", "yes", "y"}
+# Keeps the IN lists of the uniqueness check under SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 5000
+
+
+class UserProvisioningService:
+    """Creates many users at once from CSV rows.
+
+    Rows are validated in memory, checked against existing users with one
+    set-based query, hashed in parallel on the password pool and inserted in
+    a single transaction. Invalid rows are reported with their CSV line
+    number and do not stop the valid ones.
+    """
+
+    def __init__(self, hasher: PasswordHasher = password_hasher):
+        self.hasher = hasher
+
+    @staticmethod
+    def parse_csv(text: str) -> List[Dict[str, Any]]:
+        """Read CSV text with a header row; each row gets its file line number."""
+        reader = csv.DictReader(io.StringIO(text))
+        missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+        rows = []
+        for row in reader:
+            row = {key: (value or "").strip() for key, value in row.items() if key}
+            row["line"] = reader.line_num
+            rows.append(row)
+        return rows
+
+    def provision(self, db: Session, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        valid, errors = self._validate(rows)
+        for chunk in self._chunks(valid):
+            existing = db.execute(self._existing_query(chunk)).all()
+            errors.extend(self._reject_existing(chunk, existing))
+        valid = [row for row in valid if "error" not in row]
+        hashes = self.hasher.hash_many([row["password"] for row in valid])
+        if valid:
+            try:
+                db.execute(insert(User), self._user_values(valid, hashes))
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                raise ValueError("Users were registered concurrently with this import; retry it")
+        return self._summary(rows, valid, errors)
+
+    async def provision_async(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        valid, errors = self._validate(rows)
+        for chunk in self._chunks(valid):
+            existing = (await db.execute(self._existing_query(chunk))).all()
+            errors.extend(self._reject_existing(chunk, existing))
+        valid = [row for row in valid if "error" not in row]
+        hashes = await self.hasher.hash_many_async([row["password"] for row in valid])
+        if valid:
+            try:
+                await db.execute(insert(User), self._user_values(valid, hashes))
+                await db.commit()
+            except IntegrityError:
+                await db.rollback()
+                raise ValueError("Users were registered concurrently with this import; retry it")
+        return self._summary(rows, valid, errors)
+
+    @staticmethod
+    def _validate(rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Split rows into valid ones and per-row errors, including duplicates within the file."""
+        valid, errors = [], []
+        usernames, emails = set(), set()
+        for index, row in enumerate(rows):
+            line = row.get("line", index + 1)
+            missing = [column for column in REQUIRED_COLUMNS if not row.get(column)]
+            if missing:
+                error = f"Missing {', '.join(missing)}"
+            elif "@" not in row["email"]:
+                error = "Invalid email"
+            elif row["username"] in usernames:
+                error = "Username repeated in file"
+            elif row["email"].lower() in emails:
+                error = "Email repeated in file"
+            else:
+                usernames.add(row["username"])
+                emails.add(row["email"].lower())
+                valid.append(row)
+                continue
+            errors.append({"line": line, "username": row.get("username"), "error": error})
+        return valid, errors
+
+    @staticmethod
+    def _chunks(rows: List[Dict[str, Any]]):
+        for start in range(0, len(rows), LOOKUP_CHUNK_SIZE):
+            yield rows[start:start + LOOKUP_CHUNK_SIZE]
+
+    @staticmethod
+    def _existing_query(rows: List[Dict[str, Any]]):
+        return select(User.username, User.email).where(or_(
+            User.username.in_([row["username"] for row in rows]),
+            User.email.in_([row["email"] for row in rows]),
+        ))
+
+    @staticmethod
+    def _reject_existing(rows: List[Dict[str, Any]], existing) -> List[Dict[str, Any]]:
+        taken_usernames = {username for username, _ in existing}
+        taken_emails = {email for _, email in existing}
+        errors = []
+        for row in rows:
+            if row["username"] in taken_usernames:
+                row["error"] = "Username already registered"
+            elif row["email"] in taken_emails:
+                row["error"] = "Email already registered"
+            else:
+                continue
+            errors.append({"line": row.get("line"), "username": row["username"], "error": row["error"]})
+        return errors
+
+    @staticmethod
+    def _user_values(rows: List[Dict[str, Any]], hashes: List[str]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "username": row["username"],
+                "email": row["email"],
+                "hashed_password": hashed_password,
+                "is_active": True,
+                "is_admin": str(row.get("is_admin", "")).lower() in TRUE_VALUES,
+            }
+            for row, hashed_password in zip(rows, hashes)
+        ]
+
+    @staticmethod
+    def _summary(rows: List[Dict[str, Any]], created: List[Dict[str, Any]],
+                 errors: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "total": len(rows),
+            "created": len(created),
+            "usernames": [row["username"] for row in created],
+            "errors": sorted(errors, key=lambda error: error["line"] or 0),
+        }
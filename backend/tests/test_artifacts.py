@@ -0,0 +1,72 @@
+import hashlib
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from services.database import Base
+from services.artifact_store import ArtifactStore, parse_range
+from models.artifact import Artifact
+
+class TestArtifactStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(bind=engine)()
+        self.store = ArtifactStore(os.path.join(self.tmp.name, "artifacts"))
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_identical_uploads_are_stored_once(self):
+        data = b"scan bytes" * 1000
+        sha256 = hashlib.sha256(data).hexdigest()
+        first = self.store.put_bytes(self.db, data, "image/png", "a.png", "xray")
+        second = self.store.put_bytes(self.db, data, "image/png", "b.png", "xray")
+        self.assertEqual(first["sha256"], sha256)
+        self.assertEqual(second["upload_count"], 2)
+        self.assertEqual(self.db.query(Artifact).count(), 1)
+
+        path = self.store.path(sha256)
+        self.assertEqual(path, os.path.join(self.store.root, sha256[:2], sha256[2:4], sha256))
+        self.assertEqual(os.listdir(os.path.dirname(path)), [sha256])
+
+    def test_put_file_matches_put_bytes(self):
+        source = os.path.join(self.tmp.name, "report.pdf")
+        with open(source, "wb") as f:
+            f.write(b"%PDF-1.4 test")
+        artifact = self.store.put_file(self.db, source, "application/pdf")
+        self.assertEqual(artifact["sha256"], self.store.write_bytes(b"%PDF-1.4 test"))
+        self.assertEqual(artifact["filename"], "report.pdf")
+        self.assertEqual(self.store.get(self.db, artifact["sha256"])["size"], 13)
+
+    def test_iter_range(self):
+        sha256 = self.store.write_bytes(bytes(range(100)))
+        self.assertEqual(b"".join(self.store.iter_range(sha256, 10, 19)), bytes(range(10, 20)))
+
+    def test_unknown_or_invalid_ids(self):
+        self.assertIsNone(self.store.get(self.db, "0" * 64))
+        self.assertIsNone(self.store.get(self.db, "../etc/passwd"))
+        with self.assertRaises(ValueError):
+            self.store.path("../etc/passwd")
+
+class TestParseRange(unittest.TestCase):
+    def test_ranges(self):
+        self.assertIsNone(parse_range(None, 100))
+        self.assertEqual(parse_range("bytes=0-9", 100), (0, 9))
+        self.assertEqual(parse_range("bytes=90-", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=-10", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=50-500", 100), (50, 99))
+        # Multiple ranges fall back to the whole body
+        self.assertIsNone(parse_range("bytes=0-1,5-6", 100))
+
+    def test_unsatisfiable(self):
+        with self.assertRaises(ValueError):
+            parse_range("bytes=100-", 100)
+        with self.assertRaises(ValueError):
+            parse_range("bytes=20-10", 100)
+
+if __name__ == '__main__':
+    unittest.main()
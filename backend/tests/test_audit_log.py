@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from services.database import Base
+from services.audit_log import AuditLogWriter
+from models.audit import AuditEvent
+
+def replay_in_worker(database_url, fallback, barrier, results):
+    writer = AuditLogWriter(sessionmaker(bind=create_engine(database_url)), fallback_path=fallback)
+    barrier.wait()
+    results.put(writer.replay_fallback())
+
+class TestAuditLogWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{self.tmp.name}/audit.db")
+        Base.metadata.create_all(bind=self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        self.fallback = os.path.join(self.tmp.name, "fallback.jsonl")
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def count(self):
+        with self.Session() as db:
+            return db.query(AuditEvent).count()
+
+    def test_batches_on_size_and_stop(self):
+        writer = AuditLogWriter(self.Session, batch_size=10, flush_interval=5, fallback_path=self.fallback)
+        writer.start()
+        for i in range(25):
+            writer.log("login", f"user{i}", client_ip="127.0.0.1")
+        deadline = time.monotonic() + 2
+        while writer.written < 20 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertGreaterEqual(writer.written, 20)
+        writer.stop()
+        self.assertEqual(self.count(), 25)
+        self.assertEqual(writer.batches, 3)
+        self.assertFalse(os.path.exists(self.fallback))
+
+    def test_flushes_on_time(self):
+        writer = AuditLogWriter(self.Session, batch_size=100, flush_interval=0.05, fallback_path=self.fallback)
+        writer.start()
+        writer.log("analysis", "alice", "analysis:1", modality="xray")
+        deadline = time.monotonic() + 2
+        while writer.written < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(writer.written, 1)
+        writer.stop()
+        with self.Session() as db:
+            event = db.query(AuditEvent).one()
+        self.assertEqual(event.resource, "analysis:1")
+        self.assertIn("xray", event.details)
+
+    def test_failed_flush_spills_and_replays(self):
+        broken = sessionmaker(bind=create_engine("sqlite://"))  # no tables
+        writer = AuditLogWriter(broken, fallback_path=self.fallback)
+        writer.log("login", "bob")
+        writer.log("login_failed", "mallory")
+        writer.flush()
+        self.assertEqual(writer.spilled, 2)
+        self.assertTrue(os.path.exists(self.fallback))
+
+        replayed = AuditLogWriter(self.Session, fallback_path=self.fallback).replay_fallback()
+        self.assertEqual(replayed, 2)
+        self.assertEqual(self.count(), 2)
+        self.assertFalse(os.path.exists(self.fallback))
+
+    def spill(self, *usernames):
+        writer = AuditLogWriter(sessionmaker(bind=create_engine("sqlite://")), fallback_path=self.fallback)
+        for username in usernames:
+            writer.log("login", username)
+        writer.flush()
+
+    @unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "needs fork")
+    def test_workers_starting_together_replay_once(self):
+        self.spill("bob", "alice", "carol")
+        context = multiprocessing.get_context("fork")
+        barrier, results = context.Barrier(4), context.Queue()
+        workers = [context.Process(target=replay_in_worker, args=(str(self.engine.url), self.fallback, barrier, results))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+        self.assertEqual(sorted(results.get(timeout=5) for _ in workers), [0, 0, 0, 3])
+        self.assertEqual(self.count(), 3)
+        self.assertEqual(os.listdir(self.tmp.name), ["audit.db"])
+
+    def test_replays_claims_of_exited_workers_only(self):
+        self.spill("bob")
+        os.rename(self.fallback, f"{self.fallback}.{os.getppid()}-live.replaying")
+        self.spill("alice")
+        os.rename(self.fallback, f"{self.fallback}.999999999-dead.replaying")
+        self.spill("carol")
+        self.assertEqual(AuditLogWriter(self.Session, fallback_path=self.fallback).replay_fallback(), 2)
+        self.assertEqual(sorted(os.listdir(self.tmp.name)),
+                         ["audit.db", f"fallback.jsonl.{os.getppid()}-live.replaying"])
+
+    def test_full_queue_spills_instead_of_blocking(self):
+        writer = AuditLogWriter(self.Session, max_queue=2, fallback_path=self.fallback)
+        for i in range(5):
+            writer.log("login", f"user{i}")
+        self.assertEqual(writer.stats()["queued"], 2)
+        self.assertEqual(writer.spilled, 3)
+
+if __name__ == '__main__':
+    unittest.main()
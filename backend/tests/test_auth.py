@@ -0,0 +1,219 @@
+import os
+import tempfile
+import unittest
+import time
+from unittest import mock
+from datetime import timedelta
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from services.database import Base
+from services.auth_cache import UserCache
+from services.auth_service import AuthService, _load_secret_key, user_cache
+from services.password_hashing import PasswordHasher, password_hasher
+from services.user_provisioning import UserProvisioningService
+from models.user import User
+
+class NoQuerySession:
+    def query(self, *args):
+        raise AssertionError("database was queried")
+
+class TestUserCache(unittest.TestCase):
+    def test_lru_and_ttl(self):
+        cache = UserCache(max_size=2, ttl=60)
+        cache.put("a", "alice", "A")
+        cache.put("b", "bob", "B")
+        self.assertEqual(cache.get("a"), "A")
+        cache.put("c", "carol", "C")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+        cache.put("d", "dave", "D", token_expires_at=time.time() - 1)
+        self.assertIsNone(cache.get("d"))
+
+    def test_invalidate_user(self):
+        cache = UserCache()
+        cache.put("t1", "alice", "A")
+        cache.put("t2", "alice", "A")
+        cache.invalidate_user("alice")
+        self.assertIsNone(cache.get("t1"))
+        self.assertIsNone(cache.get("t2"))
+        self.assertEqual(cache.stats()["hits"], 0)
+
+    def test_signal_reaches_other_processes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "signal")
+            # Two caches on one signal file stand in for two workers
+            first, second = UserCache(signal_path=path), UserCache(signal_path=path)
+            first.put("t1", "alice", "A")
+            second.put("t2", "bob", "B")
+            self.assertEqual(first.get("t1"), "A")
+            second.signal_change()
+            self.assertIsNone(first.get("t1"))
+            self.assertIsNone(second.get("t2"))
+            first.put("t1", "alice", "A")
+            self.assertEqual(first.get("t1"), "A")
+            self.assertEqual(first.stats()["signals"], 1)
+
+class TestVerifyTokenCache(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(bind=engine)()
+        self.db.add(User(username="tech", email="tech@lab.local", hashed_password="x"))
+        self.db.commit()
+        self.token = AuthService.create_access_token({"sub": "tech"}, timedelta(minutes=5))
+        user_cache.clear()
+
+    def tearDown(self):
+        self.db.close()
+        user_cache.clear()
+
+    def test_hit_skips_database(self):
+        user = AuthService.verify_token(self.token, self.db)
+        cached = AuthService.verify_token(self.token, NoQuerySession())
+        self.assertEqual(cached.username, user.username)
+        self.assertEqual(user_cache.stats()["hits"], 1)
+
+    def test_deactivation_invalidates(self):
+        user = AuthService.verify_token(self.token, self.db)
+        user.is_active = False
+        self.db.commit()
+        with self.assertRaises(HTTPException):
+            AuthService.verify_token(self.token, self.db)
+
+    def test_old_row_cached_before_commit_is_dropped(self):
+        user = AuthService.verify_token(self.token, self.db)
+        old_row = User(username="tech", email="tech@lab.local", hashed_password="x", is_active=True)
+        user.is_active = False
+        self.db.flush()
+        # A concurrent request still reads the committed row and caches it
+        user_cache.put(self.token, "tech", old_row)
+        self.db.commit()
+        with self.assertRaises(HTTPException):
+            AuthService.verify_token(self.token, self.db)
+
+    def test_rollback_keeps_cache(self):
+        user = AuthService.verify_token(self.token, self.db)
+        user.is_admin = True
+        self.db.flush()
+        self.db.rollback()
+        self.db.commit()
+        self.assertIsNotNone(user_cache.get(self.token))
+
+    def test_delete_invalidates(self):
+        user = AuthService.verify_token(self.token, self.db)
+        self.db.delete(user)
+        self.db.commit()
+        with self.assertRaises(HTTPException):
+            AuthService.verify_token(self.token, self.db)
+
+class TestPasswordHashing(unittest.TestCase):
+    def test_pool_hash_and_verify(self):
+        hasher = PasswordHasher(rounds=4, max_workers=2)
+        hashed = hasher.hash("secret")
+        self.assertTrue(hashed.startswith("$2b$04$"))
+        self.assertTrue(hasher.verify("secret", hashed))
+        self.assertEqual(hasher.verify_and_update("wrong", hashed), (False, None))
+        hasher.shutdown()
+
+    def test_login_rehashes_on_cost_change(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        old_hasher = PasswordHasher(rounds=4, max_workers=1)
+        db.add(User(username="tech", email="tech@lab.local", hashed_password=old_hasher.hash("secret")))
+        db.commit()
+
+        user = AuthService.authenticate_user("tech", "secret", db)
+        self.assertTrue(user.hashed_password.startswith(f"$2b${password_hasher.rounds:02d}$"))
+        self.assertFalse(AuthService.authenticate_user("tech", "wrong", db))
+        old_hasher.shutdown()
+        db.close()
+
+class TestAsyncAuthService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        self.db = async_sessionmaker(self.engine, expire_on_commit=False)()
+        user_cache.clear()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        await self.engine.dispose()
+        user_cache.clear()
+
+    async def test_create_authenticate_verify(self):
+        user = await AuthService.create_user_async("tech", "tech@lab.local", "secret", self.db)
+        self.assertIsNotNone(user.id)
+        with self.assertRaises(HTTPException):
+            await AuthService.create_user_async("tech", "other@lab.local", "secret", self.db)
+        with self.assertRaises(HTTPException) as raised:
+            await AuthService.create_user_async("other", "tech@lab.local", "secret", self.db)
+        self.assertEqual(raised.exception.detail, "Email already registered")
+
+        self.assertFalse(await AuthService.authenticate_user_async("tech", "wrong", self.db))
+        self.assertTrue(await AuthService.authenticate_user_async("tech", "secret", self.db))
+
+        token = AuthService.create_access_token({"sub": "tech"}, timedelta(minutes=5))
+        verified = await AuthService.verify_token_async(token, self.db)
+        self.assertEqual(verified.username, "tech")
+        await AuthService.verify_token_async(token, self.db)
+        self.assertEqual(user_cache.stats()["hits"], 1)
+
+class TestSecretKey(unittest.TestCase):
+    def test_key_file_is_shared(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.dict(os.environ, {"SECRET_KEY": ""}):
+            path = os.path.join(tmp, "secret_key")
+            first = _load_secret_key(path)
+            self.assertEqual(len(first), 64)
+            # A second worker reads the key the first one created
+            self.assertEqual(_load_secret_key(path), first)
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+
+class TestUserProvisioning(unittest.TestCase):
+    CSV = (
+        "username,email,password,is_admin\n"
+        "alice,alice@lab.org,pw1,true\n"
+        "bob,bob@lab.org,pw2,\n"
+        "taken,new@lab.org,pw3,\n"
+        "carol,,pw4,\n"
+        "bob,bob2@lab.org,pw5,\n"
+        "dave,dave@lab.org,pw6,no\n"
+    )
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(bind=engine)()
+        self.db.add(User(username="taken", email="taken@lab.org", hashed_password="x"))
+        self.db.commit()
+        self.hasher = PasswordHasher(rounds=4, max_workers=2)
+        self.service = UserProvisioningService(self.hasher)
+
+    def tearDown(self):
+        self.db.close()
+        self.hasher.shutdown()
+
+    def test_provision_reports_per_row_errors(self):
+        summary = self.service.provision(self.db, self.service.parse_csv(self.CSV))
+        self.assertEqual(summary["created"], 3)
+        self.assertEqual(
+            [(e["line"], e["error"]) for e in summary["errors"]],
+            [(4, "Username already registered"), (5, "Missing email"), (6, "Username repeated in file")],
+        )
+        alice = self.db.query(User).filter(User.username == "alice").one()
+        self.assertTrue(alice.is_admin)
+        self.assertTrue(alice.is_active)
+        self.assertTrue(self.hasher.verify("pw1", alice.hashed_password))
+        self.assertFalse(self.db.query(User).filter(User.username == "dave").one().is_admin)
+
+    def test_missing_columns(self):
+        with self.assertRaises(ValueError):
+            self.service.parse_csv("username,email\nalice,alice@lab.org\n")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import io
+import unittest
+import numpy as np
+from PIL import Image
+from schemas.analysis import ImagingAnalysisResult
+from services.imaging_service import ImagingAnalysisService
+
+class TestCascade(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.service = ImagingAnalysisService("xray")
+        buffer = io.BytesIO()
+        Image.fromarray(np.random.default_rng(0).integers(0, 255, (600, 500), dtype=np.uint8)).save(buffer, "PNG")
+        cls.image = buffer.getvalue()
+
+    def test_band_decides_the_stage(self):
+        full = self.service.analyze(self.image)
+        self.assertNotIn("cascade", full)
+
+        # Nothing lies strictly inside an empty band, so the first stage decides
+        self.service.enable_cascade(band=(0.5, 0.5), resolution=64)
+        first = self.service.analyze(self.image)
+        self.assertEqual(first["cascade"]["stage"], 1)
+        self.assertEqual(first["cascade"]["first_stage_resolution"], 64)
+
+        self.service.enable_cascade(band=(0.0, 1.0), resolution=64)
+        escalated = self.service.analyze(self.image)
+        self.assertEqual(escalated["cascade"]["stage"], 2)
+        self.assertAlmostEqual(escalated["confidence"], full["confidence"], places=5)
+        self.assertEqual(escalated["cascade"]["first_stage_abnormal_probability"],
+                         first["cascade"]["first_stage_abnormal_probability"])
+        self.assertEqual(ImagingAnalysisResult.model_validate({**escalated, "model_version": "v1"}).cascade.stage, 2)
+
+        stats = self.service.cascade_stats
+        self.assertEqual((stats["first_stage"], stats["escalated"]), (1, 1))
+
+    def test_invalid_configuration(self):
+        with self.assertRaises(ValueError):
+            self.service.enable_cascade(band=(0.8, 0.2))
+        with self.assertRaises(ValueError):
+            ImagingAnalysisService("ct").enable_cascade()
+
+if __name__ == '__main__':
+    unittest.main()
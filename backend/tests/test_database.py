@@ -0,0 +1,25 @@
+import os
+import tempfile
+import unittest
+from sqlalchemy import text
+from services.database import create_db_engine, SQLITE_PRAGMAS
+
+class TestDatabaseProfiles(unittest.TestCase):
+    def test_sqlite_pragmas(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'nested', 'lab.db')}")
+            with engine.connect() as conn:
+                self.assertEqual(conn.execute(text("PRAGMA journal_mode")).scalar().upper(), "WAL")
+                self.assertEqual(conn.execute(text("PRAGMA synchronous")).scalar(), 1)
+                self.assertEqual(conn.execute(text("PRAGMA busy_timeout")).scalar(), SQLITE_PRAGMAS["busy_timeout"])
+            engine.dispose()
+
+    def test_untuned_sqlite(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'lab.db')}", tuned=False)
+            with engine.connect() as conn:
+                self.assertEqual(conn.execute(text("PRAGMA journal_mode")).scalar().upper(), "DELETE")
+            engine.dispose()
+
+if __name__ == '__main__':
+    unittest.main()
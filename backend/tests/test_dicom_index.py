@@ -0,0 +1,150 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import (
+    CTImageStorage, ExplicitVRBigEndian, ExplicitVRLittleEndian, ImplicitVRLittleEndian, RLELossless, generate_uid,
+)
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from services.database import Base
+from services.artifact_store import ArtifactStore
+from services.dicom_index import DicomIndexService, read_header, read_pixels
+
+def write_dicom(path, pixels, transfer_syntax=ExplicitVRLittleEndian, **tags):
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = CTImageStorage
+    meta.MediaStorageSOPInstanceUID = tags.pop("SOPInstanceUID", generate_uid())
+    meta.TransferSyntaxUID = transfer_syntax
+    dataset = Dataset()
+    dataset.file_meta = meta
+    dataset.is_little_endian = transfer_syntax != ExplicitVRBigEndian
+    dataset.is_implicit_VR = transfer_syntax == ImplicitVRLittleEndian
+    dataset.SOPClassUID = CTImageStorage
+    dataset.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    dataset.StudyInstanceUID = tags.pop("StudyInstanceUID", generate_uid())
+    dataset.SeriesInstanceUID = tags.pop("SeriesInstanceUID", generate_uid())
+    dataset.Modality = tags.pop("Modality", "CT")
+    for name, value in tags.items():
+        setattr(dataset, name, value)
+    if pixels.ndim == 3:
+        dataset.NumberOfFrames = len(pixels)
+    dataset.Rows, dataset.Columns = pixels.shape[-2:]
+    dataset.SamplesPerPixel = 1
+    dataset.PhotometricInterpretation = "MONOCHROME2"
+    dataset.BitsAllocated = dataset.BitsStored = pixels.dtype.itemsize * 8
+    dataset.HighBit = dataset.BitsStored - 1
+    dataset.PixelRepresentation = int(pixels.dtype.kind == "i")
+    order = "<" if dataset.is_little_endian else ">"
+    dataset.PixelData = pixels.astype(pixels.dtype.newbyteorder(order)).tobytes()
+    if transfer_syntax == RLELossless:
+        dataset.is_little_endian, dataset.is_implicit_VR = True, False
+        dataset.compress(RLELossless, pixels)
+    dataset.save_as(path, write_like_original=False)
+    return dataset.SOPInstanceUID
+
+class TestDicomHeaders(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.pixels = (np.arange(12 * 10, dtype=np.int16).reshape(12, 10) - 50) * 7
+
+    def test_pixel_offset_for_each_transfer_syntax(self):
+        for syntax in (ExplicitVRLittleEndian, ImplicitVRLittleEndian, ExplicitVRBigEndian):
+            path = os.path.join(self.tmp.name, f"{syntax.name}.dcm")
+            write_dicom(path, self.pixels, syntax, PatientID="P1")
+            header = read_header(path)
+            self.assertEqual(header["transfer_syntax_uid"], syntax)
+            self.assertEqual(header["pixel_data_length"], self.pixels.nbytes)
+            self.assertFalse(header["encapsulated"])
+            with open(path, "rb") as f:
+                f.seek(header["pixel_data_offset"])
+                self.assertEqual(f.read(), pydicom.dcmread(path).PixelData)
+            np.testing.assert_array_equal(read_pixels(path, header), self.pixels)
+
+    def test_multi_frame_pixels(self):
+        frames = np.random.default_rng(0).integers(0, 4000, (3, 8, 6), dtype=np.uint16)
+        path = os.path.join(self.tmp.name, "frames.dcm")
+        write_dicom(path, frames)
+        header = read_header(path)
+        self.assertEqual(header["number_of_frames"], 3)
+        np.testing.assert_array_equal(read_pixels(path, header), frames)
+
+    def test_encapsulated_pixels_fall_back_to_pydicom(self):
+        path = os.path.join(self.tmp.name, "rle.dcm")
+        write_dicom(path, self.pixels, RLELossless)
+        header = read_header(path)
+        self.assertTrue(header["encapsulated"])
+        self.assertIsNone(header["pixel_data_length"])
+        np.testing.assert_array_equal(read_pixels(path, header), self.pixels)
+
+    def test_rejects_other_files(self):
+        path = os.path.join(self.tmp.name, "image.png")
+        with open(path, "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n" + b"\x00" * 200)
+        with self.assertRaises(ValueError):
+            read_header(path)
+
+class TestDicomIndexService(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(bind=engine)()
+        self.store = ArtifactStore(os.path.join(self.tmp.name, "artifacts"))
+        self.service = DicomIndexService()
+        self.pixels = np.zeros((4, 4), dtype=np.uint16)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def ingest(self, name, **tags):
+        path = os.path.join(self.tmp.name, name)
+        write_dicom(path, self.pixels, **tags)
+        artifact = self.store.put_file(self.db, path, "application/dicom", kind="dicom")
+        return self.service.index(self.db, read_header(path), artifact["sha256"])
+
+    def test_find_series(self):
+        study, ct, mr = generate_uid(), generate_uid(), generate_uid()
+        for number in (2, 1):
+            self.ingest(f"ct{number}.dcm", StudyInstanceUID=study, SeriesInstanceUID=ct, PatientID="P1",
+                        StudyDate="20260301", InstanceNumber=number, SeriesNumber=1)
+        self.ingest("mr.dcm", StudyInstanceUID=study, SeriesInstanceUID=mr, PatientID="P1",
+                    StudyDate="20260301", SeriesDate="20260302", Modality="MR", SeriesNumber=2)
+        self.ingest("other.dcm", PatientID="P2", StudyDate="20260301")
+
+        series = self.service.find_series(self.db, patient_id="P1")
+        self.assertEqual([s["series_instance_uid"] for s in series], [mr, ct])
+        self.assertEqual(series[1]["instances"], 2)
+        self.assertEqual(series[1]["series_date"], "2026-03-01")
+
+        yesterday = date(2026, 3, 1)
+        cts = self.service.find_series(self.db, modality="ct", date_from=yesterday, date_to=yesterday)
+        self.assertEqual({s["patient_id"] for s in cts}, {"P1", "P2"})
+        self.assertEqual(self.service.find_series(self.db, modality="MR", date_to=yesterday), [])
+
+        instances = self.service.list_instances(self.db, ct)
+        self.assertEqual([i["instance_number"] for i in instances], [1, 2])
+        path = self.store.path(instances[0]["artifact_sha256"])
+        np.testing.assert_array_equal(read_pixels(path, instances[0]), self.pixels)
+        by_artifact = self.service.get_instance_by_artifact(self.db, instances[0]["artifact_sha256"])
+        self.assertEqual(by_artifact["sop_instance_uid"], instances[0]["sop_instance_uid"])
+        self.assertIsNone(self.service.get_instance_by_artifact(self.db, "0" * 64))
+
+    def test_reindexing_updates_rows(self):
+        uids = {"SOPInstanceUID": generate_uid(), "StudyInstanceUID": generate_uid(),
+                "SeriesInstanceUID": generate_uid()}
+        first = self.ingest("a.dcm", PatientID="P1", **dict(uids))
+        second = self.ingest("a.dcm", PatientID="P1", InstanceNumber=5, **dict(uids))
+        self.assertEqual(second["sop_instance_uid"], first["sop_instance_uid"])
+        self.assertNotEqual(second["artifact_sha256"], first["artifact_sha256"])
+        self.assertEqual(self.service.get_instance(self.db, uids["SOPInstanceUID"])["instance_number"], 5)
+        series = self.service.find_series(self.db)
+        self.assertEqual((len(series), series[0]["instances"]), (1, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import json
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from services.database import Base
+from services.history_service import AnalysisHistoryService, decode_cursor
+from models.user import User
+from models.analysis import Analysis
+from models.artifact import Artifact
+
+class TestAnalysisHistory(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(bind=engine)()
+        self.service = AnalysisHistoryService()
+        start = datetime(2026, 1, 1)
+        rows = []
+        for i in range(25):
+            rows.append(Analysis(
+                user_id=1 + i % 2,
+                modality="xray" if i % 3 else "lab",
+                result=f"result {i}",
+                confidence=0.9,
+                is_abnormal=i % 4 == 0,
+                # Pairs of rows share a timestamp to exercise the id tiebreak
+                created_at=start + timedelta(hours=i // 2),
+            ))
+        self.db.add_all(rows)
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def collect(self, **filters):
+        items, cursor = [], None
+        while True:
+            page = self.service.list(self.db, cursor=cursor, limit=4, **filters)
+            items.extend(page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return items
+
+    def test_keyset_pages_cover_all_rows_in_order(self):
+        items = self.collect()
+        self.assertEqual(len(items), 25)
+        self.assertEqual(len({item["id"] for item in items}), 25)
+        keys = [(item["created_at"], item["id"]) for item in items]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+
+    def test_filters(self):
+        items = self.collect(user_id=1, modality="xray", abnormal=False)
+        self.assertTrue(items)
+        self.assertTrue(all(i["user_id"] == 1 and i["modality"] == "xray" and not i["is_abnormal"] for i in items))
+        window = self.collect(start=datetime(2026, 1, 1, 2), end=datetime(2026, 1, 1, 4))
+        self.assertEqual(len(window), 4)
+
+    def test_record_and_get(self):
+        analysis = self.service.record(self.db, 1, "lab", {
+            "interpretation": "CBC - WBC high", "abnormal_flags": [{"parameter": "WBC"}], "confidence": 0.8,
+        }, "patient-7")
+        stored = self.service.get(self.db, analysis.id)
+        self.assertTrue(stored["is_abnormal"])
+        self.assertEqual(stored["details"]["confidence"], 0.8)
+        self.assertEqual(stored["patient_id"], "patient-7")
+
+    def test_references_artifact(self):
+        sha256 = "ab" * 32
+        self.service.record(self.db, 1, "xray", {"result": "Normal", "artifact_sha256": sha256})
+        self.assertTrue(self.service.references_artifact(self.db, 1, sha256))
+        self.assertFalse(self.service.references_artifact(self.db, 2, sha256))
+        self.assertFalse(self.service.references_artifact(self.db, 1, "cd" * 32))
+
+    def test_link_artifacts_of_older_analyses(self):
+        sha256 = "ef" * 32
+        now = datetime(2026, 2, 1)
+        self.db.add(Artifact(sha256=sha256, size=1, content_type="image/png", created_at=now, last_uploaded_at=now))
+        self.db.add(Analysis(user_id=2, modality="xray", created_at=now,
+                             details=json.dumps({"result": "Normal", "artifact_sha256": sha256})))
+        self.db.commit()
+        self.assertFalse(self.service.references_artifact(self.db, 2, sha256))
+        self.assertEqual(self.service.link_artifacts(self.db, batch_size=10), 1)
+        self.assertTrue(self.service.references_artifact(self.db, 2, sha256))
+        self.assertEqual(self.service.link_artifacts(self.db), 0)
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            decode_cursor("not-a-cursor")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import io
+import os
+import tempfile
+import unittest
+import numpy as np
+from monai.transforms import LoadImage, ScaleIntensity
+from PIL import Image
+from services.image_decode import decode_image_2d
+
+def encode(image: Image.Image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, fmt)
+    return buffer.getvalue()
+
+class TestDecodeImage2D(unittest.TestCase):
+    def setUp(self):
+        # A horizontal gradient: the downscaled image should keep it
+        self.gradient = np.tile(np.linspace(0, 1, 1200), (900, 1))
+
+    def assert_gradient(self, array):
+        self.assertEqual(array.shape, (224, 224))
+        self.assertEqual(array.dtype, np.float32)
+        self.assertAlmostEqual(float(array.min()), 0.0)
+        self.assertAlmostEqual(float(array.max()), 1.0)
+        # Horizontal in the image, so along the first (x) axis
+        expected = np.tile(np.linspace(0, 1, 224), (224, 1)).T
+        self.assertLess(float(np.abs(array - expected).max()), 0.05)
+
+    def test_jpeg_rgb_decodes_to_one_channel(self):
+        pixels = (self.gradient * 255).astype(np.uint8)
+        data = encode(Image.fromarray(np.stack([pixels] * 3, axis=-1)), "JPEG")
+        self.assert_gradient(decode_image_2d(data))
+
+    def test_16_bit_png_keeps_depth(self):
+        pixels = (self.gradient * 4095).astype(np.uint16)
+        data = encode(Image.fromarray(pixels), "PNG")
+        self.assert_gradient(decode_image_2d(data))
+
+    def test_writes_into_buffer(self):
+        out = np.full((2, 224, 224), -1, dtype=np.float32)
+        image = Image.fromarray((self.gradient * 255).astype(np.uint8)).convert("P")
+        result = decode_image_2d(image, out=out[1])
+        self.assertTrue(np.shares_memory(result, out))
+        self.assertTrue((out[0] == -1).all())
+        self.assert_gradient(out[1])
+
+    def test_axes_match_monai_load_image(self):
+        pixels = np.random.default_rng(0).integers(0, 256, (600, 300), dtype=np.uint8)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "tall.png")
+            Image.fromarray(pixels).save(path)
+            expected = ScaleIntensity()(LoadImage(image_only=True)(path))
+            decoded = decode_image_2d(path, (300, 600))
+        self.assertEqual(tuple(expected.shape), (300, 600))
+        self.assertEqual(decoded.shape, (300, 600))
+        np.testing.assert_allclose(decoded, np.asarray(expected), atol=1e-6)
+
+    def test_blank_image(self):
+        self.assertFalse(decode_image_2d(Image.new("L", (50, 40), 128)).any())
+
+if __name__ == '__main__':
+    unittest.main()
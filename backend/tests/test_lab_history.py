@@ -0,0 +1,88 @@
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from services.database import Base
+from services.lab_history_service import LabHistoryService
+from models.lab_history import LabObservation, LabTrend
+
+class TestLabHistoryService(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(bind=engine)()
+        self.service = LabHistoryService(alpha=0.5)
+        self.start = datetime(2026, 1, 1)
+
+    def tearDown(self):
+        self.db.close()
+
+    def record(self, value, day):
+        return self.service.record(
+            self.db, "patient-1", {("KFT", "Creatinine"): (value, "mg/dL")}, self.start + timedelta(days=day)
+        )["KFT.Creatinine"]
+
+    def test_incremental_trend(self):
+        values = [1.0, 1.2, 1.5, 1.4]
+        for day, value in enumerate(values):
+            trend = self.record(value, day * 2)
+
+        self.assertEqual(trend["count"], 4)
+        self.assertEqual(trend["last_value"], 1.4)
+        self.assertEqual(trend["previous_value"], 1.5)
+        self.assertAlmostEqual(trend["delta"], -0.1)
+        slope = np.polyfit([0, 2, 4, 6], values, 1)[0]
+        self.assertAlmostEqual(trend["slope_per_day"], slope)
+        self.assertEqual(self.db.query(LabObservation).count(), 4)
+        self.assertEqual(self.db.query(LabTrend).count(), 1)
+
+    def test_backfilled_value_keeps_latest(self):
+        self.record(1.0, 5)
+        trend = self.record(2.0, 1)
+        self.assertEqual(trend["count"], 2)
+        self.assertEqual(trend["last_value"], 1.0)
+        self.assertIsNone(trend["delta"])
+
+    def test_history_is_newest_first(self):
+        for day, value in enumerate([1.0, 1.1, 1.2]):
+            self.record(value, day)
+        history = self.service.get_history(self.db, "patient-1", "KFT", "Creatinine", limit=2)
+        self.assertEqual([h["value"] for h in history], [1.2, 1.1])
+        self.assertIn("KFT.Creatinine", self.service.get_trends(self.db, "patient-1"))
+
+    def test_concurrent_first_reports_both_count(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            # A file database, so each thread has its own connection
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'lab.db')}", connect_args={"timeout": 30})
+            Base.metadata.create_all(bind=engine)
+            sessions = sessionmaker(bind=engine)
+            barrier = threading.Barrier(4)
+            errors = []
+
+            def report(value):
+                barrier.wait()
+                try:
+                    with sessions() as db:
+                        self.service.record(db, "patient-2", {("CBC", "WBC"): (value, "K/uL")},
+                                            self.start + timedelta(days=value))
+                except Exception as e:
+                    errors.append(e)
+
+            threads = [threading.Thread(target=report, args=(value,)) for value in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            with sessions() as db:
+                trend = self.service.get_trends(db, "patient-2")["CBC.WBC"]
+            engine.dispose()
+        self.assertEqual(errors, [])
+        self.assertEqual(trend["count"], 4)
+        self.assertEqual(trend["last_value"], 3)
+
+if __name__ == '__main__':
+    unittest.main()
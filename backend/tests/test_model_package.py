@@ -0,0 +1,98 @@
+import json
+import os
+import struct
+import tempfile
+import threading
+import unittest
+from services.base_service import torch
+from services.model_package import (
+    load_package, load_safetensors, read_safetensors_header, save_safetensors, skip_init,
+)
+from services.test_analysis_service import TestAnalysisService
+
+class TestSafetensors(unittest.TestCase):
+    def test_round_trip_is_mapped_and_aligned(self):
+        tensors = {
+            "weight": torch.randn(3, 4),
+            "steps": torch.tensor(7, dtype=torch.int64),
+            "half": torch.randn(5).to(torch.bfloat16),
+            "mask": torch.tensor([True, False, True]),
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.safetensors")
+            save_safetensors(tensors, path, metadata={"model": "xray"})
+            header, data_start = read_safetensors_header(path)
+            self.assertEqual(header["__metadata__"], {"model": "xray"})
+            self.assertEqual(data_start % 8, 0)
+            self.assertEqual(header["weight"], {"dtype": "F32", "shape": [3, 4], "data_offsets": [8, 56]})
+
+            loaded = load_safetensors(path)
+            self.assertEqual(set(loaded), set(tensors))
+            for name, tensor in tensors.items():
+                self.assertEqual(loaded[name].dtype, tensor.dtype)
+                self.assertTrue(torch.equal(loaded[name], tensor))
+            # Every tensor is a view into one mapping of the file
+            self.assertEqual(len({t.untyped_storage().data_ptr() for t in loaded.values()}), 1)
+
+    def test_rejects_truncated_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bad.safetensors")
+            with open(path, "wb") as f:
+                f.write(struct.pack("<Q", 1000) + b"{}")
+            with self.assertRaises(ValueError):
+                load_safetensors(path)
+
+class TestSkipInit(unittest.TestCase):
+    def test_overlapping_loads_leave_init_working(self):
+        inside, release = threading.Event(), threading.Event()
+
+        def load():
+            with skip_init():
+                inside.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=load)
+        thread.start()
+        inside.wait(5)
+        try:
+            # Another thread's skip_init does not reach this one
+            layer = torch.nn.Linear(4, 4)
+            with skip_init():
+                torch.nn.Linear(4, 4)
+        finally:
+            release.set()
+            thread.join()
+        self.assertLessEqual(float(layer.weight.abs().max()), 0.5)
+        self.assertEqual(float(torch.nn.init.constant_(torch.empty(3), 7.0).min()), 7.0)
+        # Inside the block nothing is initialised
+        with skip_init():
+            self.assertEqual(float(torch.nn.init.constant_(torch.zeros(3), 7.0).max()), 0.0)
+
+class TestModelPackage(unittest.TestCase):
+    def test_lab_package_round_trip(self):
+        service = TestAnalysisService()
+        service.model = service._build_network().eval()
+        inputs = torch.randn(4, len(service.reference_ranges.fields))
+        with torch.no_grad():
+            expected = service.model(inputs)
+        with tempfile.TemporaryDirectory() as tmp:
+            package_path = service.export_package(os.path.join(tmp, "test_analysis_model"), source="test.pt")
+            with open(os.path.join(package_path, "config.json")) as f:
+                config = json.load(f)
+            self.assertEqual(config["architecture"], "LabMLP")
+            self.assertEqual(config["source"], "test.pt")
+
+            loaded = TestAnalysisService(model_path=package_path)
+            self.assertIsNotNone(loaded.numpy_model)
+            with torch.no_grad():
+                self.assertTrue(torch.allclose(loaded.model(inputs), expected, atol=1e-6))
+
+            config["model"] = "xray"
+            with open(os.path.join(package_path, "config.json"), "w") as f:
+                json.dump(config, f)
+            with self.assertRaises(Exception):
+                TestAnalysisService(model_path=package_path)
+            self.assertEqual(load_package(package_path)[0]["model"], "xray")
+
+if __name__ == '__main__':
+    unittest.main()
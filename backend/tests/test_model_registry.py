@@ -0,0 +1,141 @@
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from services import model_registry
+from services.model_registry import ModelRegistry
+
+class FakeService:
+    def __init__(self, model_path=None):
+        if model_path == "broken.pt":
+            raise ValueError("missing weights")
+        self.model_path = model_path
+
+class TestModelRegistry(unittest.TestCase):
+    def test_builds_once_on_first_use(self):
+        calls = []
+
+        def build(model_path=None):
+            calls.append(model_path)
+            time.sleep(0.05)
+            return FakeService(model_path)
+
+        registry = ModelRegistry({"lab": build})
+        self.assertEqual(registry.status()["lab"]["state"], "cold")
+        self.assertTrue(registry.ready)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get("lab"))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(calls, [None])
+        self.assertEqual(len({id(result) for result in results}), 1)
+        status = registry.status()["lab"]
+        self.assertEqual(status["state"], "ready")
+        self.assertEqual(status["active"]["version"], "default")
+        self.assertIsNotNone(status["load_seconds"])
+
+    def test_background_preload_and_failures(self):
+        def broken(model_path=None):
+            raise ValueError("missing weights")
+
+        registry = ModelRegistry({"lab": FakeService, "xray": broken})
+        registry.preload_in_background()
+        registry._thread.join(5)
+        status = registry.status()
+        self.assertEqual(status["lab"]["state"], "ready")
+        self.assertEqual(status["xray"]["state"], "failed")
+        self.assertIn("missing weights", status["xray"]["error"])
+        self.assertFalse(registry.ready)
+        with self.assertRaises(RuntimeError):
+            registry.get("xray")
+
+class TestModelHotSwap(unittest.TestCase):
+    def setUp(self):
+        self.registry = ModelRegistry({"xray": FakeService})
+        self.registry.preload()
+
+    def test_in_flight_requests_finish_on_old_version(self):
+        with self.registry.lease("xray") as old:
+            self.registry.deploy("xray", "v2", "v2.pt")
+            deadline = time.monotonic() + 5
+            while self.registry.status()["xray"]["deploy"]["state"] != "draining" and time.monotonic() < deadline:
+                time.sleep(0.01)
+            # New requests already get the new version
+            with self.registry.lease("xray") as new:
+                self.assertEqual(new.version, "v2")
+                self.assertEqual(new.service.model_path, "v2.pt")
+            self.assertEqual(old.version, "default")
+            self.assertEqual(self.registry.status()["xray"]["previous"]["in_flight"], 1)
+        while self.registry.status()["xray"]["deploy"]["state"] == "draining" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.registry.status()["xray"]["deploy"]["state"], "ready")
+
+    def test_rollback(self):
+        self.registry.deploy("xray", "v2", "v2.pt", wait=True)
+        status = self.registry.rollback("xray")
+        self.assertEqual(status["active"]["version"], "default")
+        self.assertEqual(status["previous"]["version"], "v2")
+
+    def test_failed_deploy_keeps_serving(self):
+        self.registry.deploy("xray", "bad", "broken.pt", wait=True)
+        status = self.registry.status()["xray"]
+        self.assertEqual(status["deploy"]["state"], "failed")
+        self.assertEqual(status["active"]["version"], "default")
+        with self.assertRaises(ValueError):
+            self.registry.rollback("xray")
+
+class TestSharedVersions(unittest.TestCase):
+    """Two registries on one state directory stand in for two worker processes."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = mock.patch.object(model_registry, "MODEL_SYNC_INTERVAL_SECONDS", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.workers = [ModelRegistry({"xray": FakeService}, state_dir=self.tmp.name) for _ in range(2)]
+        for worker in self.workers:
+            worker.preload()
+
+    def wait_for(self, worker, version):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            with worker.lease("xray") as model:
+                if model.version == version:
+                    return model
+            time.sleep(0.01)
+        self.fail(f"worker did not switch to {version}")
+
+    def test_deploy_and_rollback_reach_other_workers(self):
+        first, second = self.workers
+        first.deploy("xray", "v2", "v2.pt", wait=True)
+        self.assertEqual(self.wait_for(second, "v2").service.model_path, "v2.pt")
+        first.rollback("xray")
+        self.wait_for(second, "default")
+        # A worker started after the switch loads the published version
+        first.deploy("xray", "v3", "v3.pt", wait=True)
+        late = ModelRegistry({"xray": FakeService}, state_dir=self.tmp.name)
+        self.assertEqual(late.status()["xray"]["active"], None)
+        with late.lease("xray") as model:
+            self.assertEqual((model.version, model.service.model_path), ("v3", "v3.pt"))
+
+    def test_version_failing_elsewhere_is_not_retried(self):
+        first, second = self.workers
+        first._publish("xray", model_registry.ModelVersion("bad", None, "broken.pt"))
+        with second.lease("xray") as model:
+            self.assertEqual(model.version, "default")
+        deadline = time.monotonic() + 5
+        while second.status()["xray"]["deploy"]["state"] == "loading" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(second.status()["xray"]["deploy"]["state"], "failed")
+        with mock.patch.object(second, "deploy") as deploy:
+            with second.lease("xray") as model:
+                self.assertEqual(model.version, "default")
+        deploy.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
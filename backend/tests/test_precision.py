@@ -0,0 +1,55 @@
+import io
+import unittest
+from unittest import mock
+import torch
+from PIL import Image
+from services import imaging_service
+from services.imaging_service import ImagingAnalysisService
+from services.precision import accuracy_report, compare_outputs, configured_precision
+
+class TestPrecision(unittest.TestCase):
+    def test_configured_precision(self):
+        setting = "xray=bf16, ct = channels_last"
+        self.assertEqual(configured_precision("xray", setting), "bf16")
+        self.assertEqual(configured_precision("ct", setting), "channels_last")
+        self.assertEqual(configured_precision("mri", setting), "fp32")
+        with self.assertRaises(ValueError):
+            configured_precision("xray", "xray=fp8")
+
+    def test_compare_outputs(self):
+        reference = torch.tensor([[2.0, 0.0], [0.0, 2.0]])
+        candidate = torch.tensor([[2.0, 0.0], [2.0, 0.0]])
+        report = compare_outputs(reference, candidate)
+        self.assertEqual(report["prediction_agreement"], 0.5)
+        self.assertAlmostEqual(report["max_confidence_drift"], 0.7616, places=3)
+
+    def test_bf16_drift_is_checked(self):
+        torch.manual_seed(0)
+        model = torch.nn.Sequential(torch.nn.Conv2d(1, 4, 3), torch.nn.Flatten(), torch.nn.LazyLinear(2)).eval()
+        inputs = [torch.rand(1, 1, 16, 16) for _ in range(4)]
+        with torch.no_grad():
+            model(inputs[0])
+        self.assertTrue(accuracy_report(model, inputs, "channels_last", 2)["passed"])
+        self.assertFalse(accuracy_report(model, inputs, "bf16", 2, max_drift=0.0)["passed"])
+
+def _blank_png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (300, 200), 40).save(buffer, "PNG")
+    return buffer.getvalue()
+
+class TestServicePrecision(unittest.TestCase):
+    def test_rejected_mode_keeps_fp32(self):
+        service = ImagingAnalysisService("xray")
+        failing = {"precision": "bf16", "passed": False, "prediction_agreement": 0.5, "max_confidence_drift": 0.3}
+        with mock.patch.object(imaging_service, "accuracy_report", return_value=failing):
+            with self.assertRaises(ValueError):
+                service.set_precision("bf16")
+        self.assertEqual(service.precision, "fp32")
+
+        report = service.set_precision("bf16")
+        self.assertTrue(report["passed"])
+        result = service.analyze(_blank_png())
+        self.assertIn(result["result"], ("Normal", "Abnormal"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import numpy as np
+from PIL import Image
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import CTImageStorage, ExplicitVRLittleEndian, RLELossless, generate_uid
+from services import preview_pyramid
+from services.dicom_index import read_header
+from services.preview_pyramid import PreviewCache
+
+SHA_A = "a" * 64
+SHA_B = "b" * 64
+SHA_C = "c" * 64
+
+def write_frames(path, frames, transfer_syntax=ExplicitVRLittleEndian):
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = CTImageStorage
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    dataset = Dataset()
+    dataset.file_meta = meta
+    dataset.is_little_endian, dataset.is_implicit_VR = True, False
+    dataset.SOPClassUID = CTImageStorage
+    dataset.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    dataset.StudyInstanceUID, dataset.SeriesInstanceUID = generate_uid(), generate_uid()
+    dataset.NumberOfFrames = len(frames)
+    dataset.Rows, dataset.Columns = frames.shape[1:]
+    dataset.SamplesPerPixel = 1
+    dataset.PhotometricInterpretation = "MONOCHROME2"
+    dataset.BitsAllocated, dataset.BitsStored, dataset.HighBit = 16, 16, 15
+    dataset.PixelRepresentation = 0
+    dataset.PixelData = frames.tobytes()
+    if transfer_syntax != ExplicitVRLittleEndian:
+        dataset.compress(transfer_syntax, frames)
+    dataset.save_as(path, write_like_original=False)
+
+class TestPreviewCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache = PreviewCache(os.path.join(self.tmp.name, "previews"), max_bytes=1 << 30)
+        self.image_path = os.path.join(self.tmp.name, "image")
+        pixels = (np.tile(np.linspace(0, 65535, 1300), (600, 1))).astype(np.uint16)
+        Image.fromarray(pixels).save(self.image_path, "PNG")
+
+    def test_levels_and_tiles(self):
+        manifest = self.cache.manifest(SHA_A, self.image_path)
+        levels = {level["name"]: level for level in manifest["levels"]}
+        self.assertEqual((levels["full"]["width"], levels["full"]["height"]), (1300, 600))
+        self.assertEqual((levels["full"]["columns"], levels["full"]["rows"]), (6, 3))
+        self.assertEqual(levels["mid"]["width"], 1024)
+        self.assertEqual(levels["thumbnail"]["width"], 256)
+        self.assertEqual(self.cache.stats()["builds"], 0)
+        # Levels are written as their tiles are asked for, coarsest first
+        self.cache.tile(SHA_A, self.image_path, "thumbnail", 0, 0)
+        pyramid = os.path.join(self.cache.root, "aa", SHA_A)
+        self.assertTrue(os.path.isdir(os.path.join(pyramid, "thumbnail")))
+        self.assertFalse(os.path.exists(os.path.join(pyramid, "full")))
+        # Edge tiles are cropped to the image
+        with Image.open(self.cache.tile(SHA_A, self.image_path, "full", 5, 2)) as tile:
+            self.assertEqual(tile.size, (1300 - 5 * 256, 600 - 2 * 256))
+            self.assertEqual(tile.mode, "L")
+        with self.assertRaises(LookupError):
+            self.cache.tile(SHA_A, self.image_path, "full", 6, 0)
+        with self.assertRaises(ValueError):
+            self.cache.tile(SHA_A, self.image_path, "huge", 0, 0)
+
+    def test_decodes_once(self):
+        load = mock.Mock(wraps=preview_pyramid.load_preview_image)
+        with mock.patch.object(preview_pyramid, "load_preview_image", load):
+            threads = [threading.Thread(target=self.cache.tile, args=(SHA_A, self.image_path, "thumbnail", 0, 0))
+                       for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.cache.tile(SHA_A, self.image_path, "full", 1, 1)
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual(self.cache.stats()["builds"], 2)
+
+    def test_volume_slices(self):
+        path = os.path.join(self.tmp.name, "volume")
+        with open(path, "wb") as f:
+            np.save(f, np.random.default_rng(0).random((40, 30, 20)).astype(np.float32))
+        manifest = self.cache.manifest(SHA_A, path)
+        self.assertEqual((manifest["slice"], manifest["slices"]), (10, 20))
+        # The default slice and the same slice asked for by index share a pyramid
+        self.assertEqual(self.cache.manifest(SHA_A, path, 10), manifest)
+        self.assertEqual(self.cache.stats()["pyramids"], 1)
+        self.assertEqual(self.cache.manifest(SHA_A, path, 3)["slice"], 3)
+        with self.assertRaises(ValueError):
+            self.cache.manifest(SHA_A, path, 20)
+        with self.assertRaises(ValueError):
+            self.cache.manifest(SHA_B, self.image_path, 1)
+
+    def test_dicom_volume_decoded_once(self):
+        frames = np.random.default_rng(0).integers(0, 4000, (5, 40, 30), dtype=np.uint16)
+        for syntax in (ExplicitVRLittleEndian, RLELossless):
+            path = os.path.join(self.tmp.name, f"{syntax.name}.dcm")
+            write_frames(path, frames, syntax)
+            cache = PreviewCache(os.path.join(self.tmp.name, syntax.name), max_bytes=1 << 30)
+            read = mock.Mock(wraps=preview_pyramid.read_pixels)
+            with mock.patch.object(preview_pyramid, "read_pixels", read):
+                self.assertEqual(cache.manifest(SHA_A, path)["slice"], 2)
+                for index in range(5):
+                    with Image.open(cache.tile(SHA_A, path, "full", 0, 0, index)) as tile:
+                        self.assertEqual(tile.size, (30, 40))
+            self.assertEqual(read.call_count, 1)
+            self.assertEqual(cache.stats()["builds"], 5)
+            with self.assertRaises(ValueError):
+                cache.manifest(SHA_A, path, 5)
+
+    def test_dicom_geometry_from_index(self):
+        path = os.path.join(self.tmp.name, "frames.dcm")
+        write_frames(path, np.random.default_rng(0).integers(0, 4000, (3, 40, 30), dtype=np.uint16))
+        instance = read_header(path)
+        read = mock.Mock(wraps=read_header)
+        with mock.patch.object(preview_pyramid, "read_header", read):
+            self.assertEqual(self.cache.manifest(SHA_A, path, instance=instance)["slices"], 3)
+            with Image.open(self.cache.tile(SHA_A, path, "full", 0, 0, 1, instance)) as tile:
+                self.assertEqual(tile.size, (30, 40))
+        self.assertEqual(read.call_count, 0)
+
+    def test_least_recently_viewed_is_evicted(self):
+        view = lambda sha256: self.cache.tile(sha256, self.image_path, "thumbnail", 0, 0)
+        view(SHA_A)
+        size = self.cache.stats()["bytes"]
+        self.cache.max_bytes = 2 * size
+        view(SHA_B)
+        # Viewing A makes B the least recent
+        view(SHA_A)
+        view(SHA_C)
+        stats = self.cache.stats()
+        self.assertEqual((stats["pyramids"], stats["evictions"]), (2, 1))
+        self.assertFalse(os.path.exists(os.path.join(self.cache.root, "bb", SHA_B)))
+
+        # A new process finds the cache and its order on disk
+        reopened = PreviewCache(self.cache.root, max_bytes=2 * size)
+        self.assertEqual(reopened.stats()["bytes"], stats["bytes"])
+        reopened.tile(SHA_B, self.image_path, "thumbnail", 0, 0)
+        self.assertFalse(os.path.exists(os.path.join(self.cache.root, "aa", SHA_A)))
+
+    def test_undecodable_source(self):
+        path = os.path.join(self.tmp.name, "notes.txt")
+        with open(path, "w") as f:
+            f.write("not an image")
+        with self.assertRaises(ValueError):
+            self.cache.manifest(SHA_A, path)
+        self.assertFalse(os.path.exists(os.path.join(self.cache.root, "aa", SHA_A)))
+        self.assertEqual(self.cache.stats()["pyramids"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
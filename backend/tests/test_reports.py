@@ -0,0 +1,79 @@
+from concurrent.futures import Future
+import os
+import tempfile
+import time
+import unittest
+from services.report_service import ReportService, render_report
+
+try:
+    import reportlab
+except ImportError:
+    reportlab = None
+
+LAB_ANALYSIS = {
+    "id": 7,
+    "user_id": 1,
+    "modality": "lab",
+    "patient_id": "patient-1",
+    "result": "Complete Blood Count - WBC: 15.0 [High]",
+    "confidence": 0.91,
+    "is_abnormal": True,
+    "created_at": "2026-01-01T10:00:00",
+    "details": {
+        "interpretation": "Complete Blood Count - WBC: 15.0 [High]",
+        "abnormal_flags": [{
+            "category": "Hematology", "test": "Complete Blood Count", "parameter": "WBC",
+            "value": 15.0, "direction": "high", "severity": "moderate",
+            "range": {"min": 4.5, "max": 11.0, "unit": "K/uL"},
+        }],
+        "recommendations": ["Consider infection workup"],
+    },
+}
+
+class TestReportService(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_status_of_unknown_report(self):
+        service = ReportService(reports_dir=self.tmp.name)
+        self.assertEqual(service.status(3)["status"], "missing")
+
+    @unittest.skipUnless(reportlab, "reportlab is not installed")
+    def test_render_report(self):
+        path = render_report("lab", LAB_ANALYSIS, os.path.join(self.tmp.name, "lab.pdf"))
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(5), b"%PDF-")
+        self.assertEqual(os.listdir(self.tmp.name), ["lab.pdf"])
+
+    @unittest.skipUnless(reportlab, "reportlab is not installed")
+    def test_submit_renders_in_background(self):
+        service = ReportService(reports_dir=self.tmp.name, max_workers=1)
+        try:
+            self.assertEqual(service.submit(LAB_ANALYSIS)["status"], "pending")
+            deadline = time.monotonic() + 60
+            while service.status(7)["status"] == "pending" and time.monotonic() < deadline:
+                time.sleep(0.05)
+            status = service.status(7)
+            self.assertEqual(status["status"], "done")
+            self.assertGreater(status["size"], 0)
+            # Finished jobs are not kept, and a finished report is not rendered again
+            self.assertEqual(service._jobs, {})
+            self.assertEqual(service.submit(LAB_ANALYSIS)["status"], "done")
+            self.assertEqual(service._jobs, {})
+        finally:
+            service.shutdown()
+
+    def test_failed_job_keeps_only_its_error(self):
+        service = ReportService(reports_dir=self.tmp.name)
+        job = Future()
+        service._jobs[9] = job
+        job.set_exception(RuntimeError("font missing"))
+        service._finish(9, job)
+        self.assertEqual(service._jobs, {})
+        self.assertEqual(service.status(9), {"analysis_id": 9, "status": "failed", "error": "font missing"})
+
+if __name__ == '__main__':
+    unittest.main()
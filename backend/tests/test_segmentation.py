@@ -0,0 +1,82 @@
+import io
+import unittest
+import numpy as np
+import torch
+from schemas.analysis import ImagingAnalysisResult
+from services.imaging_service import ImagingAnalysisService
+from services.segmentation import decode_mask, summarize_logits
+
+class TestSummarizeLogits(unittest.TestCase):
+    def setUp(self):
+        self.logits = torch.randn((3, 9, 7, 5), generator=torch.Generator().manual_seed(0))
+        self.labels = self.logits.argmax(dim=0).numpy()
+
+    def test_masks_round_trip(self):
+        for encoding in ("rle", "bitpacked"):
+            summary = summarize_logits(self.logits, encoding=encoding)
+            self.assertEqual([c["label"] for c in summary["classes"]], [1, 2])
+            for entry in summary["classes"]:
+                expected = self.labels == entry["label"]
+                self.assertTrue((decode_mask(entry["mask"], summary["shape"]) == expected).all())
+                self.assertEqual(entry["voxels"], int(expected.sum()))
+
+    def test_slabs_do_not_change_the_result(self):
+        # One voxel per slab splits every run and every byte of packed bits
+        for encoding in ("rle", "bitpacked"):
+            whole = summarize_logits(self.logits, encoding=encoding)
+            sliced = summarize_logits(self.logits, encoding=encoding, slab_voxels=1)
+            self.assertEqual(whole["classes"], sliced["classes"])
+            self.assertAlmostEqual(whole["confidence"], sliced["confidence"], places=5)
+
+    def test_statistics(self):
+        logits = torch.zeros((2, 10, 10, 10))
+        logits[1, 2:5, 3:4, 6:10] = 1
+        summary = summarize_logits(logits, spacing=[0.5, 2.0, 1.0])
+        lesion = summary["classes"][0]
+        self.assertEqual(lesion["voxels"], 12)
+        self.assertEqual(lesion["volume_ml"], 0.012)
+        self.assertEqual(lesion["bbox"], {"min": [2, 3, 6], "max": [4, 3, 9]})
+        self.assertEqual(summary["foreground_voxels"], 12)
+
+    def test_empty_class_has_no_bbox(self):
+        summary = summarize_logits(torch.zeros((2, 4, 4, 4)) + torch.tensor([1.0, 0.0])[:, None, None, None])
+        self.assertIsNone(summary["classes"][0]["bbox"])
+        self.assertEqual(summary["classes"][0]["mask"]["runs"], [])
+
+    def test_unknown_encoding(self):
+        with self.assertRaises(ValueError):
+            summarize_logits(self.logits, encoding="png")
+
+class TestVolumeSegmentation(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.service = ImagingAnalysisService("mri")
+        cls.volume = np.random.default_rng(0).random((40, 30, 20)).astype(np.float32)
+
+    def test_mask_matches_the_full_forward_pass(self):
+        result = self.service.analyze(self.volume)
+        segmentation = result["segmentation"]
+        self.assertEqual(segmentation["shape"], [40, 30, 20])
+        image, shape, _ = self.service._prepare_volume(self.volume)
+        # Padded up to the UNet's total stride
+        self.assertEqual(tuple(image.shape), (1, 1, 48, 32, 32))
+        with torch.no_grad():
+            expected = self.service.model(image)[0, :, :40, :30, :20].argmax(dim=0).numpy() == 1
+        mask = decode_mask(segmentation["classes"][0]["mask"], shape)
+        self.assertTrue((mask == expected).all())
+        self.assertEqual(result["is_abnormal"], bool(expected.any()))
+        ImagingAnalysisResult.model_validate({**result, "model_version": "v1"})
+
+    def test_npy_upload(self):
+        buffer = io.BytesIO()
+        np.save(buffer, self.volume)
+        result = self.service.analyze(buffer.getvalue())
+        self.assertEqual(result["segmentation"]["shape"], [40, 30, 20])
+
+    def test_large_volumes_are_resampled(self):
+        _, shape, spacing = self.service._prepare_volume(np.zeros((512, 256, 10), dtype=np.float32))
+        self.assertEqual(shape, (256, 128, 5))
+        self.assertEqual(spacing, [2.0, 2.0, 2.0])
+
+if __name__ == '__main__':
+    unittest.main()
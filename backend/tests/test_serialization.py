@@ -0,0 +1,56 @@
+import json
+import unittest
+from unittest import mock
+import numpy as np
+from schemas.analysis import LabAnalysisResult
+from services import serialization
+from services.serialization import JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, SerializationStats, negotiate, typed_response
+
+LAB_RESULT = {
+    "results": {"probabilities": np.array([[0.25, 0.75]], dtype=np.float32), "predictions": np.array([1])},
+    "interpretation": "CBC - WBC: 12.5",
+    "abnormal_flags": [{
+        "category": "blood", "test": "CBC", "parameter": "WBC", "value": np.float64(12.5),
+        "direction": "high", "severity": "mild", "range": {"min": 4.5, "max": 11.0, "unit": "10^9/L"},
+    }],
+    "confidence": np.float32(0.75),
+    "timestamp": "2024-01-01T00:00:00",
+    "recommendations": [],
+    "model_version": "default",
+}
+
+class TestSerialization(unittest.TestCase):
+    def setUp(self):
+        serialization.serialization_stats.reset()
+
+    def test_numpy_results_are_typed_and_timed(self):
+        response = typed_response("/analyze/test-results", LabAnalysisResult, LAB_RESULT)
+        body = json.loads(response.body)
+        self.assertEqual(body["results"], {"probabilities": [[0.25, 0.75]], "predictions": [1]})
+        self.assertEqual(body["confidence"], 0.75)
+        self.assertEqual(body["abnormal_flags"][0]["value"], 12.5)
+        self.assertIn("encode;dur=", response.headers["server-timing"])
+
+        typed_response("/analyze/test-results", LabAnalysisResult, [LAB_RESULT, LAB_RESULT])
+        stats = serialization.serialization_stats.snapshot()["/analyze/test-results"]
+        self.assertEqual(stats["count"], 2)
+        self.assertEqual(stats["media_types"], {JSON_MEDIA_TYPE: 2})
+
+    def test_negotiate(self):
+        with mock.patch.object(serialization, "msgpack", None):
+            self.assertEqual(negotiate("application/msgpack"), JSON_MEDIA_TYPE)
+        with mock.patch.object(serialization, "msgpack", object()):
+            self.assertEqual(negotiate("application/msgpack"), MSGPACK_MEDIA_TYPE)
+            self.assertEqual(negotiate("application/json, application/msgpack;q=0.5"), JSON_MEDIA_TYPE)
+            self.assertEqual(negotiate("application/x-msgpack, */*"), MSGPACK_MEDIA_TYPE)
+            self.assertEqual(negotiate(None), JSON_MEDIA_TYPE)
+
+    def test_stats_means(self):
+        stats = SerializationStats()
+        stats.record("/x", JSON_MEDIA_TYPE, 0.001, 0.003, 100)
+        stats.record("/x", JSON_MEDIA_TYPE, 0.003, 0.001, 300)
+        self.assertEqual(stats.snapshot()["/x"]["validate_ms_mean"], 2.0)
+        self.assertEqual(stats.snapshot()["/x"]["bytes_mean"], 200)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,9 +2,14 @@ import unittest
 import os
 import torch
 import numpy as np
+import pandas as pd
 from PIL import Image
 from services.imaging_service import ImagingAnalysisService
 from services.test_analysis_service import TestAnalysisService
+from services.recommendation_engine import RecommendationEngine
+from services.reference_ranges import ReferenceRangeTable
+from services.numpy_mlp import NumpyMLP
+from services.unit_conversion import UnitConverter
 
 class TestImagingService(unittest.TestCase):
     def setUp(self):
@@ -198,5 +203,172 @@ class TestTestAnalysisService(unittest.TestCase):
         self.assertIn('interpretation', result)
         self.assertIn('recommendations', result)
 
+class TestRecommendationEngine(unittest.TestCase):
+    def setUp(self):
+        self.engine = RecommendationEngine([
+            {'test': 'CBC', 'parameter': 'WBC', 'direction': 'high', 'recommendation': 'Check for infection'},
+            {'parameter': 'Potassium', 'direction': 'high', 'min_severity': 'severe', 'recommendation': 'Urgent ECG'},
+            {'category': 'stool', 'parameter': 'Occult_Blood', 'direction': 'abnormal', 'recommendation': 'Colonoscopy'},
+        ])
+
+    def test_rules_are_indexed_by_flag(self):
+        flag = {'test': 'CBC', 'parameter': 'WBC', 'direction': 'high', 'severity': 'mild'}
+        self.assertEqual(len(self.engine.candidates(flag)), 1)
+        self.assertEqual(self.engine.candidates({'parameter': 'WBC', 'direction': 'low'}), [])
+        self.assertEqual(self.engine.evaluate([flag]), ['Check for infection'])
+
+    def test_rule_filters(self):
+        stool_wbc = {'category': 'stool', 'test': 'Routine', 'parameter': 'WBC', 'direction': 'high', 'severity': 'mild'}
+        mild_potassium = {'parameter': 'Potassium', 'direction': 'high', 'severity': 'mild'}
+        severe_potassium = dict(mild_potassium, severity='severe')
+        self.assertEqual(self.engine.evaluate([stool_wbc, mild_potassium]), [])
+        self.assertEqual(self.engine.evaluate([severe_potassium]), ['Urgent ECG'])
+
+    def test_invalid_rule(self):
+        with self.assertRaises(ValueError):
+            RecommendationEngine([{'parameter': 'WBC', 'direction': 'up', 'recommendation': 'x'}])
+
+    def test_default_rules_file(self):
+        engine = RecommendationEngine.from_file()
+        service = TestAnalysisService()
+        batch = service._extract_batch(
+            pd.DataFrame([{'CBC': {'WBC': 12.5, 'Hemoglobin': 11.5}, 'Stool': {'WBC': 1}}])
+        )
+        flags = service._detect_abnormal_tests(batch)[0]
+        self.assertEqual([(f['parameter'], f['direction']) for f in flags], [('WBC', 'high'), ('Hemoglobin', 'low')])
+        self.assertEqual(
+            engine.evaluate(flags),
+            ['Consider follow-up for possible infection or inflammation', 'Consider iron studies and dietary assessment']
+        )
+
+class TestReferenceRanges(unittest.TestCase):
+    def setUp(self):
+        self.test_categories = {
+            'blood': {'CBC': {
+                'Hemoglobin': {'min': 13.5, 'max': 17.5, 'unit': 'g/dL'},
+                'Color': {'normal': ['Red']},
+            }},
+        }
+        self.table = ReferenceRangeTable(self.test_categories, {
+            'sexes': ['male', 'female'],
+            'age_bands': [{'name': 'child', 'min_age': 0}, {'name': 'adult', 'min_age': 18}],
+            'default_age_band': 'adult',
+            'ranges': [
+                {'parameter': 'Hemoglobin', 'sex': 'female', 'age_bands': ['adult'], 'min': 12.0, 'max': 15.5},
+                {'parameter': 'Hemoglobin', 'age_bands': ['child'], 'min': 11.5, 'max': 15.5},
+            ],
+        })
+
+    def test_lookup_by_demographics(self):
+        sexes = np.array([self.table.sex_index(s) for s in ['F', 'male', None, 'female']])
+        bands = np.array([self.table.age_band_index(a) for a in [30, 30, None, 8]])
+        low, high = self.table.lookup(sexes, bands)
+        self.assertEqual(low.shape, (4, 1))
+        np.testing.assert_array_equal(low[:, 0], [12.0, 13.5, 13.5, 11.5])
+        np.testing.assert_array_equal(high[:, 0], [15.5, 17.5, 17.5, 15.5])
+
+    def test_unknown_override(self):
+        with self.assertRaises(ValueError):
+            ReferenceRangeTable(self.test_categories, {'ranges': [{'parameter': 'Color', 'min': 0}]})
+
+    def test_batch_flags_use_patient_ranges(self):
+        service = TestAnalysisService()
+        batch = pd.DataFrame([
+            {'Hemoglobin': 12.5, 'sex': 'female', 'age': 40},
+            {'Hemoglobin': 12.5, 'sex': 'male', 'age': 40},
+        ])
+        flags = service._detect_abnormal_tests(service._extract_batch(batch))
+        self.assertEqual(flags[0], [])
+        self.assertEqual(flags[1][0]['direction'], 'low')
+        self.assertEqual(flags[1][0]['range']['min'], 13.5)
+
+class TestUnitConversion(unittest.TestCase):
+    def setUp(self):
+        self.converter = UnitConverter(
+            [('blood', 'Diabetes', 'FBS'), ('blood', 'Diabetes', 'HbA1c')],
+            ['mg/dL', '%'],
+            {'conversions': [
+                {'parameter': 'FBS', 'unit': 'mmol/L', 'scale': 18.0},
+                {'parameter': 'HbA1c', 'unit': 'mmol/mol', 'scale': 0.1, 'offset': 2.0},
+            ]},
+        )
+
+    def test_vectorized_conversion(self):
+        codes = np.array([
+            [self.converter.unit_code(0, 'mmol/l'), self.converter.unit_code(1, '%')],
+            [self.converter.unit_code(0, 'mg/dL'), self.converter.unit_code(1, 'mmol/mol')],
+        ])
+        values = np.array([[5.0, 6.0], [90.0, 40.0]])
+        np.testing.assert_allclose(self.converter.apply(values, codes), [[90.0, 6.0], [90.0, 6.0]])
+
+    def test_unknown_unit(self):
+        with self.assertRaisesRegex(ValueError, "Unknown unit 'g/L' for Diabetes - FBS"):
+            self.converter.unit_code(0, 'g/L')
+
+    def test_service_normalizes_before_range_check(self):
+        service = TestAnalysisService()
+        result = service.analyze({
+            'KFT': {'Creatinine': {'value': 133, 'unit': 'µmol/L'}},
+            'FBS': {'value': 5.0, 'unit': 'mmol/L'},
+        })
+        flags = result['abnormal_flags']
+        self.assertEqual([f['parameter'] for f in flags], ['Creatinine'])
+        self.assertAlmostEqual(flags[0]['value'], 1.5042, places=3)
+        with self.assertRaisesRegex(Exception, 'Unknown unit'):
+            service.analyze({'Creatinine': {'value': 1.0, 'unit': 'furlongs'}})
+
+class TestNumpyMLP(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model = torch.nn.Sequential(
+            torch.nn.Linear(12, 16),
+            torch.nn.ReLU(),
+            torch.nn.BatchNorm1d(16),
+            torch.nn.Dropout(0.3),
+            torch.nn.Linear(16, 8),
+            torch.nn.BatchNorm1d(8),
+            torch.nn.ReLU(),
+            torch.nn.Linear(8, 2),
+        )
+        # Give BatchNorm non-trivial statistics and affine parameters
+        with torch.no_grad():
+            for module in self.model:
+                if isinstance(module, torch.nn.BatchNorm1d):
+                    module.running_mean.uniform_(-1, 1)
+                    module.running_var.uniform_(0.5, 2)
+                    module.weight.uniform_(0.5, 1.5)
+                    module.bias.uniform_(-0.5, 0.5)
+        self.model.eval()
+        self.inputs = np.random.RandomState(0).randn(32, 12).astype(np.float32)
+
+    def test_parity_with_torch(self):
+        engine = NumpyMLP.from_torch(self.model)
+        self.assertEqual(len(engine.layers), 3)
+        with torch.no_grad():
+            expected = self.model(torch.from_numpy(self.inputs)).numpy()
+        np.testing.assert_allclose(engine(self.inputs), expected, rtol=1e-4, atol=1e-5)
+        np.testing.assert_allclose(
+            engine.predict_proba(self.inputs), torch.softmax(torch.from_numpy(expected), dim=1).numpy(), atol=1e-5
+        )
+
+    def test_save_and_load(self):
+        import tempfile
+        engine = NumpyMLP.from_torch(self.model)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'model.npz')
+            engine.save(path)
+            loaded = NumpyMLP.load(path)
+        np.testing.assert_array_equal(loaded(self.inputs), engine(self.inputs))
+
+    def test_unsupported_layer(self):
+        with self.assertRaises(ValueError):
+            NumpyMLP.from_torch(torch.nn.Sequential(torch.nn.Linear(4, 4), torch.nn.Tanh()))
+
+    def test_single_row_analysis(self):
+        service = TestAnalysisService()
+        self.assertIsNotNone(service.numpy_model)
+        result = service.analyze({'Hemoglobin': 11.0})
+        self.assertEqual(result['results']['probabilities'].shape, (1, 2))
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,27 @@
+import os
+import tempfile
+import unittest
+from services.base_service import torch
+from services.shared_weights import memory_report, shared_weights_path
+
+class TestSharedWeights(unittest.TestCase):
+    def test_shared_weights_path(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertIsNone(shared_weights_path("xray", weights_dir=tmp))
+            open(os.path.join(tmp, "xray.weights.pt"), "wb").close()
+            self.assertEqual(shared_weights_path("xray", weights_dir=tmp), os.path.join(tmp, "xray.weights.pt"))
+        self.assertIsNone(shared_weights_path("xray", weights_dir=""))
+
+    @unittest.skipUnless(os.path.exists("/proc/self/smaps_rollup"), "needs Linux /proc")
+    def test_memory_report_counts_mapped_weights(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ct.weights.pt")
+            torch.save({"weight": torch.ones(1024, 1024)}, path)
+            weights = torch.load(path, mmap=True, weights_only=True)["weight"]
+            self.assertEqual(float(weights.sum()), 1024 * 1024)
+            report = memory_report(weights_dir=tmp)
+        self.assertGreaterEqual(report["weights_rss_mib"], 3.9)
+        self.assertGreater(report["rss_mib"], report["weights_rss_mib"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestStartup(unittest.TestCase):
+    def test_import_main_skips_heavy_modules(self):
+        # A fresh interpreter, in a scratch directory because importing the
+        # app creates its config and data directories
+        script = ("import sys, main; "
+                  "print(','.join(m for m in ('numpy', 'PIL', 'pydicom', 'torch') if m in sys.modules))")
+        env = dict(os.environ, PYTHONPATH=BACKEND_DIR, MODEL_LOADING="lazy")
+        with tempfile.TemporaryDirectory() as tmp:
+            result = subprocess.run([sys.executable, "-W", "ignore", "-c", script], cwd=tmp, env=env,
+                                    capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "")
+
+if __name__ == '__main__':
+    unittest.main()
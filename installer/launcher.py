@@ -165,7 +165,7 @@ Categories=Science;Medical;
 cd /d "{self.install_dir}"
 call venv\\Scripts\\activate
 start /B python backend\\main.py
-timeout /t 5
+python backend\\scripts\\wait_for_backend.py http://localhost:511/health/live
 start http://localhost:511
 """)
 
@@ -177,7 +177,7 @@ start http://localhost:511
 cd "{self.install_dir}"
 source venv/bin/activate
 python backend/main.py &
-sleep 5
+python backend/scripts/wait_for_backend.py http://localhost:511/health/live
 open http://localhost:511
 """)
         os.chmod(launcher_path, 0o755)
@@ -190,7 +190,7 @@ open http://localhost:511
 cd "{self.install_dir}"
 source venv/bin/activate
 python backend/main.py &
-sleep 5
+python backend/scripts/wait_for_backend.py http://localhost:511/health/live
 xdg-open http://localhost:511
 """)
         os.chmod(launcher_path, 0o755)